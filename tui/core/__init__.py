@@ -3,4 +3,12 @@ from .widget import *
 from .style import *
 from .font import *
 from .events import *
-from .layout import *
\ No newline at end of file
+from .dispatch import *
+from .coalesce import *
+from .stats import *
+from .textbuffer import *
+from .undo import *
+from .layout import *
+from .scheduler import *
+from .geometry import *
+from .animation import *
\ No newline at end of file
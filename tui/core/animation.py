@@ -0,0 +1,260 @@
+"""
+File: core/animation.py
+Description: Vectorized property animation
+Author:	Diego Lopes (TwisterGE/DCubix) < diego95lopes@gmail.com >
+"""
+
+import time
+import numpy
+
+EASE_LINEAR = 0
+EASE_IN_QUAD = 1
+EASE_OUT_QUAD = 2
+EASE_IN_OUT_QUAD = 3
+EASE_IN_CUBIC = 4
+EASE_OUT_CUBIC = 5
+EASE_IN_OUT_CUBIC = 6
+EASE_OUT_BACK = 7
+
+## Bounds columns, as in GeometryStore.local
+_BOUNDS = { "x": 0, "y": 1, "w": 2, "h": 3 }
+
+def _ease(t, easing):
+	"""Applies the easing function of every row to its progress (t)."""
+	u = 1.0 - t
+	return numpy.select(
+		[
+			easing == EASE_IN_QUAD,
+			easing == EASE_OUT_QUAD,
+			easing == EASE_IN_OUT_QUAD,
+			easing == EASE_IN_CUBIC,
+			easing == EASE_OUT_CUBIC,
+			easing == EASE_IN_OUT_CUBIC,
+			easing == EASE_OUT_BACK
+		],
+		[
+			t * t,
+			1.0 - u * u,
+			numpy.where(t < 0.5, 2.0 * t * t, 1.0 - 2.0 * u * u),
+			t * t * t,
+			1.0 - u * u * u,
+			numpy.where(t < 0.5, 4.0 * t * t * t, 1.0 - 4.0 * u * u * u),
+			1.0 + 2.70158 * (t - 1.0) ** 3 + 1.70158 * (t - 1.0) ** 2
+		],
+		t
+	)
+
+class Animator:
+	"""
+	Animates widget properties (tweens), all of them in one vectorized step per tick.
+	Every component of an animated value is a row in NumPy arrays (start,
+	end, duration, elapsed time, easing and target), so a tick is a handful
+	of array operations however many tweens are running. Bounds ("x", "y",
+	"w", "h") of widgets in the GeometryStore are written back in bulk, other
+	properties (i.e. ImageView.color) with setattr, once per property. Only
+	the widgets whose values changed are invalidated.
+	Owned by the TUI, and updated by TUI.update() before the widgets.
+	Attributes:
+		tui: GUI system.
+		count: Number of rows in use (including free ones).
+	"""
+	def __init__(self, tui, capacity=64):
+		self.tui = tui
+		self.count = 0
+		self.__free = []
+		self.__owners = []
+		self.__groups = {}
+		self.__callbacks = {}
+		self.__store = None
+		self.__last_time = None
+		self.__allocate(capacity)
+
+	def __allocate(self, capacity):
+		def grow(old, dtype, fill=0):
+			a = numpy.full(capacity, fill, dtype=dtype)
+			if old is not None:
+				a[:len(old)] = old
+			return a
+		get = lambda n: getattr(self, n, None)
+		self.start = grow(get("start"), numpy.float64)
+		self.end = grow(get("end"), numpy.float64)
+		self.duration = grow(get("duration"), numpy.float64)
+		self.elapsed = grow(get("elapsed"), numpy.float64)
+		self.value = grow(get("value"), numpy.float64, numpy.nan)
+		self.easing = grow(get("easing"), numpy.int8)
+		self.column = grow(get("column"), numpy.int8, -1)
+		self.geo = grow(get("geo"), numpy.int32, -1)
+		self.active = grow(get("active"), bool, False)
+		self.capacity = capacity
+
+	def __len__(self):
+		return self.count - len(self.__free)
+
+	def __row(self):
+		if self.__free:
+			return self.__free.pop()
+		if self.count == self.capacity:
+			self.__allocate(self.capacity * 2)
+		self.count += 1
+		self.__owners.append(None)
+		return self.count - 1
+
+	def __geo_row(self, widget, column):
+		store = self.tui.geometry
+		if column < 0 or store is None or widget.geometry is not store:
+			return -1
+		return widget.geometry_index
+
+	def animate(self, widget, attr, end, duration, easing=EASE_OUT_QUAD, delay=0.0, start=None, on_finish=None):
+		"""
+		Animates a property of a widget, replacing any running animation of it.
+		Args:
+			widget: The widget.
+			attr: The property. "x", "y", "w" and "h" are the bounds, anything
+				else is an attribute of the widget (a number, or a tuple of numbers).
+			end: Final value.
+			duration: Duration, in seconds.
+			easing: Easing function. One of the EASE_* constants.
+			delay: Time before it starts, in seconds.
+			start: Initial value. None means the current value.
+			on_finish: Called with the widget and the property when it ends.
+		Raises:
+			ValueError: If start and end don't have the same number of components.
+		"""
+		self.stop(widget, attr)
+		seq = isinstance(end, (tuple, list))
+		if start is None:
+			start = getattr(widget.bounds, attr) if attr in _BOUNDS else getattr(widget, attr)
+		starts = list(start) if seq else [start]
+		ends = list(end) if seq else [end]
+		if len(starts) != len(ends):
+			raise ValueError("Start and end values must have the same number of components.")
+
+		column = _BOUNDS.get(attr, -1)
+		rows = []
+		for c, (a, b) in enumerate(zip(starts, ends)):
+			i = self.__row()
+			self.start[i] = a
+			self.end[i] = b
+			self.duration[i] = max(duration, 0.0)
+			self.elapsed[i] = -delay
+			self.value[i] = numpy.nan
+			self.easing[i] = easing
+			self.column[i] = column
+			self.geo[i] = self.__geo_row(widget, column)
+			self.active[i] = True
+			self.__owners[i] = (widget, attr)
+			rows.append(i)
+		self.__groups[(widget, attr)] = (rows, seq)
+		if on_finish is not None:
+			self.__callbacks[(widget, attr)] = on_finish
+
+	def stop(self, widget, attr=None):
+		"""
+		Stops animating a property of a widget, leaving it as it is.
+		Args:
+			attr: The property. None stops all of them.
+		"""
+		keys = [(widget, attr)] if attr is not None else [k for k in self.__groups if k[0] is widget]
+		for key in keys:
+			group = self.__groups.pop(key, None)
+			self.__callbacks.pop(key, None)
+			if group is None:
+				continue
+			for i in group[0]:
+				self.active[i] = False
+				self.column[i] = -1
+				self.geo[i] = -1
+				self.__owners[i] = None
+				self.__free.append(i)
+
+	def is_animating(self, widget, attr=None):
+		"""
+		Returns:
+			Whether a property of the widget (any of them, if attr is None) is being animated.
+		"""
+		if attr is not None:
+			return (widget, attr) in self.__groups
+		return any(k[0] is widget for k in self.__groups)
+
+	def __retarget(self, store):
+		"""Finds the store rows again, after the GeometryStore was enabled/disabled."""
+		self.__store = store
+		for i in numpy.nonzero(self.active[:self.count] & (self.column[:self.count] >= 0))[0]:
+			widget, attr = self.__owners[i]
+			self.geo[i] = self.__geo_row(widget, self.column[i])
+
+	def update(self, dt=None):
+		"""
+		Advances and applies all the animations.
+		Args:
+			dt: Time step, in seconds. None means the time since the last update.
+		Returns:
+			Number of widgets changed.
+		"""
+		now = time.monotonic()
+		if dt is None:
+			dt = 0.0 if self.__last_time is None else now - self.__last_time
+		self.__last_time = now
+		if len(self) == 0:
+			return 0
+
+		n = self.count
+		active = self.active[:n]
+		elapsed = self.elapsed[:n]
+		duration = self.duration[:n]
+		elapsed[active] += dt
+
+		t = numpy.ones(n)
+		numpy.divide(elapsed, duration, out=t, where=duration > 0)
+		t = numpy.where(elapsed < 0, 0.0, numpy.clip(t, 0.0, 1.0))
+		start = self.start[:n]
+		value = start + (self.end[:n] - start) * _ease(t, self.easing[:n])
+
+		live = active & (elapsed >= 0)
+		changed = live & (value != self.value[:n])
+		self.value[:n][changed] = value[changed]
+		rows = numpy.nonzero(changed)[0]
+
+		if len(rows) > 0:
+			store = self.tui.geometry
+			if store is not self.__store:
+				self.__retarget(store)
+
+			## Bounds in the store: one fancy-indexed write
+			geo = self.geo[rows]
+			fast = geo >= 0
+			if store is not None and fast.any():
+				store.local[geo[fast], self.column[rows[fast]]] = value[rows[fast]]
+				store.dirty = True
+
+			## Everything else, once per property
+			slow = set(self.__owners[i] for i in rows[~fast])
+			for widget, attr in slow:
+				grows, seq = self.__groups[(widget, attr)]
+				if seq:
+					setattr(widget, attr, tuple(self.value[i].item() for i in grows))
+				elif attr in _BOUNDS:
+					setattr(widget.bounds, attr, self.value[grows[0]].item())
+				else:
+					setattr(widget, attr, self.value[grows[0]].item())
+
+			resized = set(self.__owners[i][0] for i in rows[self.column[rows] >= 2])
+			widgets = set(self.__owners[i][0] for i in rows)
+			for widget in widgets:
+				if widget in resized:
+					widget.needs_layout = True
+				widget.invalidate_render()
+			self.tui.stats.animated += len(widgets)
+		else:
+			widgets = ()
+
+		## Finished ones
+		done = numpy.nonzero(live & (t >= 1.0))[0]
+		if len(done) > 0:
+			for key in set(self.__owners[i] for i in done):
+				func = self.__callbacks.get(key, None)
+				self.stop(*key)
+				if func is not None:
+					func(*key)
+		return len(widgets)
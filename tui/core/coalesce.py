@@ -0,0 +1,85 @@
+"""
+File: core/coalesce.py
+Description: Coalesced change notifications
+Author:	Diego Lopes (TwisterGE/DCubix) < diego95lopes@gmail.com >
+"""
+
+import time
+import weakref
+
+_UNCHANGED = object()
+
+class ChangeCoalescer:
+	"""
+	Change notification coalescer.
+	Merges all the changes a widget reports during a tick into a single
+	notification, carrying the value from before the first change (the
+	final value is read from the widget, as usual). See: Widget.coalesce.
+	It also tracks interactions (i.e. dragging a Slider), so that a single
+	commit notification is sent when they end.
+	Attributes:
+		pending: Widgets with changes waiting to be delivered.
+	"""
+	def __init__(self):
+		self.pending = {}
+
+		self.__interactions = {}
+		## Weak, so throttled widgets aren't kept alive by their last send time
+		self.__last_sent = weakref.WeakKeyDictionary()
+
+	def change(self, widget, listeners, prev):
+		"""
+		Records a change. It's delivered right away if the widget isn't coalescing.
+		Args:
+			widget: The changed widget.
+			listeners: The listeners to notify.
+			prev: The value before the change.
+		"""
+		if self.__interactions.get(widget, None) is _UNCHANGED:
+			self.__interactions[widget] = prev
+
+		if not widget.coalesce:
+			widget.notify(listeners, widget, prev)
+		elif widget not in self.pending:
+			self.pending[widget] = (listeners, prev)
+
+	def flush(self, now=None):
+		"""
+		Delivers the pending changes, respecting the widgets' max_rate.
+		Throttled changes are kept for the next flush.
+		"""
+		now = time.perf_counter() if now is None else now
+		for widget in list(self.pending.keys()):
+			if widget.max_rate > 0:
+				last = self.__last_sent.get(widget, None)
+				if last is not None and now - last < 1.0 / widget.max_rate:
+					continue
+			self.__send(widget, now)
+
+	def begin(self, widget):
+		"""Starts an interaction (i.e. mouse press)."""
+		if widget not in self.__interactions:
+			self.__interactions[widget] = _UNCHANGED
+
+	def commit(self, widget, listeners):
+		"""
+		Ends an interaction (i.e. mouse release). Delivers the pending
+		change right away, then calls the commit listeners with the value
+		from before the interaction, if anything changed.
+		Args:
+			widget: The widget.
+			listeners: The commit listeners.
+		"""
+		if widget in self.pending:
+			self.__send(widget, time.perf_counter())
+		self.__last_sent.pop(widget, None)
+
+		prev = self.__interactions.pop(widget, _UNCHANGED)
+		if prev is not _UNCHANGED:
+			widget.notify(listeners, widget, prev)
+
+	def __send(self, widget, now):
+		listeners, prev = self.pending.pop(widget)
+		if widget.max_rate > 0:
+			self.__last_sent[widget] = now
+		widget.notify(listeners, widget, prev)
@@ -0,0 +1,130 @@
+"""
+File: core/dispatch.py
+Description: Listener dispatching
+Author:	Diego Lopes (TwisterGE/DCubix) < diego95lopes@gmail.com >
+"""
+
+import time
+import queue
+import asyncio
+import inspect
+import functools
+import traceback
+from concurrent.futures import ThreadPoolExecutor, Future
+
+DISPATCH_MODE_SYNC = 0
+DISPATCH_MODE_THREAD = 1
+DISPATCH_MODE_ASYNCIO = 2
+
+class Dispatcher:
+	"""
+	Listener dispatcher.
+	Runs widget listeners on the logic tick (default) or off-tick, on a thread pool
+	or on an asyncio loop. Off-tick listeners must not touch the UI directly: if they
+	return a callable, it is called on the logic thread by drain(), at the start of
+	the next TUI.update(). Return values of listeners run on the tick are ignored.
+	Attributes:
+		mode: One of DISPATCH_MODE_SYNC, DISPATCH_MODE_THREAD or DISPATCH_MODE_ASYNCIO.
+		max_workers: Number of threads of the pool used by DISPATCH_MODE_THREAD.
+		loop: Asyncio loop used by DISPATCH_MODE_ASYNCIO. It must be running in another thread.
+		budget: Max. time (in seconds) spent applying completed results per frame. 0 means no limit.
+	"""
+	def __init__(self, mode=DISPATCH_MODE_SYNC, max_workers=2, loop=None, budget=0.002):
+		self.mode = mode
+		self.max_workers = max_workers
+		self.loop = loop
+		self.budget = budget
+
+		self.__executor = None
+		self.__completed = queue.Queue()
+
+	@property
+	def executor(self):
+		"""Thread pool used by the off-tick modes. Created on first use."""
+		if self.__executor is None:
+			self.__executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="tui")
+		return self.__executor
+
+	@property
+	def pending(self):
+		"""Number of completed results waiting to be applied."""
+		return self.__completed.qsize()
+
+	def dispatch(self, listener, *args):
+		"""
+		Runs a listener according to the current mode.
+		Args:
+			listener: A callable or a coroutine function (DISPATCH_MODE_ASYNCIO only).
+			args: Arguments passed to the listener.
+		Returns:
+			A concurrent.futures.Future holding the listener result.
+		"""
+		if self.mode == DISPATCH_MODE_THREAD:
+			future = self.executor.submit(listener, *args)
+		elif self.mode == DISPATCH_MODE_ASYNCIO:
+			if self.loop is None:
+				raise ValueError("An asyncio loop is required by DISPATCH_MODE_ASYNCIO.")
+			future = asyncio.run_coroutine_threadsafe(self.__run_async(listener, args), self.loop)
+		else:
+			## On the tick: the listener could touch the UI itself, so its result is just returned
+			future = Future()
+			future.set_result(listener(*args))
+			return future
+		future.add_done_callback(self.__completed.put)
+		return future
+
+	def post(self, func, *args):
+		"""
+		Schedules a call on the logic thread. Safe to call from any thread.
+		Args:
+			func: The function to be called by drain().
+			args: Arguments passed to the function.
+		"""
+		future = Future()
+		future.set_result(functools.partial(func, *args))
+		self.__completed.put(future)
+
+	def drain(self, budget=None):
+		"""
+		Applies the completed results, until the time budget runs out.
+		The remaining ones are applied in the next frames.
+		Args:
+			budget: Overrides the budget attribute.
+		Returns:
+			How many results were applied.
+		"""
+		budget = self.budget if budget is None else budget
+		start = time.perf_counter()
+		count = 0
+		while count == 0 or budget <= 0 or time.perf_counter() - start < budget:
+			try:
+				future = self.__completed.get_nowait()
+			except queue.Empty:
+				break
+			self.__apply(future)
+			count += 1
+		return count
+
+	def shutdown(self, wait=False):
+		"""Stops the thread pool, if any."""
+		if self.__executor is not None:
+			self.__executor.shutdown(wait=wait)
+			self.__executor = None
+
+	async def __run_async(self, listener, args):
+		if inspect.iscoroutinefunction(listener):
+			return await listener(*args)
+		return await asyncio.get_running_loop().run_in_executor(
+			self.executor, functools.partial(listener, *args)
+		)
+
+	def __apply(self, future):
+		if future.cancelled():
+			return
+		e = future.exception()
+		if e is not None:
+			traceback.print_exception(type(e), e, e.__traceback__)
+			return
+		result = future.result()
+		if callable(result):
+			result()
@@ -4,6 +4,8 @@ Description: Event handling module
 Author:	Diego Lopes (TwisterGE/DCubix) < diego95lopes@gmail.com >
 """
 
+from bge import events as BGE_Events
+
 EVENT_STATUS_AVAILABLE = 0
 EVENT_STATUS_CONSUMED = 1
 
@@ -14,6 +16,14 @@ EVENT_TYPE_FOCUS = 3
 EVENT_TYPE_SCROLL = 4
 EVENT_TYPE_TEXT = 5
 
+def has_ctrl(modifiers):
+	"""Checks for a Ctrl key in a list of modifiers."""
+	return BGE_Events.LEFTCTRLKEY in modifiers or BGE_Events.RIGHTCTRLKEY in modifiers
+
+def has_shift(modifiers):
+	"""Checks for a Shift key in a list of modifiers."""
+	return BGE_Events.LEFTSHIFTKEY in modifiers or BGE_Events.RIGHTSHIFTKEY in modifiers
+
 class Event:
 	"""Base Event class"""
 
@@ -122,9 +132,11 @@ class TextEvent(Event):
 	Raised when typing text. Same as KeyEvent.
 	Attributes:
 		character: The currently typed character.
+		modifiers: The list of modifiers. i.e: Shift, Alt...
 	"""
-	def __init__(self, character):
+	def __init__(self, character, mod=None):
 		self.character = character
+		self.modifiers = mod if mod is not None else []
 	
 	def get_type(self):
 		return EVENT_TYPE_TEXT
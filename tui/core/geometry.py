@@ -0,0 +1,379 @@
+"""
+File: core/geometry.py
+Description: Data-oriented widget geometry
+Author:	Diego Lopes (TwisterGE/DCubix) < diego95lopes@gmail.com >
+"""
+
+import numpy
+from tui.draw.rect import Rect
+
+GEOMETRY_ALIVE = 1
+GEOMETRY_VISIBLE = 2
+
+class StoreRect(Rect):
+	"""
+	Rect whose values live in a row of a GeometryStore.
+	Used as the bounds of the widgets in the store, so moving and resizing
+	them writes straight to the arrays.
+	"""
+	def __init__(self, store, index):
+		self.__local = store.local
+		self.__store = store
+		self.index = index
+
+	def __get(self, c):
+		if self.__local is not self.__store.local:
+			## The arrays grew
+			self.__local = self.__store.local
+		return self.__local[self.index, c].item()
+
+	def __set(self, c, v):
+		if self.__local is not self.__store.local:
+			self.__local = self.__store.local
+		self.__local[self.index, c] = v
+		self.__store.dirty = True
+
+	@property
+	def x(self):
+		return self.__get(0)
+
+	@x.setter
+	def x(self, v):
+		self.__set(0, v)
+
+	@property
+	def y(self):
+		return self.__get(1)
+
+	@y.setter
+	def y(self, v):
+		self.__set(1, v)
+
+	@property
+	def w(self):
+		return self.__get(2)
+
+	@w.setter
+	def w(self, v):
+		self.__set(2, v)
+
+	@property
+	def h(self):
+		return self.__get(3)
+
+	@h.setter
+	def h(self, v):
+		self.__set(3, v)
+
+	def set_value(self, x=0, y=0, w=1, h=1):
+		self.__set(slice(0, 4), (x, y, w, h))
+
+class GeometryStore:
+	"""
+	Structure-of-arrays geometry of the widgets of a system.
+	Local bounds, parents and flags of every widget are kept in NumPy arrays
+	(the widgets' bounds become views of their rows, see: StoreRect), and the
+	world bounds, clipped bounds and effective visibility of all of them are
+	computed in one vectorized pass per depth level, only when something
+	changed. Hit-testing and culling are then array operations.
+	Enable it with TUI.use_geometry_store().
+	Attributes:
+		local: Local bounds (x, y, w, h), relative to the parent.
+		parent: Parent index, or -1. For widgets whose parent isn't in the store,
+			the closest ancestor that is (see: origin, limit).
+		depth: Number of ancestors in the store.
+		flags: GEOMETRY_ALIVE | GEOMETRY_VISIBLE.
+		world: Bounds relative to the output, not clipped (see: Widget.get_transformed_bounds_no_intersect).
+		clip: World bounds clipped by all the ancestors.
+		shown: Whether the widget and all its ancestors are visible.
+		origin: Offset added by the ancestors outside the store, up to the parent row.
+		limit: Clip (x1, y1, x2, y2) of the ancestors outside the store, in the same space as origin.
+		count: Number of rows in use (including free ones).
+		dirty: Whether the world bounds must be computed again.
+	"""
+	def __init__(self, capacity=256):
+		self.count = 0
+		self.dirty = False
+		self.__widgets = []
+		self.__free = []
+		self.__external = {}
+		self.__chains = {}
+		self.__topology = True
+		self.__levels = []
+		self.__allocate(capacity)
+
+	def __allocate(self, capacity):
+		def grow(old, shape, dtype, fill=0):
+			a = numpy.full(shape, fill, dtype=dtype)
+			if old is not None:
+				a[:len(old)] = old
+			return a
+		get = lambda n: getattr(self, n, None)
+		self.local = grow(get("local"), (capacity, 4), numpy.float64)
+		self.parent = grow(get("parent"), capacity, numpy.int32, -1)
+		self.depth = grow(get("depth"), capacity, numpy.int32)
+		self.flags = grow(get("flags"), capacity, numpy.uint8)
+		self.world = grow(get("world"), (capacity, 4), numpy.float64)
+		self.clip = grow(get("clip"), (capacity, 4), numpy.float64)
+		self.shown = grow(get("shown"), capacity, bool)
+		self.origin = grow(get("origin"), (capacity, 2), numpy.float64)
+		self.limit = grow(get("limit"), (capacity, 4), numpy.float64)
+		self.capacity = capacity
+
+	def __len__(self):
+		return self.count - len(self.__free)
+
+	def index_of(self, widget):
+		"""
+		Returns:
+			The row of a widget, or -1 if it's not in the store.
+		"""
+		i = getattr(widget, "geometry_index", None)
+		if i is None or i >= self.count or self.__widgets[i] is not widget:
+			return -1
+		return i
+
+	def widget(self, index):
+		return self.__widgets[index]
+
+	def add(self, widget):
+		"""
+		Adds a widget. Its bounds are replaced by a view of its row.
+		Returns:
+			The row of the widget.
+		"""
+		i = self.index_of(widget)
+		if i >= 0:
+			return i
+		if self.__free:
+			i = self.__free.pop()
+			self.__widgets[i] = widget
+		else:
+			if self.count == self.capacity:
+				self.__allocate(self.capacity * 2)
+			i = self.count
+			self.count += 1
+			self.__widgets.append(widget)
+
+		b = widget.bounds
+		self.local[i] = (b.x, b.y, b.w, b.h)
+		self.flags[i] = GEOMETRY_ALIVE | (GEOMETRY_VISIBLE if widget.visible else 0)
+		widget.geometry = self
+		widget.geometry_index = i
+		widget.bounds = StoreRect(self, i)
+
+		self.set_parent(widget, widget.parent)
+		## Children added before it
+		for j in [j for j, p in self.__external.items() if p is widget]:
+			del self.__external[j]
+			self.parent[j] = i
+		self.__topology = True
+		self.dirty = True
+		return i
+
+	def remove(self, widget):
+		"""Removes a widget. Its bounds become a regular Rect again."""
+		i = self.index_of(widget)
+		if i < 0:
+			return
+		b = widget.bounds
+		widget.bounds = Rect(b.x, b.y, b.w, b.h)
+		widget.geometry = None
+		widget.geometry_index = None
+
+		## Its children are now parented to a widget outside the store
+		for j in numpy.nonzero(self.parent[:self.count] == i)[0]:
+			j = int(j)
+			self.parent[j] = -1
+			if j not in self.__external:
+				self.__external[j] = widget
+		self.__external.pop(i, None)
+		self.parent[i] = -1
+		self.flags[i] = 0
+		self.__widgets[i] = None
+		self.__free.append(i)
+		self.__topology = True
+		self.dirty = True
+
+	def set_parent(self, widget, parent):
+		"""Updates the parent of a widget. Called when Widget.parent changes."""
+		i = self.index_of(widget)
+		if i < 0:
+			return
+		self.__external.pop(i, None)
+		p = self.index_of(parent) if parent is not None else -1
+		self.parent[i] = p
+		if parent is not None and p < 0:
+			self.__external[i] = parent
+		self.__topology = True
+		self.dirty = True
+
+	def set_visible(self, widget, visible):
+		"""Updates the visibility flag of a widget. Called when Widget.visible changes."""
+		i = self.index_of(widget)
+		if i < 0:
+			return
+		if visible:
+			self.flags[i] |= GEOMETRY_VISIBLE
+		else:
+			self.flags[i] &= ~numpy.uint8(GEOMETRY_VISIBLE)
+		self.dirty = True
+
+	def __chain(self, p):
+		"""
+		Walks up the ancestors outside the store, from p.
+		Returns:
+			The closest ancestor row in the store (or -1), and the bounds of the walked ones.
+		"""
+		rects = []
+		while p is not None and self.index_of(p) < 0:
+			b = p.bounds
+			rects.append((b.x, b.y, b.w, b.h))
+			p = p.parent
+		return (self.index_of(p) if p is not None else -1), tuple(rects)
+
+	def __external_moved(self):
+		"""Checks whether the ancestors outside the store moved, since they don't notify the store."""
+		for p, (anc, rects) in self.__chains.items():
+			if self.__chain(p) != (anc, rects):
+				return True
+		return False
+
+	def __resolve_external(self):
+		"""Parents the rows of external widgets to their closest stored ancestor, and computes their origin and limit."""
+		chains = {}
+		for i, p in self.__external.items():
+			if p not in chains:
+				chains[p] = self.__chain(p)
+			anc, rects = chains[p]
+			if self.parent[i] != anc:
+				self.parent[i] = anc
+				self.__topology = True
+			## The walked rects are relative to the next one up, so they're offset by all the ones above
+			ox = 0.0
+			oy = 0.0
+			x1 = y1 = -numpy.inf
+			x2 = y2 = numpy.inf
+			for x, y, w, h in reversed(rects):
+				ox += x
+				oy += y
+				x1 = max(x1, ox)
+				y1 = max(y1, oy)
+				x2 = min(x2, ox + w)
+				y2 = min(y2, oy + h)
+			self.origin[i] = (ox, oy)
+			self.limit[i] = (x1, y1, x2, y2)
+		self.__chains = chains
+
+	def __sort(self):
+		"""Computes the depth of every row, grouping them by level."""
+		n = self.count
+		parent = self.parent[:n]
+		depth = numpy.zeros(n, dtype=numpy.int32)
+		cur = parent.copy()
+		for _ in range(n):
+			m = cur >= 0
+			if not m.any():
+				break
+			depth[m] += 1
+			cur[m] = parent[cur[m]]
+		self.depth[:n] = depth
+		order = numpy.argsort(depth, kind="stable")
+		bounds = numpy.searchsorted(depth[order], numpy.arange(depth.max() + 2 if n else 1))
+		self.__levels = [order[bounds[d]:bounds[d + 1]] for d in range(len(bounds) - 1)]
+		self.__topology = False
+
+	def update(self):
+		"""Computes the world bounds, clipped bounds and visibility, if anything changed."""
+		if not self.dirty and not (self.__external and self.__external_moved()):
+			return
+		n = self.count
+		self.origin[:n] = 0
+		self.limit[:n] = (-numpy.inf, -numpy.inf, numpy.inf, numpy.inf)
+		if self.__external:
+			self.__resolve_external()
+		if self.__topology:
+			self.__sort()
+
+		local = self.local
+		world = self.world
+		clip = self.clip
+		shown = self.shown
+		visible = (self.flags[:n] & (GEOMETRY_ALIVE | GEOMETRY_VISIBLE)) == (GEOMETRY_ALIVE | GEOMETRY_VISIBLE)
+
+		world[:n, 2:] = local[:n, 2:]
+		for d, idx in enumerate(self.__levels):
+			if len(idx) == 0:
+				continue
+			limit = self.limit[idx]
+			if d == 0:
+				world[idx, :2] = local[idx, :2] + self.origin[idx]
+				x1 = numpy.maximum(world[idx, 0], limit[:, 0])
+				y1 = numpy.maximum(world[idx, 1], limit[:, 1])
+				x2 = numpy.minimum(world[idx, 0] + world[idx, 2], limit[:, 2])
+				y2 = numpy.minimum(world[idx, 1] + world[idx, 3], limit[:, 3])
+				clip[idx, 0] = x1
+				clip[idx, 1] = y1
+				clip[idx, 2] = numpy.maximum(x2 - x1, 0)
+				clip[idx, 3] = numpy.maximum(y2 - y1, 0)
+				shown[idx] = visible[idx]
+				continue
+			pi = self.parent[idx]
+			world[idx, :2] = local[idx, :2] + self.origin[idx] + world[pi, :2]
+			px = world[pi, 0]
+			py = world[pi, 1]
+			x1 = numpy.maximum(numpy.maximum(world[idx, 0], clip[pi, 0]), limit[:, 0] + px)
+			y1 = numpy.maximum(numpy.maximum(world[idx, 1], clip[pi, 1]), limit[:, 1] + py)
+			x2 = numpy.minimum(numpy.minimum(world[idx, 0] + world[idx, 2], clip[pi, 0] + clip[pi, 2]), limit[:, 2] + px)
+			y2 = numpy.minimum(numpy.minimum(world[idx, 1] + world[idx, 3], clip[pi, 1] + clip[pi, 3]), limit[:, 3] + py)
+			clip[idx, 0] = x1
+			clip[idx, 1] = y1
+			clip[idx, 2] = numpy.maximum(x2 - x1, 0)
+			clip[idx, 3] = numpy.maximum(y2 - y1, 0)
+			shown[idx] = visible[idx] & shown[pi]
+		self.dirty = False
+
+	def world_bounds(self, widget):
+		"""
+		Returns:
+			The world bounds of a widget (a Rect), or None if it's not in the store.
+		"""
+		i = self.index_of(widget)
+		if i < 0:
+			return None
+		self.update()
+		return Rect(*self.world[i].tolist())
+
+	def __result(self, mask):
+		idx = numpy.nonzero(mask)[0]
+		## Deepest (topmost) first
+		idx = idx[numpy.argsort(-self.depth[idx], kind="stable")]
+		return [self.__widgets[i] for i in idx]
+
+	def hit_test(self, x, y):
+		"""
+		Finds the visible widgets under a point, in world (virtual) coordinates.
+		Returns:
+			List of widgets, the deepest first.
+		"""
+		self.update()
+		n = self.count
+		c = self.clip[:n]
+		mask = self.shown[:n] & \
+			(x > c[:, 0]) & (x < c[:, 0] + c[:, 2]) & \
+			(y > c[:, 1]) & (y < c[:, 1] + c[:, 3])
+		return self.__result(mask)
+
+	def cull(self, x, y, w, h):
+		"""
+		Finds the visible widgets overlapping a rectangle, in world (virtual) coordinates.
+		Returns:
+			List of widgets, the deepest first.
+		"""
+		self.update()
+		n = self.count
+		c = self.clip[:n]
+		mask = self.shown[:n] & (c[:, 2] > 0) & (c[:, 3] > 0) & \
+			(c[:, 0] < x + w) & (c[:, 0] + c[:, 2] > x) & \
+			(c[:, 1] < y + h) & (c[:, 1] + c[:, 3] > y)
+		return self.__result(mask)
@@ -4,7 +4,9 @@ Description: Layout system
 Author:	Diego Lopes (TwisterGE/DCubix) < diego95lopes@gmail.com >
 """
 
+import bisect
 from tui.widgets.panel import Panel
+from tui.draw.rect import Rect
 
 class Layout:
 	"""
@@ -18,6 +20,26 @@ class Layout:
 		"""Sets the Layout arguments."""
 		pass
 
+	def measure(self, widget, avail_w, avail_h):
+		"""
+		Computes the size a container needs to fit its children.
+		Args:
+			widget: The container.
+			avail_w: Available width.
+			avail_h: Available height.
+		Returns:
+			A (width, height) tuple.
+		"""
+		return (widget.bounds.w, widget.bounds.h)
+
+	def is_outdated(self, widget):
+		"""
+		Checks for changes the container isn't notified about.
+		Returns:
+			True to perform the layout even if it wasn't invalidated.
+		"""
+		return False
+
 class StackLayout(Layout):
 	"""
 	Stack layout.
@@ -160,3 +182,425 @@ class BorderLayout(Layout):
 			self.top = widget
 		elif arg == BORDER_LAYOUT_POS_CENTER:
 			self.center = widget
+
+FLEX_DIRECTION_ROW = 0
+FLEX_DIRECTION_COLUMN = 1
+
+FLEX_ALIGN_START = 0
+FLEX_ALIGN_CENTER = 1
+FLEX_ALIGN_END = 2
+FLEX_ALIGN_STRETCH = 3
+FLEX_ALIGN_SPACE_BETWEEN = 4
+
+class FlexArgs:
+	"""
+	Flex layout arguments. Pass it as the layout_args of a widget.
+	Attributes:
+		grow: Share of the free space the widget takes.
+		shrink: Share of the overflow the widget gives back (weighted by its size).
+		basis: Main size before growing/shrinking. None means the preferred size.
+		align: Cross axis alignment. None means the layout's align.
+	"""
+	def __init__(self, grow=0, shrink=1, basis=None, align=None):
+		self.grow = grow
+		self.shrink = shrink
+		self.basis = basis
+		self.align = align
+
+FLEX_DEFAULT_ARGS = FlexArgs()
+
+class FlexLayout(Layout):
+	"""
+	Flex layout.
+	Arranges the widgets in lines, along a direction, based on CSS's Flexbox.
+	Sizes are measured first (and cached per widget, keyed by the available
+	size), then the widgets are arranged. Panels using a FlexLayout are sized
+	after their content, so deep trees are laid out in a single pass.
+	Attributes:
+		direction: Main axis. One of: FLEX_DIRECTION_ROW, FLEX_DIRECTION_COLUMN.
+		wrap: Break into new lines when the main axis is full.
+		justify: Main axis alignment. FLEX_ALIGN_START, FLEX_ALIGN_CENTER, FLEX_ALIGN_END or FLEX_ALIGN_SPACE_BETWEEN.
+		align: Cross axis alignment. FLEX_ALIGN_START, FLEX_ALIGN_CENTER, FLEX_ALIGN_END or FLEX_ALIGN_STRETCH.
+		gap: Space between the widgets and between the lines.
+	"""
+	def __init__(self, direction=FLEX_DIRECTION_ROW, wrap=False, justify=FLEX_ALIGN_START, align=FLEX_ALIGN_STRETCH, gap=0):
+		self.direction = direction
+		self.wrap = wrap
+		self.justify = justify
+		self.align = align
+		self.gap = gap
+
+	def __margins(self, w):
+		l, r, b, t = w.margin
+		if self.direction == FLEX_DIRECTION_ROW:
+			return (l, r, t, b)
+		return (t, b, l, r)
+
+	def __measure_child(self, w, avail_w, avail_h):
+		key = (avail_w, avail_h)
+		if key not in w.layout_cache:
+			if w.auto_size and isinstance(w, Panel) and isinstance(w.layout, FlexLayout):
+				## Nested flex containers wrap to the available space
+				size = w.layout.measure(w, avail_w, avail_h)
+			else:
+				size = w.measure()
+			w.layout_cache[key] = size
+		return w.layout_cache[key]
+
+	def __build_lines(self, widget, avail_w, avail_h):
+		"""Splits the visible children in lines of [(widget, args, main, cross)]."""
+		row = self.direction == FLEX_DIRECTION_ROW
+		avail_main = avail_w if row else avail_h
+		lines = []
+		line = []
+		line_main = 0
+		for w in widget.children:
+			if not w.visible:
+				continue
+			args = w.layout_args if isinstance(w.layout_args, FlexArgs) else FLEX_DEFAULT_ARGS
+			pw, ph = self.__measure_child(w, avail_w, avail_h)
+			main, cross = (pw, ph) if row else (ph, pw)
+			if args.basis is not None:
+				main = args.basis
+			m0, m1, _, _ = self.__margins(w)
+			outer = main + m0 + m1
+			if self.wrap and line and line_main + self.gap + outer > avail_main:
+				lines.append(line)
+				line = []
+				line_main = 0
+			line_main += outer + (self.gap if line else 0)
+			line.append((w, args, main, cross))
+		if line:
+			lines.append(line)
+		return lines
+
+	def __line_cross(self, line):
+		cross = 0
+		for w, _, _, c in line:
+			_, _, c0, c1 = self.__margins(w)
+			cross = max(cross, c + c0 + c1)
+		return cross
+
+	def measure(self, widget, avail_w, avail_h):
+		key = ("flex", avail_w, avail_h)
+		if key in widget.layout_cache:
+			return widget.layout_cache[key]
+		lines = self.__build_lines(widget, avail_w - 2, avail_h - 2)
+		main = 0
+		cross = 0
+		for line in lines:
+			line_main = self.gap * (len(line) - 1)
+			for w, _, m, _ in line:
+				m0, m1, _, _ = self.__margins(w)
+				line_main += m + m0 + m1
+			main = max(main, line_main)
+			cross += self.__line_cross(line)
+		cross += self.gap * max(0, len(lines) - 1)
+		size = (main + 2, cross + 2) if self.direction == FLEX_DIRECTION_ROW else (cross + 2, main + 2)
+		widget.layout_cache[key] = size
+		return size
+
+	def perform_layout(self, widget):
+		if not isinstance(widget, Panel):
+			return
+		row = self.direction == FLEX_DIRECTION_ROW
+		bounds = widget.get_content_bounds()
+		avail_main = bounds.w if row else bounds.h
+		avail_cross = bounds.h if row else bounds.w
+		origin_main = bounds.x if row else bounds.y
+		origin_cross = bounds.y if row else bounds.x
+
+		lines = self.__build_lines(widget, bounds.w, bounds.h)
+		pos_cross = origin_cross
+		for line in lines:
+			sizes = [main for _, _, main, _ in line]
+			used = self.gap * (len(line) - 1)
+			for w, _, main, _ in line:
+				m0, m1, _, _ = self.__margins(w)
+				used += main + m0 + m1
+
+			## Grow/Shrink
+			free = avail_main - used
+			if free > 0:
+				total = sum(args.grow for _, args, _, _ in line)
+				if total > 0:
+					for i, (_, args, _, _) in enumerate(line):
+						sizes[i] += free * args.grow / total
+					free = 0
+			elif free < 0:
+				total = sum(args.shrink * main for _, args, main, _ in line)
+				if total > 0:
+					for i, (_, args, main, _) in enumerate(line):
+						sizes[i] = max(0, sizes[i] + free * (args.shrink * main) / total)
+					free = 0
+
+			## Justify
+			spacing = self.gap
+			pos_main = origin_main
+			if free > 0:
+				if self.justify == FLEX_ALIGN_CENTER:
+					pos_main += free / 2
+				elif self.justify == FLEX_ALIGN_END:
+					pos_main += free
+				elif self.justify == FLEX_ALIGN_SPACE_BETWEEN and len(line) > 1:
+					spacing += free / (len(line) - 1)
+
+			line_cross = avail_cross if len(lines) == 1 else self.__line_cross(line)
+			for i, (w, args, _, cross) in enumerate(line):
+				m0, m1, c0, c1 = self.__margins(w)
+				align = self.align if args.align is None else args.align
+				size_main = sizes[i]
+				size_cross = cross
+				offset = c0
+				if align == FLEX_ALIGN_STRETCH:
+					size_cross = line_cross - (c0 + c1)
+				elif align == FLEX_ALIGN_CENTER:
+					offset += (line_cross - (cross + c0 + c1)) / 2
+				elif align == FLEX_ALIGN_END:
+					offset = line_cross - (cross + c1)
+
+				pos_main += m0
+				if row:
+					w.bounds.x = pos_main
+					w.bounds.y = pos_cross + offset
+					w.set_size(size_main, size_cross)
+				else:
+					w.bounds.x = pos_cross + offset
+					w.bounds.y = pos_main
+					w.set_size(size_cross, size_main)
+				pos_main += size_main + m1 + spacing
+			pos_cross += line_cross + self.gap
+
+GRID_TRACK_FIXED = 0
+GRID_TRACK_AUTO = 1
+GRID_TRACK_FRACTION = 2
+
+class GridTrack:
+	"""
+	Grid row/column definition.
+	Attributes:
+		kind: One of: GRID_TRACK_FIXED, GRID_TRACK_AUTO, GRID_TRACK_FRACTION.
+		value: Size (fixed) or share of the free space (fraction).
+	"""
+	def __init__(self, kind=GRID_TRACK_AUTO, value=1):
+		self.kind = kind
+		self.value = value
+
+class GridArgs:
+	"""
+	Grid layout arguments. Pass it as the layout_args of a widget.
+	Attributes:
+		row: First row.
+		column: First column.
+		row_span: Number of rows.
+		column_span: Number of columns.
+	"""
+	def __init__(self, row=0, column=0, row_span=1, column_span=1):
+		self.row = row
+		self.column = column
+		self.row_span = row_span
+		self.column_span = column_span
+
+class GridLayout(Layout):
+	"""
+	Grid layout.
+	Arranges the widgets in cells of fixed, auto (fit the largest single-span
+	widget) or fractional rows and columns, with spans. Widgets without
+	GridArgs fill the cells in order. Tracks are computed only when the
+	container is invalidated.
+	Virtualized mode: when a cell_factory is set, the layout creates the cells
+	itself, keeping alive only the ones intersecting the visible area of the
+	container. The track sizes must be known without the cells, so only fixed
+	and fractional tracks are allowed. Cells scrolled out are recycled through
+	cell_binder, or dropped if there's none.
+	Attributes:
+		rows: List of GridTrack (numbers are fixed tracks).
+		columns: List of GridTrack (numbers are fixed tracks).
+		gap: Space between the cells.
+		cell_factory: Virtualized mode. Called as cell_factory(row, column) to create a cell widget.
+		cell_binder: Virtualized mode. Called as cell_binder(widget, row, column) to fill a recycled cell. Optional.
+		scroll_x: Virtualized mode. Horizontal content offset.
+		scroll_y: Virtualized mode. Vertical content offset.
+	"""
+	def __init__(self, columns, rows, gap=0, cell_factory=None, cell_binder=None):
+		self.columns = [self.__track(t) for t in columns]
+		self.rows = [self.__track(t) for t in rows]
+		self.gap = gap
+		self.cell_factory = cell_factory
+		self.cell_binder = cell_binder
+		self.scroll_x = 0
+		self.scroll_y = 0
+
+		self.column_positions = []
+		self.column_sizes = []
+		self.row_positions = []
+		self.row_sizes = []
+
+		self.__cells = {}
+		self.__pool = []
+		self.__view = None
+		self.__tracks_size = None
+		if cell_factory is not None:
+			self.__check_virtual()
+
+	@staticmethod
+	def __track(t):
+		if isinstance(t, GridTrack):
+			return t
+		return GridTrack(GRID_TRACK_FIXED, t)
+
+	def __check_virtual(self):
+		"""
+		Raises:
+			ValueError: If there are auto tracks, which can't be sized before the cells exist.
+		"""
+		for t in self.columns + self.rows:
+			if t.kind == GRID_TRACK_AUTO:
+				raise ValueError("Virtualized grids only support fixed and fractional tracks.")
+
+	def __args(self, widget, index):
+		if isinstance(widget.layout_args, GridArgs):
+			return widget.layout_args
+		cols = max(1, len(self.columns))
+		return GridArgs(index // cols, index % cols)
+
+	def __compute_tracks(self, tracks, avail, spans):
+		sizes = []
+		fractions = 0
+		for t in tracks:
+			if t.kind == GRID_TRACK_FIXED:
+				sizes.append(t.value)
+			else:
+				sizes.append(0)
+				if t.kind == GRID_TRACK_FRACTION:
+					fractions += t.value
+		for start, span, size in spans:
+			if span == 1 and start < len(tracks) and tracks[start].kind == GRID_TRACK_AUTO:
+				sizes[start] = max(sizes[start], size)
+		if fractions > 0:
+			free = max(0, avail - (sum(sizes) + self.gap * max(0, len(tracks) - 1)))
+			for i, t in enumerate(tracks):
+				if t.kind == GRID_TRACK_FRACTION:
+					sizes[i] = free * t.value / fractions
+		positions = []
+		pos = 0
+		for s in sizes:
+			positions.append(pos)
+			pos += s + self.gap
+		return positions, sizes
+
+	def __spans(self, widget):
+		cols = []
+		rows = []
+		for i, w in enumerate(widget.children):
+			if not w.visible:
+				continue
+			args = self.__args(w, i)
+			pw, ph = w.measure()
+			cols.append((args.column, args.column_span, pw + w.margin[0] + w.margin[1]))
+			rows.append((args.row, args.row_span, ph + w.margin[2] + w.margin[3]))
+		return cols, rows
+
+	def __update_tracks(self, widget, bounds):
+		cols, rows = self.__spans(widget)
+		self.column_positions, self.column_sizes = self.__compute_tracks(self.columns, bounds.w, cols)
+		self.row_positions, self.row_sizes = self.__compute_tracks(self.rows, bounds.h, rows)
+		self.__tracks_size = (bounds.w, bounds.h)
+
+	def __span(self, positions, sizes, start, span):
+		end = min(len(sizes), start + span) - 1
+		if start > end:
+			return (0, 0)
+		return (positions[start], positions[end] + sizes[end] - positions[start])
+
+	def cell_rect(self, row, column, row_span=1, column_span=1):
+		"""
+		Returns:
+			The rectangle of a cell (or cell span), relative to the content of the container.
+		"""
+		x, w = self.__span(self.column_positions, self.column_sizes, column, column_span)
+		y, h = self.__span(self.row_positions, self.row_sizes, row, row_span)
+		return Rect(x, y, w, h)
+
+	def __visible_area(self, widget):
+		clipped = widget.get_transformed_bounds()
+		full = widget.get_transformed_bounds_no_intersect()
+		return (
+			clipped.x - full.x + self.scroll_x,
+			clipped.y - full.y + self.scroll_y,
+			clipped.w, clipped.h
+		)
+
+	def __track_range(self, positions, sizes, start, size):
+		first = max(0, bisect.bisect_right(positions, start) - 1)
+		last = bisect.bisect_left(positions, start + size)
+		while first < last and positions[first] + sizes[first] < start:
+			first += 1
+		return range(first, last)
+
+	def __virtualize(self, widget, bounds):
+		vx, vy, vw, vh = self.__visible_area(widget)
+		self.__view = (vx, vy, vw, vh)
+		rows = self.__track_range(self.row_positions, self.row_sizes, vy - bounds.y, vh)
+		cols = self.__track_range(self.column_positions, self.column_sizes, vx - bounds.x, vw)
+
+		for key in list(self.__cells.keys()):
+			if key[0] not in rows or key[1] not in cols:
+				w = self.__cells.pop(key)
+				widget.children.remove(w)
+				if self.cell_binder is not None:
+					## Without a binder, it can't be filled with another cell's content
+					self.__pool.append(w)
+
+		for r in rows:
+			for c in cols:
+				if (r, c) in self.__cells:
+					continue
+				if self.__pool and self.cell_binder is not None:
+					w = self.__pool.pop()
+					self.cell_binder(w, r, c)
+				else:
+					w = self.cell_factory(r, c)
+					w.auto_size = False
+					w.parent = widget
+				w.style = widget.style
+				w.tui = widget.tui
+				w.layout_args = GridArgs(r, c)
+				widget.children.append(w)
+				self.__cells[(r, c)] = w
+
+	def is_outdated(self, widget):
+		return self.cell_factory is not None and self.__visible_area(widget) != self.__view
+
+	def measure(self, widget, avail_w, avail_h):
+		cols, rows = self.__spans(widget)
+		_, col_sizes = self.__compute_tracks(self.columns, 0, cols)
+		_, row_sizes = self.__compute_tracks(self.rows, 0, rows)
+		w = sum(col_sizes) + self.gap * max(0, len(col_sizes) - 1)
+		h = sum(row_sizes) + self.gap * max(0, len(row_sizes) - 1)
+		return (w + 2, h + 2)
+
+	def perform_layout(self, widget):
+		if not isinstance(widget, Panel):
+			return
+		bounds = widget.get_content_bounds()
+		if widget.needs_layout or self.__tracks_size != (bounds.w, bounds.h):
+			self.__update_tracks(widget, bounds)
+
+		ox = bounds.x
+		oy = bounds.y
+		if self.cell_factory is not None:
+			self.__check_virtual()
+			self.__virtualize(widget, bounds)
+			ox -= self.scroll_x
+			oy -= self.scroll_y
+
+		for i, w in enumerate(widget.children):
+			if not w.visible:
+				continue
+			args = self.__args(w, i)
+			r = self.cell_rect(args.row, args.column, args.row_span, args.column_span)
+			l, rm, b, t = w.margin
+			w.bounds.x = ox + r.x + l
+			w.bounds.y = oy + r.y + t
+			w.set_size(r.w - (l + rm), r.h - (t + b))
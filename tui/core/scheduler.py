@@ -0,0 +1,103 @@
+"""
+File: core/scheduler.py
+Description: Per-scene render scheduling
+Author:	Diego Lopes (TwisterGE/DCubix) < diego95lopes@gmail.com >
+"""
+
+import time
+
+class RenderScheduler:
+	"""
+	Renders the systems (TUI) of each scene in that scene's post-draw, so
+	every system is rendered exactly once per frame, however many scenes
+	have one. Systems are rendered in ascending priority (higher priorities
+	are drawn on top) and those with a persistent output (i.e. ObjectTexture)
+	can be capped to a max. frame rate, keeping their last frame in between.
+	Systems of scenes that ended are dropped.
+	"""
+	def __init__(self):
+		self.__scenes = {}
+		self.__hooks = {}
+		self.__last = {}
+
+	def add(self, tui, scene, priority=None, max_fps=None):
+		"""
+		Schedules a system to be rendered in the post-draw of a scene.
+		Args:
+			tui: The system.
+			scene: Its scene.
+			priority: Render priority. None keeps TUI.priority.
+			max_fps: Max. frame rate (persistent outputs only, 0 means no limit). None keeps TUI.max_fps.
+		"""
+		if priority is not None:
+			tui.priority = priority
+		if max_fps is not None:
+			tui.max_fps = max_fps
+		self.remove(tui)
+		tuis = self.__scenes.setdefault(scene, [])
+		tuis.append(tui)
+		if scene not in self.__hooks:
+			hook = self.__hooks[scene] = lambda: self.render_scene(scene)
+			scene.post_draw.append(hook)
+
+	def remove(self, tui):
+		"""Stops rendering a system."""
+		for tuis in self.__scenes.values():
+			if tui in tuis:
+				tuis.remove(tui)
+		self.__last.pop(tui, None)
+
+	def remove_scene(self, scene):
+		"""
+		Stops rendering the systems of a scene, and removes its post-draw hook.
+		Returns:
+			The systems removed.
+		"""
+		tuis = self.__scenes.pop(scene, [])
+		for tui in tuis:
+			self.__last.pop(tui, None)
+		hook = self.__hooks.pop(scene, None)
+		if hook is not None and not getattr(scene, "invalid", False) and hook in scene.post_draw:
+			scene.post_draw.remove(hook)
+		return tuis
+
+	def scene_of(self, tui):
+		"""
+		Returns:
+			The scene a system is rendered in, or None.
+		"""
+		for scene, tuis in self.__scenes.items():
+			if tui in tuis:
+				return scene
+		return None
+
+	def systems(self, scene):
+		"""
+		Returns:
+			The systems of a scene, in render order.
+		"""
+		return sorted(self.__scenes.get(scene, []), key=lambda t: t.priority)
+
+	def prune(self):
+		"""
+		Drops the scenes that ended. Called by TUI.main_loop().
+		Returns:
+			The systems dropped.
+		"""
+		dropped = []
+		for scene in [s for s in self.__scenes if getattr(s, "invalid", False)]:
+			dropped.extend(self.remove_scene(scene))
+		return dropped
+
+	def render_scene(self, scene):
+		"""Renders the systems of a scene. Called by its post-draw."""
+		now = time.monotonic()
+		for tui in self.systems(scene):
+			if tui.max_fps > 0 and tui.output.persistent:
+				last = self.__last.get(tui, None)
+				if last is not None and now - last < 1.0 / tui.max_fps:
+					continue
+			self.__last[tui] = now
+			tui.render()
+
+scheduler = RenderScheduler()
@@ -0,0 +1,33 @@
+"""
+File: core/stats.py
+Description: Per-frame statistics
+Author:	Diego Lopes (TwisterGE/DCubix) < diego95lopes@gmail.com >
+"""
+
+class FrameStats:
+	"""
+	Per-frame counters, reset at the start of every TUI.update().
+	Useful to check that a static UI isn't doing any work.
+	Attributes:
+		measures: Preferred size computations.
+		layouts: Layouts performed.
+		layer_renders: Cached layers rendered again. See: Panel.cache_as_layer.
+		renders: Times the system was rendered since the last update. More than 1 means wasted work.
+		draw_calls: Draw calls issued by the renderer.
+		state_changes: Program/texture switches.
+		reordered: Draws moved by the render queue to be batched. See: Renderer.queued.
+		animated: Widgets changed by animations. See: Animator.
+	"""
+	def __init__(self):
+		self.reset()
+
+	def reset(self):
+		"""Zeroes all the counters."""
+		self.measures = 0
+		self.layouts = 0
+		self.layer_renders = 0
+		self.renders = 0
+		self.draw_calls = 0
+		self.state_changes = 0
+		self.reordered = 0
+		self.animated = 0
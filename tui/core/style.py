@@ -4,9 +4,11 @@ Description: Visual style handling
 Author:	Diego Lopes (TwisterGE/DCubix) < diego95lopes@gmail.com >
 """
 
+import os
 import json
+import time
 from bge import logic
-from tui.draw.renderer import NinePatch
+from tui.draw.renderer import NinePatch, Shape
 from tui.draw.texture import ImageTexture
 from .font import Font
 
@@ -19,6 +21,8 @@ class Style:
 		font: Font object.
 		text_color: Color for all the text-based widgets.
 		disabled_text_color: Color for disabled text-based widgets.
+		file: Style file loaded.
+		image: Skin texture.
 	"""
 
 	__cache = {}
@@ -28,6 +32,9 @@ class Style:
 		self.font = None
 		self.text_color = (0.0, 0.0, 0.0)
 		self.disabled_text_color = (0.5, 0.5, 0.5)
+		self.file = None
+		self.image = None
+		self.__font_file = None
 
 		if styleFile is not None:
 			self.load(styleFile)
@@ -35,15 +42,25 @@ class Style:
 	def load(self, styleFile):
 		"""
 		Loads a style from a JSON file
+		Besides the image "regions", a "shapes" section can declare
+		procedural frames (see: Shape) by name, i.e:
+			"Button_normal": { "fill": [0.2, 0.2, 0.2, 1], "radius": 4,
+				"border_color": [0, 0, 0, 1], "border_width": 1,
+				"shadow_color": [0, 0, 0, 0.5], "shadow_offset": [0, 2], "shadow_blur": 3,
+				"size": [16, 16] }
+		Shapes take precedence over regions with the same name. A style
+		made of shapes only doesn't need an image.
 		Raises:
-			Exception: If no texture regions are present in the style file.
+			Exception: If no texture regions or shapes are present in the style file.
 		"""
 		sfile = {}
 		with open(styleFile) as fp:
 			sfile = json.load(fp)
+		self.file = styleFile
 		
 		if "font" in sfile:
-			self.font = Font(logic.expandPath(sfile["font"]))
+			self.__font_file = logic.expandPath(sfile["font"])
+			self.font = Font(self.__font_file)
 		else:
 			self.font = Font()
 
@@ -53,14 +70,182 @@ class Style:
 		if "disabled_text_color" in sfile:
 			self.disabled_text_color = sfile["disabled_text_color"]
 		
-		if "regions" not in sfile or "image" not in sfile:
+		if "shapes" not in sfile and ("regions" not in sfile or "image" not in sfile):
 			raise Exception("Invalid Style file.")
-		
-		img = ImageTexture(logic.expandPath(sfile["image"]))
 
-		for name, np in sfile["regions"].items():
+		for name, sh in sfile.get("shapes", {}).items():
+			if name not in self.textures:
+				self.textures[name] = Style.__shape(name, sh)
+
+		if "image" not in sfile:
+			return
+		img = self.image = ImageTexture(logic.expandPath(sfile["image"]))
+
+		for name, np in sfile.get("regions", {}).items():
 			if name in self.textures:
 				continue
 			region = np[0]
 			lp, rp, bp, tp = np[1]
-			self.textures[name] = NinePatch(img, lp, rp, bp, tp, region)
+			self.textures[name] = NinePatch(img, lp, rp, bp, tp, region, name)
+
+	def reload(self, styleFile=None):
+		"""
+		Loads the style file again, changing only what's different.
+		Regions are updated in place (so the widgets keep using them), and
+		only the changed tiles of the image are uploaded. See: ImageTexture.reload
+		Regions and shapes no longer in the file are removed.
+		Args:
+			styleFile: New style file. None reloads the current one.
+		Returns:
+			Set of what changed: region/shape names, "font", "text_color" and/or "disabled_text_color".
+		Raises:
+			Exception: If no texture regions or shapes are present in the style file.
+		"""
+		styleFile = self.file if styleFile is None else styleFile
+		with open(styleFile) as fp:
+			sfile = json.load(fp)
+		if "shapes" not in sfile and ("regions" not in sfile or "image" not in sfile):
+			raise Exception("Invalid Style file.")
+		self.file = styleFile
+		changed = set()
+
+		font_file = logic.expandPath(sfile["font"]) if "font" in sfile else None
+		if font_file != self.__font_file:
+			self.__font_file = font_file
+			self.font = Font(font_file)
+			changed.add("font")
+
+		for key, default in (("text_color", (0.0, 0.0, 0.0)), ("disabled_text_color", (0.5, 0.5, 0.5))):
+			value = tuple(sfile.get(key, default))
+			if value != tuple(getattr(self, key)):
+				setattr(self, key, value)
+				changed.add(key)
+
+		shapes = sfile.get("shapes", {})
+		regions = sfile.get("regions", {}) if "image" in sfile else {}
+		for name in [n for n in self.textures if n not in shapes and n not in regions]:
+			del self.textures[name]
+			changed.add(name)
+
+		for name, sh in shapes.items():
+			shape = Style.__shape(name, sh)
+			n = self.textures.get(name, None)
+			if not isinstance(n, Shape):
+				self.textures[name] = shape
+				changed.add(name)
+			elif n.params() != shape.params():
+				n.__dict__.update(shape.__dict__)
+				changed.add(name)
+
+		if "image" not in sfile:
+			self.image = None
+			return changed
+
+		## Pixels: a new image replaces the old one, otherwise only the changed tiles
+		image_file = logic.expandPath(sfile["image"])
+		if self.image is None:
+			self.image = ImageTexture(image_file)
+			rects = [(0, 0, self.image.width, self.image.height)]
+		else:
+			rects = self.image.reload(image_file)
+		iw = self.image.width
+		ih = self.image.height
+
+		for name, np in regions.items():
+			if name in shapes:
+				continue
+			region = tuple(np[0])
+			lp, rp, bp, tp = np[1]
+			n = self.textures.get(name, None)
+			if not isinstance(n, NinePatch):
+				self.textures[name] = NinePatch(self.image, lp, rp, bp, tp, region, name)
+				changed.add(name)
+				continue
+			if tuple(n.uv) != region or (n.margin_left, n.margin_right, n.margin_bottom, n.margin_top) != (lp, rp, bp, tp):
+				n.uv = region
+				n.margin_left = lp
+				n.margin_right = rp
+				n.margin_bottom = bp
+				n.margin_top = tp
+				changed.add(name)
+			else:
+				## Same region, but its pixels may have changed
+				u, v, w, h = region
+				x0 = u * iw
+				y0 = v * ih
+				x1 = x0 + w * iw
+				y1 = y0 + h * ih
+				for rx, ry, rw, rh in rects:
+					if rx < x1 and rx + rw > x0 and ry < y1 and ry + rh > y0:
+						changed.add(name)
+						break
+		return changed
+
+	@staticmethod
+	def __shape(name, sh):
+		w, h = sh.get("size", (16, 16))
+		return Shape(
+			fill=tuple(sh.get("fill", (1.0, 1.0, 1.0, 1.0))),
+			border_color=tuple(sh.get("border_color", (0.0, 0.0, 0.0, 1.0))),
+			border_width=sh.get("border_width", 0),
+			radius=sh.get("radius", 0),
+			shadow_color=tuple(sh.get("shadow_color", (0.0, 0.0, 0.0, 0.0))),
+			shadow_offset=tuple(sh.get("shadow_offset", (0, 0))),
+			shadow_blur=sh.get("shadow_blur", 0),
+			width=w,
+			height=h,
+			name=name
+		)
+
+class StyleWatcher:
+	"""
+	Watches the files of a style, reloading it when they're saved.
+	The modification times are checked at most once per interval.
+	Attributes:
+		style: Watched style.
+		interval: Time between checks, in seconds.
+	"""
+	def __init__(self, style, interval=0.5):
+		self.style = style
+		self.interval = interval
+		self.__next = 0.0
+		self.__mtimes = self.__stat()
+
+	def __files(self):
+		files = [self.style.file]
+		if self.style.image is not None:
+			files.append(self.style.image.file_name)
+		return files
+
+	def __stat(self):
+		mtimes = []
+		for f in self.__files():
+			try:
+				mtimes.append(os.stat(f).st_mtime)
+			except OSError:
+				mtimes.append(None)
+		return mtimes
+
+	def poll(self):
+		"""
+		Reloads the style if its files changed.
+		Returns:
+			What changed (see: Style.reload), or None if nothing was reloaded.
+		"""
+		now = time.monotonic()
+		if now < self.__next:
+			return None
+		self.__next = now + self.interval
+		mtimes = self.__stat()
+		if mtimes == self.__mtimes:
+			return None
+		## Tried once per change: a broken file is reported once, and read again when saved again
+		self.__mtimes = mtimes
+		try:
+			changed = self.style.reload()
+		except Exception as e:
+			print("Could not reload the style: {}".format(e))
+			return None
+		## The image may have changed with the style file
+		self.__mtimes = self.__stat()
+		return changed
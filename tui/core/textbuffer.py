@@ -0,0 +1,251 @@
+"""
+File: core/textbuffer.py
+Description: Piece table text buffer
+Author:	Diego Lopes (TwisterGE/DCubix) < diego95lopes@gmail.com >
+"""
+
+import bisect
+
+class _Buffer:
+	"""Read-only or append-only text storage, with the positions of its line breaks."""
+	__slots__ = ("chars", "breaks")
+
+	def __init__(self, text=""):
+		self.chars = text
+		self.breaks = [i for i, c in enumerate(text) if c == "\n"]
+
+	def slice(self, start, end):
+		if isinstance(self.chars, str):
+			return self.chars[start:end]
+		return "".join(self.chars[start:end])
+
+class _Piece:
+	"""Span of a buffer. first_break/last_break delimit its line breaks in buffer.breaks."""
+	__slots__ = ("buffer", "start", "length", "first_break", "last_break")
+
+	def __init__(self, buffer, start, length):
+		self.buffer = buffer
+		self.start = start
+		self.length = length
+		self.update_breaks()
+
+	def update_breaks(self):
+		breaks = self.buffer.breaks
+		self.first_break = bisect.bisect_left(breaks, self.start)
+		self.last_break = bisect.bisect_left(breaks, self.start + self.length)
+
+	@property
+	def break_count(self):
+		return self.last_break - self.first_break
+
+	def text(self, start=0, end=None):
+		end = self.length if end is None else end
+		return self.buffer.slice(self.start + start, self.start + end)
+
+class PieceTable:
+	"""
+	Piece table text buffer.
+	The text is a list of pieces pointing into the original text (never
+	modified) or into an append-only buffer, so editing doesn't copy the
+	text around. Each piece knows its line breaks, which makes line lookups
+	O(log n). Consecutive insertions (typing) extend the same piece.
+	"""
+	def __init__(self, text=""):
+		self.__original = _Buffer(text)
+		self.__added = _Buffer([])
+		self.__pieces = []
+		if len(text) > 0:
+			self.__pieces.append(_Piece(self.__original, 0, len(text)))
+
+		self.__offsets = None
+		self.__lines = None
+		self.__length = len(text)
+
+	def __len__(self):
+		return self.__length
+
+	@property
+	def piece_count(self):
+		"""Number of pieces. Grows with the edits, not with the typed characters."""
+		return len(self.__pieces)
+
+	def __str__(self):
+		return self.get_text()
+
+	def __index(self):
+		"""Rebuilds the prefix sums of characters and line breaks, if outdated."""
+		if self.__offsets is None:
+			offsets = []
+			lines = []
+			off = 0
+			ln = 0
+			for p in self.__pieces:
+				offsets.append(off)
+				lines.append(ln)
+				off += p.length
+				ln += p.break_count
+			self.__offsets = offsets
+			self.__lines = lines
+			self.__line_count = ln + 1
+
+	def __find(self, pos):
+		"""Returns the index of the piece containing pos and the offset inside it."""
+		self.__index()
+		i = bisect.bisect_right(self.__offsets, pos) - 1
+		if i < 0:
+			return (0, 0)
+		return (i, pos - self.__offsets[i])
+
+	def __split(self, pos):
+		"""Ensures a piece starts at pos. Returns its index."""
+		i, off = self.__find(pos)
+		if i >= len(self.__pieces) or off == 0:
+			return i
+		p = self.__pieces[i]
+		if off >= p.length:
+			return i + 1
+		right = _Piece(p.buffer, p.start + off, p.length - off)
+		p.length = off
+		p.update_breaks()
+		self.__pieces.insert(i + 1, right)
+		self.__offsets = None
+		return i + 1
+
+	def insert(self, pos, text):
+		"""
+		Inserts text.
+		Args:
+			pos: Character position.
+			text: The text to be inserted.
+		"""
+		if len(text) == 0:
+			return
+		pos = max(0, min(pos, self.__length))
+		added = self.__added
+		start = len(added.chars)
+		added.chars.extend(text)
+		added.breaks.extend(start + i for i, c in enumerate(text) if c == "\n")
+
+		i, off = self.__find(pos)
+		prev = None
+		if off == 0 and i > 0:
+			prev = self.__pieces[i - 1]
+		elif i < len(self.__pieces) and off == self.__pieces[i].length:
+			## At the end of the text
+			prev = self.__pieces[i]
+		if prev is not None and prev.buffer is added and prev.start + prev.length == start:
+			## Typing: extend the previous piece
+			breaks = prev.break_count
+			prev.length += len(text)
+			prev.update_breaks()
+			self.__length += len(text)
+			if prev is self.__pieces[-1] and self.__offsets is not None:
+				## Nothing after it, the prefix sums are still valid
+				self.__line_count += prev.break_count - breaks
+			else:
+				self.__offsets = None
+			return
+
+		i = self.__split(pos)
+		self.__pieces.insert(i, _Piece(added, start, len(text)))
+		self.__length += len(text)
+		self.__offsets = None
+
+	def delete(self, pos, length):
+		"""
+		Deletes text.
+		Args:
+			pos: Character position.
+			length: Number of characters.
+		Returns:
+			The deleted text.
+		"""
+		pos = max(0, pos)
+		length = min(length, self.__length - pos)
+		if length <= 0:
+			return ""
+		first = self.__split(pos)
+		last = self.__split(pos + length)
+		removed = self.__pieces[first:last]
+		del self.__pieces[first:last]
+		self.__length -= length
+		self.__offsets = None
+		return "".join(p.text() for p in removed)
+
+	def get_text(self, start=0, end=None):
+		"""
+		Returns:
+			The text between start and end (exclusive).
+		"""
+		end = self.__length if end is None else min(end, self.__length)
+		if start >= end:
+			return ""
+		i, off = self.__find(start)
+		out = []
+		remaining = end - start
+		while remaining > 0 and i < len(self.__pieces):
+			p = self.__pieces[i]
+			n = min(p.length - off, remaining)
+			out.append(p.text(off, off + n))
+			remaining -= n
+			off = 0
+			i += 1
+		return "".join(out)
+
+	@property
+	def line_count(self):
+		"""Number of lines."""
+		self.__index()
+		return self.__line_count
+
+	def line_start(self, line):
+		"""
+		Returns:
+			The position of the first character of a line.
+		"""
+		if line <= 0:
+			return 0
+		self.__index()
+		if line >= self.__line_count:
+			return self.__length
+		nth = line - 1
+		i = bisect.bisect_right(self.__lines, nth) - 1
+		p = self.__pieces[i]
+		while p.break_count <= nth - self.__lines[i]:
+			i += 1
+			p = self.__pieces[i]
+		brk = p.buffer.breaks[p.first_break + (nth - self.__lines[i])]
+		return self.__offsets[i] + (brk - p.start) + 1
+
+	def line_end(self, line):
+		"""
+		Returns:
+			The position after the last character of a line (without the line break).
+		"""
+		self.__index()
+		if line + 1 >= self.__line_count:
+			return self.__length
+		return self.line_start(line + 1) - 1
+
+	def line(self, line):
+		"""
+		Returns:
+			The text of a line, without the line break.
+		"""
+		return self.get_text(self.line_start(line), self.line_end(line))
+
+	def line_of(self, pos):
+		"""
+		Returns:
+			The line containing a character position.
+		"""
+		pos = max(0, min(pos, self.__length))
+		if not self.__pieces:
+			return 0
+		i, off = self.__find(pos)
+		if i >= len(self.__pieces):
+			return self.line_count - 1
+		p = self.__pieces[i]
+		breaks = p.buffer.breaks
+		n = bisect.bisect_left(breaks, p.start + off, p.first_break, p.last_break) - p.first_break
+		return self.__lines[i] + n
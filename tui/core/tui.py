@@ -7,9 +7,15 @@ Author:	Diego Lopes (TwisterGE/DCubix) < diego95lopes@gmail.com >
 import json
 
 from bge import render, logic, events, types
-from tui.draw import Viewport, ObjectTexture, Renderer
-from .style import Style
+from tui.draw import Viewport, ObjectTexture, Renderer, Rect, textures
+from .style import Style, StyleWatcher
 from .events import *
+from .dispatch import Dispatcher
+from .coalesce import ChangeCoalescer
+from .stats import FrameStats
+from .scheduler import scheduler
+from .geometry import GeometryStore
+from .animation import Animator
 
 class TUI:
 	"""
@@ -19,9 +25,17 @@ class TUI:
 		virtual_height: Virtual height of the GUI.
 		event_handler: Event handler object.
 		renderer: Renderer object.
+		dispatcher: Listener dispatcher. See: Dispatcher.
+		coalescer: Change notification coalescer. See: ChangeCoalescer.
+		stats: Per-frame statistics. See: FrameStats.
 		widgets: List of widgets.
 		focused: Currently focused widget.
 		global_style: Main style file for all the widgets. (Use refresh() to apply changes).
+		style_watcher: Reloads the global style when its files change, if set. See: watch_style().
+		priority: Render order among the systems of a scene (higher is drawn on top). See: RenderScheduler.
+		max_fps: Max. render frame rate, for outputs that keep their content (i.e. ObjectTexture). 0 means no limit.
+		geometry: Geometry store of the widgets, if enabled. See: use_geometry_store().
+		animator: Property animations of the widgets. See: Animator.
 	"""
 	def __init__(self, styleFile, output=None, virtual_width=1280, virtual_height=720):
 		self.__output = output if output is not None else Viewport(render.getWindowWidth(), render.getWindowHeight())
@@ -31,11 +45,19 @@ class TUI:
 
 		self.event_handler = EventHandler()
 		self.renderer = Renderer(self)
+		self.dispatcher = Dispatcher()
+		self.coalescer = ChangeCoalescer()
+		self.stats = FrameStats()
 
 		self.widgets = []
 		self.focused = None
 
 		self.global_style = Style(styleFile)
+		self.style_watcher = None
+		self.priority = 0
+		self.max_fps = 0
+		self.geometry = None
+		self.animator = Animator(self)
 
 		self.px = 0
 		self.py = 0
@@ -53,9 +75,102 @@ class TUI:
 			widget_list = self.widgets
 		for w in widget_list:
 			w.style = self.global_style
+			w.invalidate()
 			if hasattr(w, "children"):
 				self.refresh(w.children)
 
+	def reload_style(self, styleFile=None):
+		"""
+		Reloads the global style, redrawing only the widgets affected.
+		See: Style.reload
+		Args:
+			styleFile: New style file. None reloads the current one.
+		"""
+		self.__apply_style_changes(self.global_style.reload(styleFile))
+
+	def watch_style(self, enabled=True, interval=0.5):
+		"""
+		Reloads the global style when its files are saved. For live editing.
+		Args:
+			enabled: Enable/Disable watching.
+			interval: Time between checks, in seconds.
+		"""
+		self.style_watcher = StyleWatcher(self.global_style, interval) if enabled else None
+
+	def __apply_style_changes(self, changed):
+		if not changed:
+			return
+		if "font" in changed:
+			## Text sizes change
+			self.refresh()
+			return
+		colors = "text_color" in changed or "disabled_text_color" in changed
+		stack = list(self.widgets)
+		while stack:
+			w = stack.pop()
+			if colors or (getattr(w, "cache_as_layer", False) and not w.layer_regions.isdisjoint(changed)):
+				w.invalidate_render()
+			stack.extend(getattr(w, "children", []))
+
+	def use_geometry_store(self, enabled=True):
+		"""
+		Keeps the bounds of the widgets in a GeometryStore, so their world
+		bounds are computed all at once, and widget_at()/widgets_in() are
+		array operations. For systems with lots of widgets.
+		Args:
+			enabled: Enable/Disable the store.
+		"""
+		if enabled and self.geometry is None:
+			self.geometry = GeometryStore(max(256, len(self.widgets)))
+			for w in self.widgets:
+				self.geometry.add(w)
+		elif not enabled and self.geometry is not None:
+			for w in self.widgets:
+				self.geometry.remove(w)
+			self.geometry = None
+
+	def widget_at(self, x, y):
+		"""
+		Finds the topmost visible widget under a point.
+		Args:
+			x: X, in output (corrected) coordinates.
+			y: Y, in output (corrected) coordinates.
+		Returns:
+			A widget or None.
+		"""
+		x /= self.x_scaling
+		y /= self.y_scaling
+		if self.geometry is not None:
+			hits = self.geometry.hit_test(x, y)
+			return hits[0] if hits else None
+		hits = self.__find(lambda b: b.has_point(x, y))
+		return hits[0] if hits else None
+
+	def widgets_in(self, x, y, w, h):
+		"""
+		Finds the visible widgets overlapping a rectangle, in virtual coordinates.
+		Returns:
+			List of widgets, the deepest first.
+		"""
+		if self.geometry is not None:
+			return self.geometry.cull(x, y, w, h)
+		r = Rect(x, y, w, h)
+		return self.__find(lambda b: b.intersects(r))
+
+	def __find(self, test):
+		"""Python version of the GeometryStore queries."""
+		found = []
+		for w in self.widgets:
+			depth = 0
+			p = w
+			while p is not None and p.visible:
+				depth += 1
+				p = p.parent
+			if p is None and test(w.get_transformed_bounds()):
+				found.append((depth, w))
+		found.sort(key=lambda e: -e[0])
+		return [w for _, w in found]
+
 	def set_focus(self, widget):
 		"""
 		Set the specified widget (if valid) to focused
@@ -85,6 +200,8 @@ class TUI:
 		widget.style = self.global_style
 		widget.tui = self
 		self.widgets.append(widget)
+		if self.geometry is not None:
+			self.geometry.add(widget)
 		self.event_handler.bind(widget, EVENT_TYPE_FOCUS)
 		self.event_handler.bind(widget, EVENT_TYPE_KEY)
 		self.event_handler.bind(widget, EVENT_TYPE_MOUSE_BUTTON)
@@ -104,6 +221,9 @@ class TUI:
 		self.renderer.output = self.__output
 
 	def render(self):
+		if not self.output.should_render():
+			return
+		self.stats.renders += 1
 		self.output.bind()
 		self.renderer.begin()
 		for w in self.widgets:
@@ -112,12 +232,26 @@ class TUI:
 				b.y -= 1
 				b.h += 1
 				self.renderer.clip_start(*b.packed())
+				self.renderer.z = w.z
 				w.render(self.renderer)
 				self.renderer.clip_end()
+		self.renderer.z = 0
+		self.renderer.flush()
 		self.renderer.end()
 		self.output.unbind()
 
 	def update(self):
+		self.stats.reset()
+		self.output.update()
+
+		if self.style_watcher is not None:
+			self.__apply_style_changes(self.style_watcher.poll())
+
+		## Results of off-tick listeners
+		self.dispatcher.drain()
+
+		self.animator.update()
+
 		for w in self.widgets:
 			if w.parent is None:
 				w.update()
@@ -136,16 +270,16 @@ class TUI:
 				mods.append(ev)
 
 		mx, my, on_screen = self.output.get_mouse_position()
-		mbe = MouseButtonEvent(0, 0, mx, my)
 		for e in mouse_button_events:
-			mbe.modifiers = mods
-			mbe.button = e
+			## A new event each time: off-tick listeners may still hold the previous one
 			if logic.mouse.inputs[e].activated and on_screen:
-				mbe.status = True
-				self.event_handler.send(mbe)
+				mbe = MouseButtonEvent(e, True, mx, my)
 			elif logic.mouse.inputs[e].released and on_screen:
-				mbe.status = False
-				self.event_handler.send(mbe)
+				mbe = MouseButtonEvent(e, False, mx, my)
+			else:
+				continue
+			mbe.modifiers = list(mods)
+			self.event_handler.send(mbe)
 
 		## Mouse motion event
 		if on_screen:
@@ -174,7 +308,7 @@ class TUI:
 				if logic.keyboard.inputs[i].activated:
 					c = events.EventToCharacter(i, shift)
 					if len(c) > 0:
-						self.event_handler.send(TextEvent(c))
+						self.event_handler.send(TextEvent(c, mods))
 				
 				# Key Event
 				if logic.keyboard.inputs[i].activated:
@@ -187,6 +321,9 @@ class TUI:
 			except KeyError:
 				continue
 
+		## Coalesced change notifications
+		self.coalescer.flush()
+
 	@property
 	def x_scaling(self):
 		"""X aspect ratio between the output width and the virtual width."""
@@ -202,30 +339,41 @@ class TUI:
 		"""Virtual aspect ratio."""
 		return self.virtual_width / self.virtual_height
 
-	@staticmethod
-	def __tui_render():
-		if not hasattr(logic, "tuis"):
-			return
-		for scene, tui in logic.tuis.items():
-			tui.render()
-
 	@staticmethod
 	def main_loop():
-		"""Update all the systems registered."""
+		"""
+		Update all the systems registered. Also loads the lazy images
+		requested in the last frame and trims the texture memory, once for
+		all of them. See: TextureManager.
+		"""
 		if not hasattr(logic, "tuis"):
 			return
+		dropped = scheduler.prune()
+		for obj in [o for o, tui in logic.tuis.items() if tui in dropped]:
+			del logic.tuis[obj]
+		for tui in dropped:
+			tui.dispatcher.shutdown()
 		for scene, tui in logic.tuis.items():
 			tui.update()
+		textures.load()
+		textures.trim()
 
 	@staticmethod
-	def get_tui(obj, styleFile, width=1280, height=720):
-		"""Gets or creates a system from an object or a scene."""
+	def get_tui(obj, styleFile, width=1280, height=720, adaptive=None, priority=0, max_fps=0):
+		"""
+		Gets or creates a system from an object or a scene.
+		It's rendered in the post-draw of its scene. See: RenderScheduler.
+		Args:
+			adaptive: For objects, adapt the resolution to their size on the screen. See: ObjectTexture.
+				None uses the "adaptive_resolution" key of the style file (off if missing).
+			priority: Render order among the systems of the scene (higher is drawn on top).
+			max_fps: Max. render frame rate of object outputs. 0 means no limit.
+		"""
 		if not isinstance(obj, types.KX_Scene) and not isinstance(obj, types.KX_GameObject):
 			raise ValueError("Object must be a KX_Scene or a KX_GameObject.")
 			return
 		if not hasattr(logic, "tuis"):
 			logic.tuis = {}
-			logic.tui_scenes = []
 
 		if styleFile is None:
 			raise ValueError("Style file must not be None.")
@@ -236,19 +384,18 @@ class TUI:
 			sfile = json.load(f)
 			if "resolution" in sfile:
 				resolution = int(sfile["resolution"])
+			if adaptive is None and "adaptive_resolution" in sfile:
+				adaptive = bool(sfile["adaptive_resolution"])
 
-		scene = None
-		w = width * resolution
-		h = height * resolution
-		if isinstance(obj, types.KX_Scene):
-			scene = obj
-			output = Viewport(w, h)
-		else:
-			scene = obj.scene
-			output = ObjectTexture(obj, w, h)
 		if obj not in logic.tuis:
-			logic.tuis[obj] = TUI(styleFile, output, width, height)
-			if scene not in logic.tui_scenes:
-				scene.post_draw.append(TUI.__tui_render)
-				logic.tui_scenes.append(scene)
+			w = width * resolution
+			h = height * resolution
+			if isinstance(obj, types.KX_Scene):
+				scene = obj
+				output = Viewport(w, h)
+			else:
+				scene = obj.scene
+				output = ObjectTexture(obj, w, h, adaptive=bool(adaptive))
+			tui = logic.tuis[obj] = TUI(styleFile, output, width, height)
+			scheduler.add(tui, scene, priority, max_fps)
 		return logic.tuis[obj]
\ No newline at end of file
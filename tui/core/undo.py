@@ -0,0 +1,157 @@
+"""
+File: core/undo.py
+Description: Undo/Redo of text edits
+Author:	Diego Lopes (TwisterGE/DCubix) < diego95lopes@gmail.com >
+"""
+
+from collections import deque
+
+UNDO_INSERT = 0
+UNDO_DELETE = 1
+
+## Approximate memory used by a record, besides its text
+UNDO_RECORD_OVERHEAD = 64
+
+class UndoStack:
+	"""
+	Bounded undo/redo log of text edits.
+	Edits are stored as insert/delete records (position + text), never as
+	snapshots, so undoing costs the size of the edit, not of the text.
+	Consecutive typing or erasing is merged into a single record, and the
+	oldest records are dropped when the memory limit is exceeded.
+	Attributes:
+		max_bytes: Memory limit, in bytes.
+		size: Estimated memory used by the records, in bytes.
+	"""
+	def __init__(self, max_bytes=64 * 1024):
+		self.max_bytes = max_bytes
+		self.size = 0
+
+		self.__undo = deque()
+		self.__redo = deque()
+		self.__sealed = True
+		self.__applying = False
+
+	@property
+	def can_undo(self):
+		return len(self.__undo) > 0
+
+	@property
+	def can_redo(self):
+		return len(self.__redo) > 0
+
+	@staticmethod
+	def __cost(text):
+		return UNDO_RECORD_OVERHEAD + len(text.encode("utf-8"))
+
+	def clear(self):
+		"""Forgets all the edits."""
+		self.__undo.clear()
+		self.__redo.clear()
+		self.size = 0
+		self.__sealed = True
+
+	def seal(self):
+		"""Stops merging edits into the last record. i.e: The caret moved."""
+		self.__sealed = True
+
+	def record_insert(self, pos, text):
+		"""Records an insertion of text at pos."""
+		if self.__applying or len(text) == 0:
+			return
+		self.__clear_redo()
+		last = self.__undo[-1] if self.__undo else None
+		if not self.__sealed and last is not None and last[0] == UNDO_INSERT and \
+				pos == last[1] + len(last[2]) and text != "\n" and \
+				not (last[2][-1].isspace() and not text.isspace()):
+			self.size -= self.__cost(last[2])
+			last[2] += text
+			self.size += self.__cost(last[2])
+		else:
+			self.__push(self.__undo, [UNDO_INSERT, pos, text])
+		self.__sealed = False
+		self.__trim()
+
+	def record_delete(self, pos, text):
+		"""Records the deletion of text, which was at pos."""
+		if self.__applying or len(text) == 0:
+			return
+		self.__clear_redo()
+		last = self.__undo[-1] if self.__undo else None
+		if not self.__sealed and last is not None and last[0] == UNDO_DELETE and "\n" not in text:
+			if pos + len(text) == last[1]:
+				## Backspace
+				self.size -= self.__cost(last[2])
+				last[1] = pos
+				last[2] = text + last[2]
+				self.size += self.__cost(last[2])
+				self.__trim()
+				return
+			elif pos == last[1]:
+				## Delete
+				self.size -= self.__cost(last[2])
+				last[2] += text
+				self.size += self.__cost(last[2])
+				self.__trim()
+				return
+		self.__push(self.__undo, [UNDO_DELETE, pos, text])
+		self.__sealed = False
+		self.__trim()
+
+	def undo(self, insert, delete):
+		"""
+		Reverts the last edit.
+		Args:
+			insert: Called as insert(pos, text) to restore deleted text.
+			delete: Called as delete(pos, length) to remove inserted text.
+		Returns:
+			The caret position after the edit, or -1 if there was nothing to undo.
+		"""
+		if not self.__undo:
+			return -1
+		rec = self.__pop(self.__undo)
+		self.__apply(rec[0] == UNDO_DELETE, rec, insert, delete)
+		self.__push(self.__redo, rec)
+		self.__sealed = True
+		return rec[1] + len(rec[2]) if rec[0] == UNDO_DELETE else rec[1]
+
+	def redo(self, insert, delete):
+		"""
+		Applies the last reverted edit again. See: undo().
+		Returns:
+			The caret position after the edit, or -1 if there was nothing to redo.
+		"""
+		if not self.__redo:
+			return -1
+		rec = self.__pop(self.__redo)
+		self.__apply(rec[0] == UNDO_INSERT, rec, insert, delete)
+		self.__push(self.__undo, rec)
+		self.__sealed = True
+		return rec[1] + len(rec[2]) if rec[0] == UNDO_INSERT else rec[1]
+
+	def __apply(self, inserting, rec, insert, delete):
+		self.__applying = True
+		try:
+			if inserting:
+				insert(rec[1], rec[2])
+			else:
+				delete(rec[1], len(rec[2]))
+		finally:
+			self.__applying = False
+
+	def __push(self, stack, rec):
+		stack.append(rec)
+		self.size += self.__cost(rec[2])
+
+	def __pop(self, stack):
+		rec = stack.pop()
+		self.size -= self.__cost(rec[2])
+		return rec
+
+	def __clear_redo(self):
+		while self.__redo:
+			self.__pop(self.__redo)
+
+	def __trim(self):
+		while self.size > self.max_bytes and len(self.__undo) > 1:
+			self.size -= self.__cost(self.__undo.popleft()[2])
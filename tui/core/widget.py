@@ -17,28 +17,119 @@ class Widget(EventSubscriber):
 		visible: Visibility status.
 		focused: Focus status.
 		auto_size: Automatic size calculation.
-		margin: Margin between this and the next widget.
+		margin: Margin between this and the next widget. Call invalidate() after changing it in place.
 		style: Visual style of the widget.
 		id: Identification for this widget.
 		layout_args: Arguments for the container (parent) layout.
+		coalesce: Merge the change notifications of a tick into one. See: ChangeCoalescer.
+		max_rate: Max. coalesced notifications per second. 0 means once per tick.
+		needs_measure: Whether the preferred size must be computed again. See: invalidate().
+		needs_layout: Whether the children must be arranged again. See: invalidate_layout().
+		arranging: Whether this container is performing its layout.
+		layout_cache: Sizes measured by layouts, keyed by the available size. Cleared on invalidation.
+		needs_render: Whether the widget looks different since it was last drawn. See: invalidate_render().
+		hovered: Whether the mouse is over the widget.
+		clicked: Whether the widget is being clicked.
+		z: Draw layer, relative to the parent. Higher layers are drawn on top
+			when the renderer is queued. See: Renderer.queued.
+		geometry: GeometryStore holding the bounds of this widget, if any. See: TUI.use_geometry_store().
+		geometry_index: Row of this widget in the geometry store.
 		tui: GUI system.
 	"""
 	def __init__(self):
 		super().__init__()
 
-		self.parent = None
+		self.geometry = None
+		self.geometry_index = None
+		self.__parent = None
+		self.needs_measure = True
+		self.needs_layout = True
+		self.arranging = False
+		self.layout_cache = {}
+		self.needs_render = True
+		self.__preferred_size = None
 
 		self.bounds = Rect(0, 0, 50, 50)
-		self.visible = True
-		self.focused = False
+		self.__visible = True
+		self.__focused = False
+		self.__hovered = False
+		self.__clicked = False
 		self.auto_size = False
-		self.margin = [2, 2, 2, 2]
+		self.__margin = [2, 2, 2, 2]
 		self.style = None
 		self.id = ""
 		self.layout_args = -1
+		self.coalesce = False
+		self.max_rate = 0
+		self.z = 0
 
 		self.tui = None
 
+	@property
+	def parent(self):
+		"""Get/Set the parent widget (container)."""
+		return self.__parent
+
+	@parent.setter
+	def parent(self, p):
+		self.__parent = p
+		if self.geometry is not None:
+			self.geometry.set_parent(self, p)
+
+	@property
+	def visible(self):
+		"""Get/Set the visibility status."""
+		return self.__visible
+
+	@visible.setter
+	def visible(self, v):
+		if v != self.__visible:
+			self.__visible = v
+			if self.geometry is not None:
+				self.geometry.set_visible(self, v)
+			self.invalidate()
+
+	@property
+	def focused(self):
+		"""Get/Set the focus status."""
+		return self.__focused
+
+	@focused.setter
+	def focused(self, f):
+		if f != self.__focused:
+			self.__focused = f
+			self.invalidate_render()
+
+	@property
+	def hovered(self):
+		return self.__hovered
+
+	@hovered.setter
+	def hovered(self, h):
+		if h != self.__hovered:
+			self.__hovered = h
+			self.invalidate_render()
+
+	@property
+	def clicked(self):
+		return self.__clicked
+
+	@clicked.setter
+	def clicked(self, c):
+		if c != self.__clicked:
+			self.__clicked = c
+			self.invalidate_render()
+
+	@property
+	def margin(self):
+		"""Get/Set the margin. [left, right, bottom, top]"""
+		return self.__margin
+
+	@margin.setter
+	def margin(self, m):
+		self.__margin = m
+		self.invalidate()
+
 	@property
 	def enabled(self):
 		"""
@@ -52,7 +143,49 @@ class Widget(EventSubscriber):
 
 	@enabled.setter
 	def enabled(self, e):
-		self.var_enabled = e
+		if e != self.var_enabled:
+			self.var_enabled = e
+			self.invalidate_render()
+
+	def notify(self, listeners, *args):
+		"""
+		Calls a list of listeners through the GUI dispatcher. See: Dispatcher.
+		Args:
+			listeners: List of listeners.
+			args: Arguments passed to each listener.
+		"""
+		for listener in listeners:
+			if self.tui is not None:
+				self.tui.dispatcher.dispatch(listener, *args)
+			else:
+				listener(*args)
+
+	def notify_change(self, listeners, prev):
+		"""
+		Notifies a value change, coalescing it if requested.
+		Args:
+			listeners: List of listeners.
+			prev: The value before the change.
+		"""
+		if self.tui is not None:
+			self.tui.coalescer.change(self, listeners, prev)
+		else:
+			self.notify(listeners, self, prev)
+
+	def begin_interaction(self):
+		"""Marks the start of a user interaction. i.e: Dragging."""
+		if self.tui is not None:
+			self.tui.coalescer.begin(self)
+
+	def commit_interaction(self, listeners):
+		"""
+		Marks the end of a user interaction, calling the listeners
+		with the value from before it, if anything changed.
+		Args:
+			listeners: List of commit listeners.
+		"""
+		if self.tui is not None:
+			self.tui.coalescer.commit(self, listeners)
 
 	def request_focus(self):
 		"""Call the GUI manager out for attention."""
@@ -63,6 +196,8 @@ class Widget(EventSubscriber):
 		Returns:
 			The transformed (parent + this) bounds without parent intersection.
 		"""
+		if self.geometry is not None:
+			return self.geometry.world_bounds(self)
 		rect = Rect(0, 0, 0, 0)
 		if self.parent is not None:
 			rect = self.parent.get_transformed_bounds_no_intersect()
@@ -101,21 +236,83 @@ class Widget(EventSubscriber):
 			w: The new width.
 			h: The new height.
 		"""
+		if self.bounds.w == w and self.bounds.h == h:
+			return
 		self.bounds.w = w
 		self.bounds.h = h
+		self.needs_layout = True
+		self.invalidate_render()
+		if self.parent is not None and not self.parent.arranging:
+			self.parent.invalidate_layout()
 	
 	def get_preferred_size(self):
 		"""Gets the preferred size of the widget."""
 		return (self.bounds.w, self.bounds.h)
 
+	def measure(self):
+		"""
+		Returns:
+			The preferred size, computed again only if it was invalidated.
+		"""
+		if self.needs_measure or self.__preferred_size is None:
+			self.__preferred_size = self.get_preferred_size()
+			self.needs_measure = False
+			if self.tui is not None:
+				self.tui.stats.measures += 1
+		return self.__preferred_size
+
+	def invalidate(self):
+		"""
+		Marks the preferred size of this widget, and the layout of its
+		containers, as outdated. Called when the size, visibility, text or
+		margin change. Call it after changing anything else that affects them.
+		"""
+		self.needs_measure = True
+		self.layout_cache.clear()
+		self.invalidate_render()
+		if self.parent is not None and not self.parent.arranging:
+			self.parent.invalidate_layout()
+
+	def invalidate_render(self):
+		"""
+		Marks this widget, and its containers, as looking different. Cached
+		layers containing it are drawn again. See: Panel.cache_as_layer.
+		Called when the visual state changes (i.e: hover, value, text).
+		"""
+		w = self
+		while w is not None:
+			w.needs_render = True
+			w = w.parent
+
+	def invalidate_layout(self):
+		"""Marks the layout of this container, and of its ancestors, as outdated."""
+		w = self
+		while w is not None:
+			w.needs_layout = True
+			w.needs_measure = True
+			w.layout_cache.clear()
+			w = w.parent
+
+	def update_layout(self):
+		"""Arranges the children, if the layout was invalidated. See: Panel."""
+		self.needs_layout = False
+
 	def render(self, renderer):
 		#renderer.rectangle(*self.get_corrected_bounds_no_intersect().packed(-3), color=(1.0, 0.0, 0.0, 1.0), wire=True)
 		#renderer.rectangle(*self.get_corrected_bounds_no_intersect().packed(-2), color=(1.0, 0.0, 0.0, 1.0), wire=True)
 		#renderer.rectangle(*self.get_corrected_bounds_no_intersect().packed(-1), color=(1.0, 0.0, 0.0, 1.0), wire=True)
 		pass
+
+	def prefetch(self):
+		"""
+		Hints that this widget is about to be shown (i.e. the next tab), so its
+		lazy images are loaded in the background. See: ImageTexture.
+		"""
+		pass
 	
 	def update(self):
-		self.set_size(*self.get_preferred_size())
+		if self.needs_measure:
+			self.set_size(*self.measure())
 
 	def handle_events(self, event):
 		if event.get_type() == EVENT_TYPE_MOUSE_BUTTON and self.enabled and self.visible:
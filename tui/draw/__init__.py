@@ -1,5 +1,8 @@
 from .output import *
 from .texture import *
+from .framebuffer import *
+from .picking import *
 from .shader import *
 from .renderer import *
-from .rect import *
\ No newline at end of file
+from .rect import *
+from .renderqueue import *
\ No newline at end of file
@@ -0,0 +1,148 @@
+"""
+File: draw/framebuffer.py
+Description: Offscreen render targets
+Author:	Diego Lopes (TwisterGE/DCubix) < diego95lopes@gmail.com >
+"""
+
+from collections import OrderedDict
+from OpenGL import GL
+from .texture import Texture
+
+from bgl import *
+
+class FrameBuffer:
+	"""
+	Offscreen render target, backed by a texture.
+	Attributes:
+		width: Width, in pixels.
+		height: Height, in pixels.
+		texture: Color texture.
+	"""
+	def __init__(self, width, height):
+		self.width = width
+		self.height = height
+		self.texture = Texture(width, height)
+
+		self.bindCode = Buffer(GL_INT, 1)
+		glGenFramebuffers(1, self.bindCode)
+
+		old = GL.glGetIntegerv(GL_FRAMEBUFFER_BINDING)
+		glBindFramebuffer(GL_FRAMEBUFFER, self.bindCode[0])
+		glFramebufferTexture2D(
+			GL_FRAMEBUFFER,
+			GL_COLOR_ATTACHMENT0,
+			GL_TEXTURE_2D,
+			self.texture.bindCode, 0
+		)
+		glBindFramebuffer(GL_FRAMEBUFFER, old)
+
+		self.__old_fbo = 0
+		self.__old_viewport = None
+
+	@property
+	def size_bytes(self):
+		"""Video memory used, in bytes."""
+		return self.width * self.height * 4
+
+	def bind(self, clear_color=(0.0, 0.0, 0.0, 0.0)):
+		"""Redirects the rendering to this target, clearing it. unbind() restores the previous one."""
+		self.__old_fbo = GL.glGetIntegerv(GL_FRAMEBUFFER_BINDING)
+		self.__old_viewport = GL.glGetIntegerv(GL_VIEWPORT)
+		glBindFramebuffer(GL_FRAMEBUFFER, self.bindCode[0])
+		glViewport(0, 0, self.width, self.height)
+		glClearColor(*clear_color)
+		glClear(GL_COLOR_BUFFER_BIT)
+
+	def unbind(self):
+		glBindFramebuffer(GL_FRAMEBUFFER, self.__old_fbo)
+		if self.__old_viewport is not None:
+			glViewport(*[int(v) for v in self.__old_viewport])
+
+	def __del__(self):
+		glDeleteFramebuffers(1, self.bindCode)
+
+class LayerCache:
+	"""
+	Offscreen layers of widgets, with a memory budget.
+	When a new layer doesn't fit, the least recently used ones are released.
+	Attributes:
+		budget: Max. video memory used by the layers, in bytes.
+		size: Video memory used by the layers, in bytes.
+	"""
+	def __init__(self, budget=32 * 1024 * 1024):
+		self.budget = budget
+		self.size = 0
+		self.__layers = OrderedDict()
+
+	def __len__(self):
+		return len(self.__layers)
+
+	def get(self, widget, width, height):
+		"""
+		Gets the layer of a widget, creating it if needed.
+		Returns:
+			The FrameBuffer and whether it's new (empty), or (None, False) if it doesn't fit in the budget.
+		"""
+		fb = self.__layers.get(widget, None)
+		if fb is not None:
+			if fb.width == width and fb.height == height:
+				self.__layers.move_to_end(widget)
+				return (fb, False)
+			self.release(widget)
+
+		need = width * height * 4
+		if need > self.budget or width < 1 or height < 1:
+			return (None, False)
+		while self.size + need > self.budget and self.__layers:
+			_, old = self.__layers.popitem(last=False)
+			self.size -= old.size_bytes
+
+		fb = FrameBuffer(width, height)
+		self.__layers[widget] = fb
+		self.size += need
+		return (fb, True)
+
+	def release(self, widget):
+		"""Releases the layer of a widget, if any."""
+		fb = self.__layers.pop(widget, None)
+		if fb is not None:
+			self.size -= fb.size_bytes
+
+	def clear(self):
+		self.__layers.clear()
+		self.size = 0
+
+class TargetPool:
+	"""
+	Pool of render targets, shared by the outputs that change their size.
+	Released targets are kept (up to keep per size) to be reused, instead
+	of being deleted and created again.
+	Attributes:
+		keep: Max. number of free targets kept for each size.
+	"""
+	def __init__(self, keep=2):
+		self.keep = keep
+		self.__free = {}
+
+	def acquire(self, width, height):
+		"""
+		Returns:
+			A FrameBuffer of the given size, reused if possible.
+		"""
+		free = self.__free.get((width, height), None)
+		if free:
+			return free.pop()
+		return FrameBuffer(width, height)
+
+	def release(self, fb):
+		"""Gives a target back to the pool."""
+		if fb is None:
+			return
+		free = self.__free.setdefault((fb.width, fb.height), [])
+		if len(free) < self.keep and fb not in free:
+			free.append(fb)
+
+	def clear(self):
+		self.__free.clear()
+
+targets = TargetPool()
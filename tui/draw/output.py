@@ -7,6 +7,8 @@ Author:	Diego Lopes (TwisterGE/DCubix) < diego95lopes@gmail.com >
 from bge import types, logic, events, render
 from OpenGL import GL
 from .texture import Texture
+from .picking import picking
+from .framebuffer import targets
 
 from bgl import *
 
@@ -16,15 +18,28 @@ class Output:
 	Attributes:
 		width: Output width.
 		height: Output height.
+		persistent: Whether the last frame stays visible when a frame isn't rendered.
 	"""
 	def __init__(self):
 		self.width = 1
 		self.height = 1
+		self.persistent = False
 
 	def get_mouse_position(self):
 		"""Gets the mouse position on this output."""
 		return (0, 0)
 
+	def update(self):
+		"""Called every tick, before the widgets are updated."""
+		pass
+
+	def should_render(self):
+		"""
+		Returns:
+			Whether this frame should be rendered. Called once per frame.
+		"""
+		return True
+
 	def bind(self):
 		"""Binds this output for rendering."""
 		pass
@@ -51,39 +66,52 @@ class ObjectTexture(Output):
 	"""
 	Object output.
 	Outputs the rendering to a textured object.
+	In adaptive mode, the size of the object on the screen is estimated
+	every tick (from its bounding box) and the render target is picked from
+	levels, fractions of the full size, taken from a shared TargetPool.
+	Going up happens right away, so text is sharp when the player walks up,
+	but going down waits for hold ticks. Screens smaller than the lowest
+	level, or out of view, are also rendered less often.
 	Attributes:
 		object: Target object.
 		background: Clear color.
 		ray_dist: Max. distance for clicking.
+		picking: Mouse picking service. See: PickingService.
+		full_width: Width at full resolution.
+		full_height: Height at full resolution.
+		adaptive: Adapt the resolution to the size on the screen.
+		levels: Resolution levels (fractions of the full size), in ascending order.
+		level: Current resolution level.
+		hold: Ticks a lower level must be enough before switching down.
+		slow_interval: Render interval (in frames) of tiny or hidden screens.
+		render_interval: Current render interval, in frames.
+		pool: Render target pool.
 	"""
-	def __init__(self, obj, width, height, ray_dist=20.0):
+	def __init__(self, obj, width, height, ray_dist=20.0, picking=picking, adaptive=False, pool=targets):
 		super().__init__()
 		self.object = obj
 		self.width = width
 		self.height = height
+		self.full_width = width
+		self.full_height = height
+		self.persistent = True
 		self.background = (0.0, 0.0, 0.0, 0.0)
 		self.ray_dist = ray_dist
+		self.picking = picking
+		self.picking.register(self)
 
-		self.texture = Texture(width, height)
-		
-		"""
-		GLint drawFboId = 0, readFboId = 0;
-glGetIntegerv(GL_DRAW_FRAMEBUFFER_BINDING, &drawFboId);
-glGetIntegerv(GL_READ_FRAMEBUFFER_BINDING, &readFboId);
-		"""
+		self.adaptive = adaptive
+		self.levels = (0.125, 0.25, 0.5, 1.0)
+		self.level = 1.0
+		self.hold = 30
+		self.slow_interval = 4
+		self.render_interval = 1
+		self.pool = pool
 
-		oldfbdraw = GL.glGetIntegerv(GL_FRAMEBUFFER_BINDING)
-
-		self.bindCode = Buffer(GL_INT, 1)
-		glGenFramebuffers(1, self.bindCode)
-		glBindFramebuffer(GL_FRAMEBUFFER, self.bindCode[0])
-		glFramebufferTexture2D(
-			GL_FRAMEBUFFER,
-			GL_COLOR_ATTACHMENT0,
-			GL_TEXTURE_2D,
-			self.texture.bindCode, 0
-		)
-		glBindFramebuffer(GL_FRAMEBUFFER, oldfbdraw)
+		self.__target = self.pool.acquire(width, height)
+		self.__corners = None
+		self.__lower_ticks = 0
+		self.__frame = 0
 
 		VS = '''
 		void main() {
@@ -109,17 +137,116 @@ glGetIntegerv(GL_READ_FRAMEBUFFER_BINDING, &readFboId);
 		self.__ly = 0
 		self.__oldfbdraw = 0
 
+	@property
+	def texture(self):
+		"""Texture being rendered to."""
+		return self.__target.texture
+
+	@property
+	def bindCode(self):
+		return self.__target.bindCode
+
+	def __local_corners(self):
+		"""
+		Returns:
+			The corners of the bounding box of the object mesh, in local space.
+		"""
+		if self.__corners is None:
+			mesh = self.object.meshes[0]
+			lo = [float("inf")] * 3
+			hi = [float("-inf")] * 3
+			for m in range(mesh.numMaterials):
+				for i in range(mesh.getVertexArrayLength(m)):
+					p = mesh.getVertex(m, i).XYZ
+					for a in range(3):
+						lo[a] = min(lo[a], p[a])
+						hi[a] = max(hi[a], p[a])
+			self.__corners = [
+				(x, y, z) for x in (lo[0], hi[0]) for y in (lo[1], hi[1]) for z in (lo[2], hi[2])
+			]
+		return self.__corners
+
+	def screen_coverage(self):
+		"""
+		Estimates the size of the object on the screen.
+		Returns:
+			The ratio between the projected size and the full resolution
+			(1.0 when it's close/behind the camera), or 0.0 if it's out of view.
+		"""
+		cam = self.object.scene.active_camera
+		m = self.object.worldTransform
+		corners = [
+			[m[r][0] * x + m[r][1] * y + m[r][2] * z + m[r][3] for r in range(3)]
+			for x, y, z in self.__local_corners()
+		]
+		if cam.boxInsideFrustum(corners) == cam.OUTSIDE:
+			return 0.0
+
+		v = cam.world_to_camera
+		xs = []
+		ys = []
+		for c in corners:
+			if v[2][0] * c[0] + v[2][1] * c[1] + v[2][2] * c[2] + v[2][3] >= -cam.near:
+				## Crossing the near plane: as close as it gets
+				return 1.0
+			sx, sy = cam.getScreenPosition(c)
+			xs.append(sx)
+			ys.append(sy)
+		pw = (max(xs) - min(xs)) * render.getWindowWidth()
+		ph = (max(ys) - min(ys)) * render.getWindowHeight()
+		return max(pw / self.full_width, ph / self.full_height)
+
+	def update(self):
+		if not self.adaptive:
+			return
+		coverage = self.screen_coverage()
+		self.render_interval = self.slow_interval if coverage < self.levels[0] * 0.5 else 1
+
+		wanted = self.levels[-1]
+		for lv in self.levels:
+			if lv >= coverage:
+				wanted = lv
+				break
+
+		if wanted > self.level:
+			self.__lower_ticks = 0
+			self.set_level(wanted)
+		elif wanted < self.level:
+			## Hysteresis: the lower level must be clearly enough, for a while
+			below = [lv for lv in self.levels if lv < self.level]
+			if below and coverage < below[-1] * 0.75:
+				self.__lower_ticks += 1
+				if self.__lower_ticks >= self.hold:
+					self.__lower_ticks = 0
+					self.set_level(below[-1])
+			else:
+				self.__lower_ticks = 0
+		else:
+			self.__lower_ticks = 0
+
+	def set_level(self, level):
+		"""Switches to another resolution level, swapping the render target."""
+		w = max(1, int(self.full_width * level))
+		h = max(1, int(self.full_height * level))
+		self.level = level
+		if w == self.width and h == self.height:
+			return
+		self.pool.release(self.__target)
+		self.__target = self.pool.acquire(w, h)
+		self.width = w
+		self.height = h
+		self.__lx = 0
+		self.__ly = 0
+		self.__frame = 0
+
+	def should_render(self):
+		self.__frame += 1
+		return self.render_interval <= 1 or self.__frame % self.render_interval == 1
+
 	def get_mouse_position(self):
-		mx = logic.mouse.inputs[events.MOUSEX].values[-1] / render.getWindowWidth()
-		my = logic.mouse.inputs[events.MOUSEY].values[-1] / render.getWindowHeight()
 		cam = self.object.scene.active_camera
-		svec = cam.getScreenVect(mx, my)
-		camPos = cam.worldPosition
-		z = self.ray_dist
-		projectedPos = camPos - svec * z
-		
-		ob, _, _, _, uv = cam.rayCast(projectedPos, None, self.ray_dist, "", True, False, 2)
-		if ob == self.object:
+		ob, dist, uv = self.picking.pick(cam)
+		if ob == self.object and dist <= self.ray_dist and uv is not None:
 			mx = uv.x * self.width
 			my = uv.y * self.height
 			self.__lx = mx
@@ -145,4 +272,5 @@ glGetIntegerv(GL_READ_FRAMEBUFFER_BINDING, &readFboId);
 			mat.getShader().setSampler("tex0", 0)
 
 	def __del__(self):
-		glDeleteFramebuffers(1, self.bindCode)
+		self.picking.unregister(self)
+		self.pool.release(self.__target)
@@ -0,0 +1,60 @@
+"""
+File: draw/picking.py
+Description: Shared mouse picking for in-world outputs
+Author:	Diego Lopes (TwisterGE/DCubix) < diego95lopes@gmail.com >
+"""
+
+import weakref
+from bge import logic, events, render
+
+class PickingService:
+	"""
+	Mouse picking shared by all the in-world outputs (ObjectTexture).
+	Casts at most one ray per camera, reaching the farthest output, and
+	reuses the hit while the mouse and the camera don't move. Each output
+	then checks whether it was the object hit.
+	Attributes:
+		raycasts: Number of rays cast so far.
+	"""
+	def __init__(self):
+		self.raycasts = 0
+		self.__outputs = weakref.WeakSet()
+		self.__hits = {}
+
+	def register(self, output):
+		"""Registers an output, so the rays reach it."""
+		self.__outputs.add(output)
+
+	def unregister(self, output):
+		self.__outputs.discard(output)
+
+	def invalidate(self):
+		"""Forgets the cached hits. Call it after moving the outputs."""
+		self.__hits.clear()
+
+	def pick(self, camera):
+		"""
+		Gets the object under the mouse, as seen by a camera.
+		Returns:
+			A tuple (object, distance, uv), object being None if nothing was hit.
+		"""
+		mx = logic.mouse.inputs[events.MOUSEX].values[-1] / render.getWindowWidth()
+		my = logic.mouse.inputs[events.MOUSEY].values[-1] / render.getWindowHeight()
+		key = (mx, my, tuple(tuple(row) for row in camera.worldTransform))
+		hit = self.__hits.get(camera, None)
+		if hit is not None and hit[0] == key:
+			return hit[1]
+
+		dist = max([o.ray_dist for o in self.__outputs], default=0.0)
+		svec = camera.getScreenVect(mx, my)
+		cam_pos = camera.worldPosition
+		ob, point, _, _, uv = camera.rayCast(cam_pos - svec * dist, None, dist, "", True, False, 2)
+		self.raycasts += 1
+		res = (None, 0.0, None)
+		if ob is not None:
+			res = (ob, (point - cam_pos).length, uv)
+		self.__hits[camera] = (key, res)
+		return res
+
+## Default service, used by all the ObjectTextures
+picking = PickingService()
@@ -14,18 +14,26 @@ from ctypes import c_void_p
 
 from .shader import ShaderProgram
 from .texture import Texture
+from .framebuffer import LayerCache
+from .renderqueue import *
 from .output import Viewport
 from tui.core.font import Font
 
 from bge import render
 from bgl import *
 
+## Floats per vertex of the shapes
+_SHAPE_STRIDE = 24
+
 class NinePatch:
 	"""
 	9-Slice texture.
 	Best alternative for high quality GUI.
+	Attributes:
+		name: Region name in the style, if any.
 	"""
-	def __init__(self, texture, lp=0, rp=0, bp=0, tp=0, uv=(0, 0, 1, 1)):
+	def __init__(self, texture, lp=0, rp=0, bp=0, tp=0, uv=(0, 0, 1, 1), name=None):
+		self.name = name
 		self.texture = texture
 		self.margin_left = lp
 		self.margin_right = rp
@@ -41,6 +49,44 @@ class NinePatch:
 	def height(self):
 		return self.texture.height * self.uv[3]
 
+class Shape:
+	"""
+	Procedural frame: a rounded rectangle with a fill, a border and a soft
+	shadow, drawn as a single quad by a distance field shader. Styles can
+	declare them instead of image regions. See: Renderer.shape.
+	Attributes:
+		name: Region name in the style, if any.
+		fill: Fill color (r, g, b, a).
+		border_color: Border color (r, g, b, a).
+		border_width: Border width, in pixels. 0 means no border.
+		radius: Corner radius, in pixels.
+		shadow_color: Shadow color (r, g, b, a). Transparent means no shadow.
+		shadow_offset: Shadow offset (x, y), in pixels.
+		shadow_blur: Shadow softness, in pixels.
+		width: Natural width (i.e. for the Slider thumb).
+		height: Natural height.
+	"""
+	def __init__(self, fill=(1, 1, 1, 1), border_color=(0, 0, 0, 1), border_width=0, radius=0,
+				shadow_color=(0, 0, 0, 0), shadow_offset=(0, 0), shadow_blur=0, width=16, height=16, name=None):
+		self.name = name
+		self.fill = fill
+		self.border_color = border_color
+		self.border_width = border_width
+		self.radius = radius
+		self.shadow_color = shadow_color
+		self.shadow_offset = shadow_offset
+		self.shadow_blur = shadow_blur
+		self.width = width
+		self.height = height
+
+	def params(self):
+		"""Everything that affects the look. Used to compare shapes."""
+		return (
+			tuple(self.fill), tuple(self.border_color), self.border_width, self.radius,
+			tuple(self.shadow_color), tuple(self.shadow_offset), self.shadow_blur,
+			self.width, self.height
+		)
+
 class Sprite:
 	def __init__(self, x, y, width, height, uv, color, tex):
 		self.x = x
@@ -68,15 +114,34 @@ class Batch:
 class Renderer:
 	"""
 	Advanced 2D Renderer.
+	Attributes:
+		layers: Offscreen layers of the widgets cached as layers. See: Panel.cache_as_layer.
+		queued: Record the draws, and draw them sorted by render state on flush(),
+			to switch programs and textures less. See: RenderQueue. Quads are
+			clipped on the CPU (uvs included), so only text sticking out of its
+			clip rectangle and custom draws need the scissor.
+		z: Layer of the draws recorded. Higher layers are drawn on top. See: Widget.z.
 	"""
 	def __init__(self, tui):
 		self.tui = tui
 		self.output = tui.output
+		self.layers = LayerCache()
+		self.queued = False
+		self.z = 0
+		self.__queue = RenderQueue()
+		self.__queue_stack = []
+		self.__last_state = None
+		self.__shape_shader = None
 
 		self.__sprites = []
 		self.__batches = []
 		self.__clip_stack = []
 
+		## Offscreen targets: (framebuffer, x, y) of the layer being drawn, and the saved state
+		self.__layer = None
+		self.__layer_stack = []
+		self.__layer_regions = set()
+
 		self.vao = Buffer(GL_INT, 1)
 		glGenVertexArrays(1, self.vao)
 
@@ -142,27 +207,96 @@ class Renderer:
 
 		self.__dtex = Texture(1, 1, numpy.array([255, 255, 255, 255], dtype=numpy.uint8))
 
+		## Quad batching (draw_quads)
+		BVS = """
+		attribute vec2 v_position;
+		attribute vec2 v_texCoord;
+		attribute vec4 v_color;
+		varying vec2 vs_texCoord;
+		varying vec4 vs_color;
+		void main() {
+			gl_Position = gl_ModelViewProjectionMatrix * vec4(v_position, 0.0, 1.0);
+			vs_texCoord = v_texCoord;
+			vs_color = v_color;
+		}
+		"""
+
+		BFS = """
+		varying vec2 vs_texCoord;
+		varying vec4 vs_color;
+		uniform sampler2D tex0;
+		uniform float gray;
+		void main() {
+			vec4 scol = texture2D(tex0, vs_texCoord);
+			if (gray > 0.0) {
+				scol.rgb = dot(scol.rgb, vec3(0.299, 0.587, 0.114));
+			}
+			gl_FragColor = scol * vs_color;
+		}
+		"""
+
+		self.batch_shader = ShaderProgram()
+		self.batch_shader.add(BVS, GL_VERTEX_SHADER)
+		self.batch_shader.add(BFS, GL_FRAGMENT_SHADER)
+		glBindAttribLocation(self.batch_shader.bindCode, 0, "v_position")
+		glBindAttribLocation(self.batch_shader.bindCode, 1, "v_texCoord")
+		glBindAttribLocation(self.batch_shader.bindCode, 2, "v_color")
+		self.batch_shader.link()
+
+		self.batch_vao = Buffer(GL_INT, 1)
+		glGenVertexArrays(1, self.batch_vao)
+
+		self.batch_vbo = Buffer(GL_INT, 1)
+		glGenBuffers(1, self.batch_vbo)
+
+		self.batch_ibo = Buffer(GL_INT, 1)
+		glGenBuffers(1, self.batch_ibo)
+
+		## Capacity, in quads, of the batch buffers
+		self.batch_len = 0
+
+		glBindVertexArray(self.batch_vao[0])
+		glBindBuffer(GL_ARRAY_BUFFER, self.batch_vbo[0])
+		glEnableVertexAttribArray(0)
+		glEnableVertexAttribArray(1)
+		glEnableVertexAttribArray(2)
+		GL.glVertexAttribPointer(0, 2, GL.GL_FLOAT, False, 32, c_void_p(0))
+		GL.glVertexAttribPointer(1, 2, GL.GL_FLOAT, False, 32, c_void_p(8))
+		GL.glVertexAttribPointer(2, 4, GL.GL_FLOAT, False, 32, c_void_p(16))
+		glBindVertexArray(0)
+
 	def begin(self):
 		glEnable(GL_POLYGON_SMOOTH)
 		glEnable(GL_LINE_SMOOTH)
 		glHint(GL_POLYGON_SMOOTH_HINT, GL_NICEST)
 		glHint(GL_LINE_SMOOTH_HINT, GL_NICEST)
 		glEnable(GL_BLEND)
-		glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+		if self.__layer is None:
+			glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+		else:
+			## Layers keep premultiplied colors, with the right alpha
+			GL.glBlendFuncSeparate(GL.GL_SRC_ALPHA, GL.GL_ONE_MINUS_SRC_ALPHA, GL.GL_ONE, GL.GL_ONE_MINUS_SRC_ALPHA)
 
 		glDisable(GL_CULL_FACE)
 		glDisable(GL_LIGHTING)
+		tx, ty, tw, th = self.__target()
 		glMatrixMode(GL_PROJECTION)
 		glLoadIdentity()
-		glOrtho(0, self.output.width, self.output.height, 0, -1, 1)
+		glOrtho(0, tw, th, 0, -1, 1)
 		glMatrixMode(GL_MODELVIEW)
 		glLoadIdentity()
+		glTranslatef(-tx, -ty, 0)
 
 		self.shader.bind()
 		self.shader.get_uniform("tex0").set_sampler(0)
 		glBindVertexArray(self.vao[0])
 
 	def nine_patch_object(self, nine_patch, bx, by, bw, bh, color=(1, 1, 1, 1), gray=False):
+		if self.__layer is not None and nine_patch.name is not None:
+			self.__layer_regions.add(nine_patch.name)
+		if isinstance(nine_patch, Shape):
+			self.shape_object(nine_patch, bx, by, bw, bh, color, gray)
+			return
 		self.nine_patch(
 			nine_patch.texture,
 			bx, by, bw, bh,
@@ -186,6 +320,13 @@ class Renderer:
 		iw = tex.width
 		ih = tex.height
 
+		## Queued, the 9 quads are recorded together (and clipped on the CPU)
+		quads = []
+		if self.queued:
+			draw = lambda tex, x, y, w, h, uv, color, gray: quads.append(((x, y, w, h), uv))
+		else:
+			draw = self.draw
+
 		luv = lp / iw
 		ruv = rp / iw
 		buv = bp / ih
@@ -193,7 +334,7 @@ class Renderer:
 
 		## Top Left
 		if lp > 0 and tp > 0:
-			self.draw(tex,
+			draw(tex,
 				bx, by, lp, tp,
 				(uv[0], uv[1], luv, tuv),
 				color, gray
@@ -201,7 +342,7 @@ class Renderer:
 		
 		## Middle Left
 		if lp > 0:
-			self.draw(tex,
+			draw(tex,
 				bx, by + tp, lp, bh - (tp+bp),
 				(uv[0], uv[1] + tuv, luv, uv[3] - (tuv+buv)),
 				color, gray
@@ -209,7 +350,7 @@ class Renderer:
 		
 		## Bottom Left
 		if lp > 0 and bp > 0:
-			self.draw(tex,
+			draw(tex,
 				bx, by + (bh - bp), lp, bp,
 				(uv[0], uv[1] + (uv[3] - buv), luv, buv),
 				color, gray
@@ -217,14 +358,14 @@ class Renderer:
 		
 		## Top Center
 		if tp > 0:
-			self.draw(tex,
+			draw(tex,
 				bx + lp, by, bw - (lp+rp), tp,
 				(uv[0] + luv, uv[1], uv[2] - (luv+ruv), tuv),
 				color, gray
 			)
 
 		## Middle Center
-		self.draw(tex,
+		draw(tex,
 			bx + lp, by + tp, bw - (lp+rp), bh - (tp+bp),
 			(uv[0] + luv, uv[1] + tuv, uv[2] - (luv+ruv), uv[3] - (tuv+buv)),
 			color, gray
@@ -232,7 +373,7 @@ class Renderer:
 		
 		## Bottom Center
 		if bp > 0:
-			self.draw(tex,
+			draw(tex,
 				bx + lp, by + (bh - bp), bw - (lp+rp), bp,
 				(uv[0] + luv, uv[1] + (uv[3] - buv), uv[2] - (luv+ruv), buv),
 				color, gray
@@ -240,7 +381,7 @@ class Renderer:
 		
 		## Top Right
 		if tp > 0 and rp > 0:
-			self.draw(tex,
+			draw(tex,
 				bx + (bw - rp), by, rp, tp,
 				(uv[0] + (uv[2] - ruv), uv[1], ruv, tuv),
 				color, gray
@@ -248,7 +389,7 @@ class Renderer:
 		
 		## Middle Right
 		if tp > 0 and rp > 0:
-			self.draw(tex,
+			draw(tex,
 				bx + (bw - rp), by + tp, rp, bh - (tp+bp),
 				(uv[0] + (uv[2] - ruv), uv[1] + tuv, ruv, uv[3] - (tuv+buv)),
 				color, gray
@@ -256,14 +397,215 @@ class Renderer:
 		
 		## Bottom Right
 		if tp > 0 and rp > 0:
-			self.draw(tex,
+			draw(tex,
 				bx + (bw - rp), by + (bh - bp), rp, bp,
 				(uv[0] + (uv[2] - ruv), uv[1] + (uv[3] - buv), ruv, buv),
 				color, gray
 			)
 
+		if quads:
+			self.draw_quads(tex, [q[0] for q in quads], [q[1] for q in quads], color, gray)
+
+	def shape_object(self, shape, x, y, w, h, color=(1, 1, 1, 1), gray=False):
+		"""Draws a Shape, tinted by color."""
+		tint = tuple(color) if len(color) == 4 else (*color, 1.0)
+		mul = lambda c: tuple(a * b for a, b in zip(c if len(c) == 4 else (*c, 1.0), tint))
+		self.shape(
+			x, y, w, h,
+			mul(shape.fill), mul(shape.border_color), shape.border_width, shape.radius,
+			mul(shape.shadow_color), shape.shadow_offset, shape.shadow_blur, gray
+		)
+
+	def shape(self, x, y, w, h, fill=(1, 1, 1, 1), border_color=(0, 0, 0, 1), border_width=0, radius=0,
+				shadow_color=(0, 0, 0, 0), shadow_offset=(0, 0), shadow_blur=0, gray=False):
+		"""
+		Draws a rounded rectangle with a border and a shadow, as a single quad.
+		Args:
+			x, y, w, h: Rectangle, in output coordinates (not including the shadow).
+			fill: Fill color (r, g, b, a).
+			border_color: Border color (r, g, b, a).
+			border_width: Border width, in pixels.
+			radius: Corner radius, in pixels.
+			shadow_color: Shadow color (r, g, b, a).
+			shadow_offset: Shadow offset (x, y), in pixels.
+			shadow_blur: Shadow softness, in pixels.
+			gray: Draw in grayscale.
+		"""
+		if w <= 0 or h <= 0:
+			return
+		rgba = lambda c: tuple(c) if len(c) == 4 else (*c, 1.0)
+		shadow_color = rgba(shadow_color)
+		row = (
+			x, y, w, h, radius, border_width, shadow_blur, 1.0 if gray else 0.0,
+			shadow_offset[0], shadow_offset[1],
+			*rgba(fill), *rgba(border_color), *shadow_color
+		)
+		pad = 1
+		if shadow_color[3] > 0:
+			pad += shadow_blur + max(abs(shadow_offset[0]), abs(shadow_offset[1]))
+		if self.queued:
+			rect = (x - pad, y - pad, w + pad * 2, h + pad * 2)
+			## Like text, shapes only need the scissor when they stick out of the clip
+			clip = self.__clip()
+			if clip is not None and rect[0] >= clip[0] and rect[1] >= clip[1] and \
+					rect[0] + rect[2] <= clip[0] + clip[2] and rect[1] + rect[3] <= clip[1] + clip[3]:
+				clip = None
+			self.__record(QUEUE_ITEM_SHAPES, ("shapes",), rect, row, clip)
+			return
+		self.__submit_shapes(numpy.array([row], dtype=numpy.float32))
+
+	def __shape_program(self):
+		"""Compiles the shape shader, on first use."""
+		if self.__shape_shader is not None:
+			return self.__shape_shader
+
+		VS = """
+		attribute vec2 v_position;
+		attribute vec2 v_local;
+		attribute vec2 v_half;
+		attribute vec4 v_params;
+		attribute vec2 v_shadowOffset;
+		attribute vec4 v_fill;
+		attribute vec4 v_border;
+		attribute vec4 v_shadow;
+		varying vec2 vs_local;
+		varying vec2 vs_half;
+		varying vec4 vs_params;
+		varying vec2 vs_shadowOffset;
+		varying vec4 vs_fill;
+		varying vec4 vs_border;
+		varying vec4 vs_shadow;
+		void main() {
+			gl_Position = gl_ModelViewProjectionMatrix * vec4(v_position, 0.0, 1.0);
+			vs_local = v_local;
+			vs_half = v_half;
+			vs_params = v_params;
+			vs_shadowOffset = v_shadowOffset;
+			vs_fill = v_fill;
+			vs_border = v_border;
+			vs_shadow = v_shadow;
+		}
+		"""
+
+		FS = """
+		varying vec2 vs_local;
+		varying vec2 vs_half;
+		varying vec4 vs_params; // radius, border width, shadow blur, gray
+		varying vec2 vs_shadowOffset;
+		varying vec4 vs_fill;
+		varying vec4 vs_border;
+		varying vec4 vs_shadow;
+
+		float box(vec2 p, vec2 b, float r) {
+			vec2 q = abs(p) - b + vec2(r);
+			return length(max(q, 0.0)) + min(max(q.x, q.y), 0.0) - r;
+		}
+
+		void main() {
+			float r = min(vs_params.x, min(vs_half.x, vs_half.y));
+			float d = box(vs_local, vs_half, r);
+
+			vec4 col = vs_fill;
+			if (vs_params.y > 0.0) {
+				col = mix(vs_border, vs_fill, clamp(0.5 - (d + vs_params.y), 0.0, 1.0));
+			}
+			col.a *= clamp(0.5 - d, 0.0, 1.0);
+
+			float blur = max(vs_params.z, 0.5);
+			float ds = box(vs_local - vs_shadowOffset, vs_half, r);
+			float sa = vs_shadow.a * (1.0 - smoothstep(-blur, blur, ds));
+
+			float a = col.a + sa * (1.0 - col.a);
+			vec3 rgb = (col.rgb * col.a + vs_shadow.rgb * sa * (1.0 - col.a)) / max(a, 0.0001);
+			if (vs_params.w > 0.0) {
+				rgb = vec3(dot(rgb, vec3(0.299, 0.587, 0.114)));
+			}
+			gl_FragColor = vec4(rgb, a);
+		}
+		"""
+
+		shader = ShaderProgram()
+		shader.add(VS, GL_VERTEX_SHADER)
+		shader.add(FS, GL_FRAGMENT_SHADER)
+		for i, name in enumerate(["v_position", "v_local", "v_half", "v_params", "v_shadowOffset", "v_fill", "v_border", "v_shadow"]):
+			glBindAttribLocation(shader.bindCode, i, name)
+		shader.link()
+
+		self.shape_vao = Buffer(GL_INT, 1)
+		glGenVertexArrays(1, self.shape_vao)
+		self.shape_vbo = Buffer(GL_INT, 1)
+		glGenBuffers(1, self.shape_vbo)
+		self.shape_ibo = Buffer(GL_INT, 1)
+		glGenBuffers(1, self.shape_ibo)
+		self.shape_len = 0
+
+		glBindVertexArray(self.shape_vao[0])
+		glBindBuffer(GL_ARRAY_BUFFER, self.shape_vbo[0])
+		offset = 0
+		for i, size in enumerate([2, 2, 2, 4, 2, 4, 4, 4]):
+			glEnableVertexAttribArray(i)
+			GL.glVertexAttribPointer(i, size, GL.GL_FLOAT, False, _SHAPE_STRIDE * 4, c_void_p(offset * 4))
+			offset += size
+		glBindVertexArray(0)
+
+		self.__shape_shader = shader
+		return shader
+
+	def __submit_shapes(self, rows):
+		"""
+		Draws shapes with a single draw call.
+		Args:
+			rows: Array (n, 22) of x, y, w, h, radius, border width, shadow blur, gray,
+				shadow offset (2), fill (4), border color (4), shadow color (4).
+		"""
+		n = len(rows)
+		shader = self.__shape_program()
+		self.__state(("shapes",))
+		self.tui.stats.draw_calls += 1
+
+		x = rows[:, 0]
+		y = rows[:, 1]
+		hw = rows[:, 2] / 2
+		hh = rows[:, 3] / 2
+		visible_shadow = rows[:, 21] > 0
+		pad = numpy.where(visible_shadow, rows[:, 6] + numpy.maximum(numpy.abs(rows[:, 8]), numpy.abs(rows[:, 9])), 0) + 1
+		lx = numpy.stack([-hw - pad, hw + pad, hw + pad, -hw - pad], axis=1)
+		ly = numpy.stack([-hh - pad, -hh - pad, hh + pad, hh + pad], axis=1)
+
+		verts = numpy.empty((n, 4, _SHAPE_STRIDE), dtype=numpy.float32)
+		verts[:, :, 0] = (x + hw)[:, None] + lx
+		verts[:, :, 1] = (y + hh)[:, None] + ly
+		verts[:, :, 2] = lx
+		verts[:, :, 3] = ly
+		verts[:, :, 4] = hw[:, None]
+		verts[:, :, 5] = hh[:, None]
+		verts[:, :, 6:12] = rows[:, None, 4:10]
+		verts[:, :, 12:24] = rows[:, None, 10:22]
+
+		glBindVertexArray(self.shape_vao[0])
+		GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.shape_vbo[0])
+		if n > self.shape_len:
+			self.shape_len = max(n, self.shape_len * 2, 64)
+			inds = (numpy.arange(self.shape_len, dtype=numpy.uint32)[:, None] * 4 +
+					numpy.array([0, 1, 2, 2, 3, 0], dtype=numpy.uint32)).ravel()
+			GL.glBindBuffer(GL.GL_ELEMENT_ARRAY_BUFFER, self.shape_ibo[0])
+			GL.glBufferData(GL.GL_ELEMENT_ARRAY_BUFFER, inds.nbytes, inds, GL.GL_STATIC_DRAW)
+			GL.glBufferData(GL.GL_ARRAY_BUFFER, self.shape_len * 4 * _SHAPE_STRIDE * 4, None, GL.GL_DYNAMIC_DRAW)
+		GL.glBufferSubData(GL.GL_ARRAY_BUFFER, 0, verts.nbytes, verts)
+
+		shader.bind()
+		GL.glDrawElements(GL_TRIANGLES, n * 6, GL_UNSIGNED_INT, None)
+
+		self.shader.bind()
+		glBindVertexArray(self.vao[0])
+
 	def color_wheel(self, x, y, radius, value=1.0, res=32, gray=False):
-		self.end()
+		self.custom(
+			lambda: self.__color_wheel(x, y, radius, value, res, gray),
+			x - radius, y - radius, radius * 2, radius * 2
+		)
+
+	def __color_wheel(self, x, y, radius, value, res, gray):
 		px = 0
 		py = 0
 		steps = int(360 / res)
@@ -285,9 +627,59 @@ class Renderer:
 				glColor3f(g, g, g)
 			glVertex2f(fx + px, fy + py)
 		glEnd()
+
+	def custom(self, func, x=None, y=None, w=None, h=None):
+		"""
+		Draws with custom OpenGL code. The renderer state is unbound while func runs.
+		In queued mode, it's recorded and called on flush(), in order.
+		Args:
+			func: Function that draws.
+			x, y, w, h: Area covered, in output coordinates. None means everything.
+		"""
+		if self.queued:
+			rect = None if x is None else (x, y, w, h)
+			self.__record(QUEUE_ITEM_CUSTOM, object(), rect, func)
+			return
+		self.end()
+		self.__state(None)
+		func()
 		self.begin()
 
+	def __clip(self):
+		return self.__clip_stack[-1] if len(self.__clip_stack) > 0 else None
+
+	def __record(self, kind, key, rect, data, clip=False):
+		"""Records an item, with the current clip unless one is given."""
+		self.__queue.add(kind, key, self.z, rect, self.__clip() if clip is False else clip, data)
+
+	def __state(self, key):
+		"""Counts the program/texture switches."""
+		if key is None or key != self.__last_state:
+			self.tui.stats.state_changes += 1
+		self.__last_state = key
+
 	def draw(self, tex, x, y, w, h, uv=(0, 0, 1, 1), color=(1, 1, 1, 1), gray=False):
+		if self.queued:
+			if w <= 0 or h <= 0:
+				return
+			## Clipped here, so clipping doesn't split the batches
+			clip = self.__clip()
+			if clip is not None:
+				cx, cy, cw, ch = clip
+				x0 = max(x, cx)
+				y0 = max(y, cy)
+				x1 = min(x + w, cx + cw)
+				y1 = min(y + h, cy + ch)
+				if x1 <= x0 or y1 <= y0:
+					return
+				if x0 != x or y0 != y or x1 != x + w or y1 != y + h:
+					u, v, uw, vh = uv
+					uv = (u + (x0 - x) / w * uw, v + (y0 - y) / h * vh, uw * (x1 - x0) / w, vh * (y1 - y0) / h)
+					x, y, w, h = (x0, y0, x1 - x0, y1 - y0)
+			self.__record(QUEUE_ITEM_QUADS, ("quads", tex, bool(gray)), (x, y, w, h), ((x, y, w, h), uv, color), None)
+			return
+		self.__state(("quad", tex))
+		self.tui.stats.draw_calls += 1
 		tex.bind(0)
 		self.shader.get_uniform("clipRect").set_value(uv)
 		self.shader.get_uniform("transform").set_value((x, y, w, h))
@@ -296,7 +688,156 @@ class Renderer:
 		GL.glDrawElements(GL_TRIANGLE_STRIP, 6, GL_UNSIGNED_INT, None)
 		tex.unbind()
 
+	def draw_quads(self, tex, rects, uvs=(0, 0, 1, 1), colors=(1, 1, 1, 1), gray=False):
+		"""
+		Draws many textured quads with a single draw call.
+		Args:
+			tex: Texture shared by all the quads. None draws plain colored quads.
+			rects: Array-like of (x, y, width, height), one per quad.
+			uvs: Array-like of (u, v, width, height), one per quad or shared.
+			colors: Array-like of (r, g, b, a), one per quad or shared.
+			gray: Draw in grayscale.
+		"""
+		rects, uvs, colors = Renderer.__quad_arrays(rects, uvs, colors)
+		n = len(rects)
+		if n == 0:
+			return
+		tex = self.__dtex if tex is None else tex
+		if self.queued:
+			clip = self.__clip()
+			if clip is not None:
+				rects, uvs, colors = Renderer.__clip_quads(rects, uvs, colors, clip)
+				if len(rects) == 0:
+					return
+			lo = rects[:, :2].min(axis=0)
+			hi = (rects[:, :2] + rects[:, 2:]).max(axis=0)
+			bbox = (float(lo[0]), float(lo[1]), float(hi[0] - lo[0]), float(hi[1] - lo[1]))
+			self.__record(QUEUE_ITEM_QUADS, ("quads", tex, bool(gray)), bbox, (rects, uvs, colors), None)
+			return
+		self.__submit_quads(tex, rects, uvs, colors, gray)
+
+	@staticmethod
+	def __clip_quads(rects, uvs, colors, clip):
+		"""
+		Trims quads, and their uvs, to a clip rectangle.
+		Returns:
+			The rects, uvs and colors of the visible quads.
+		"""
+		cx, cy, cw, ch = clip
+		x0 = numpy.maximum(rects[:, 0], cx)
+		y0 = numpy.maximum(rects[:, 1], cy)
+		x1 = numpy.minimum(rects[:, 0] + rects[:, 2], cx + cw)
+		y1 = numpy.minimum(rects[:, 1] + rects[:, 3], cy + ch)
+		keep = (x1 > x0) & (y1 > y0) & (rects[:, 2] > 0) & (rects[:, 3] > 0)
+		if not keep.all():
+			rects = rects[keep]
+			uvs = uvs[keep]
+			colors = colors[keep]
+			x0 = x0[keep]
+			y0 = y0[keep]
+			x1 = x1[keep]
+			y1 = y1[keep]
+		fx = uvs[:, 2] / rects[:, 2]
+		fy = uvs[:, 3] / rects[:, 3]
+		cuvs = numpy.empty_like(uvs)
+		cuvs[:, 0] = uvs[:, 0] + (x0 - rects[:, 0]) * fx
+		cuvs[:, 1] = uvs[:, 1] + (y0 - rects[:, 1]) * fy
+		cuvs[:, 2] = (x1 - x0) * fx
+		cuvs[:, 3] = (y1 - y0) * fy
+		crects = numpy.stack([x0, y0, x1 - x0, y1 - y0], axis=1)
+		return crects, cuvs, colors
+
+	@staticmethod
+	def __quad_arrays(rects, uvs, colors):
+		"""
+		Returns:
+			The rects, uvs and colors of some quads as (n, 4) float arrays.
+		"""
+		rects = numpy.asarray(rects, dtype=numpy.float32).reshape(-1, 4)
+		n = len(rects)
+		uvs = numpy.broadcast_to(numpy.asarray(uvs, dtype=numpy.float32), (n, 4))
+		colors = numpy.asarray(colors, dtype=numpy.float32)
+		if colors.shape[-1] == 3:
+			colors = numpy.concatenate([colors, numpy.ones(colors.shape[:-1] + (1,), dtype=numpy.float32)], axis=-1)
+		colors = numpy.broadcast_to(colors, (n, 4))
+		return rects, uvs, colors
+
+	def __submit_quads(self, tex, rects, uvs, colors, gray):
+		"""Draws quads (as given by __quad_arrays) with a single draw call."""
+		n = len(rects)
+		self.__state(("quad", tex))
+		self.tui.stats.draw_calls += 1
+
+		x0 = rects[:, 0]
+		y0 = rects[:, 1]
+		x1 = x0 + rects[:, 2]
+		y1 = y0 + rects[:, 3]
+		u0 = uvs[:, 0]
+		v0 = uvs[:, 1]
+		u1 = u0 + uvs[:, 2]
+		v1 = v0 + uvs[:, 3]
+
+		verts = numpy.empty((n, 4, 8), dtype=numpy.float32)
+		verts[:, :, 0] = numpy.stack([x0, x1, x1, x0], axis=1)
+		verts[:, :, 1] = numpy.stack([y0, y0, y1, y1], axis=1)
+		verts[:, :, 2] = numpy.stack([u0, u1, u1, u0], axis=1)
+		verts[:, :, 3] = numpy.stack([v0, v0, v1, v1], axis=1)
+		verts[:, :, 4:8] = colors[:, None, :]
+
+		glBindVertexArray(self.batch_vao[0])
+		GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.batch_vbo[0])
+		if n > self.batch_len:
+			## Grow the buffers (with some slack), indices never change after that
+			self.batch_len = max(n, self.batch_len * 2, 64)
+			inds = (numpy.arange(self.batch_len, dtype=numpy.uint32)[:, None] * 4 +
+					numpy.array([0, 1, 2, 2, 3, 0], dtype=numpy.uint32)).ravel()
+			GL.glBindBuffer(GL.GL_ELEMENT_ARRAY_BUFFER, self.batch_ibo[0])
+			GL.glBufferData(GL.GL_ELEMENT_ARRAY_BUFFER, inds.nbytes, inds, GL.GL_STATIC_DRAW)
+			GL.glBufferData(GL.GL_ARRAY_BUFFER, self.batch_len * 128, None, GL.GL_DYNAMIC_DRAW)
+		GL.glBufferSubData(GL.GL_ARRAY_BUFFER, 0, verts.nbytes, verts)
+
+		self.batch_shader.bind()
+		self.batch_shader.get_uniform("tex0").set_sampler(0)
+		self.batch_shader.get_uniform("gray").set_value(1 if gray else 0)
+		tex.bind(0)
+		GL.glDrawElements(GL_TRIANGLES, n * 6, GL_UNSIGNED_INT, None)
+		tex.unbind()
+
+		self.shader.bind()
+		glBindVertexArray(self.vao[0])
+
+	def draw_sprites(self, sprites, gray=False):
+		"""
+		Draws a list of Sprites, batching consecutive sprites that share a texture.
+		"""
+		i = 0
+		while i < len(sprites):
+			tex = sprites[i].tex
+			j = i
+			while j < len(sprites) and sprites[j].tex is tex:
+				j += 1
+			run = sprites[i:j]
+			self.draw_quads(
+				tex,
+				[(s.x, s.y, s.width, s.height) for s in run],
+				[s.uv for s in run],
+				[s.color if len(s.color) == 4 else (*s.color, 1.0) for s in run],
+				gray
+			)
+			i = j
+
 	def rectangle(self, x, y, w, h, color=(1, 1, 1, 1), wire=False):
+		if self.queued:
+			if wire:
+				self.custom(lambda: (self.begin(), self.__rectangle(x, y, w, h, color, wire), self.end()), x, y, w, h)
+			else:
+				self.draw(self.__dtex, x, y, w, h, color=color)
+			return
+		self.__rectangle(x, y, w, h, color, wire)
+
+	def __rectangle(self, x, y, w, h, color, wire):
+		self.__state(("quad", self.__dtex))
+		self.tui.stats.draw_calls += 1
 		self.__dtex.bind(0)
 		self.shader.get_uniform("clipRect").set_value((0, 0, 1, 1))
 		self.shader.get_uniform("transform").set_value((x, y, w, h))
@@ -312,11 +853,136 @@ class Renderer:
 		self.shader.unbind()
 		glBindVertexArray(0)
 
+	def flush(self):
+		"""
+		Draws the recorded draws (see: queued), grouped by render state.
+		Called by TUI.render() and end_layer().
+		"""
+		if len(self.__queue) == 0:
+			return
+		batches, reordered = self.__queue.sort()
+		self.tui.stats.reordered += reordered
+
+		self.queued = False
+		self.begin()
+		bound = True
+		clip = False
+		for b in batches:
+			if b.clip != clip:
+				clip = b.clip
+				if clip is None:
+					glDisable(GL_SCISSOR_TEST)
+				else:
+					glEnable(GL_SCISSOR_TEST)
+					self.__scissor(*clip)
+
+			if b.kind == QUEUE_ITEM_SHAPES:
+				if not bound:
+					self.begin()
+					bound = True
+				self.__submit_shapes(numpy.array([i.data for i in b.items], dtype=numpy.float32))
+			elif b.kind == QUEUE_ITEM_QUADS:
+				if not bound:
+					self.begin()
+					bound = True
+				_, tex, gray = b.key
+				arrays = [Renderer.__quad_arrays(*i.data) for i in b.items]
+				self.__submit_quads(
+					tex,
+					numpy.concatenate([a[0] for a in arrays]),
+					numpy.concatenate([a[1] for a in arrays]),
+					numpy.concatenate([a[2] for a in arrays]),
+					gray
+				)
+			else:
+				if bound:
+					self.end()
+					bound = False
+				for i in b.items:
+					if b.kind == QUEUE_ITEM_TEXT:
+						self.text(*i.data)
+					else:
+						self.__state(None)
+						i.data()
+		if not bound:
+			self.begin()
+		self.queued = True
+
+		if len(self.__clip_stack) > 0:
+			glEnable(GL_SCISSOR_TEST)
+			self.__scissor(*self.__clip_stack[-1])
+		else:
+			glDisable(GL_SCISSOR_TEST)
+
+	def __target(self):
+		"""
+		Returns:
+			The area (in output coordinates) covered by the current render target.
+		"""
+		if self.__layer is None:
+			return (0, 0, self.output.width, self.output.height)
+		fb, x, y = self.__layer
+		return (x, y, fb.width, fb.height)
+
+	def begin_layer(self, framebuffer, x, y):
+		"""
+		Redirects the rendering to an offscreen layer, until end_layer().
+		Drawing keeps using output coordinates.
+		Args:
+			framebuffer: The layer. See: FrameBuffer.
+			x: Left of the layer, in output coordinates.
+			y: Top of the layer, in output coordinates.
+		"""
+		self.end()
+		self.__queue_stack.append(self.__queue)
+		self.__queue = RenderQueue()
+		self.__layer_stack.append((self.__layer, self.__clip_stack, self.__layer_regions))
+		self.__layer = (framebuffer, x, y)
+		self.__clip_stack = []
+		self.__layer_regions = set()
+		glDisable(GL_SCISSOR_TEST)
+		framebuffer.bind()
+		self.begin()
+
+	def end_layer(self):
+		"""
+		Goes back to the previous render target.
+		Returns:
+			The names of the style regions drawn in the layer.
+		"""
+		self.flush()
+		self.__queue = self.__queue_stack.pop()
+		self.end()
+		fb, _, _ = self.__layer
+		fb.unbind()
+		regions = self.__layer_regions
+		self.__layer, self.__clip_stack, self.__layer_regions = self.__layer_stack.pop()
+		if len(self.__clip_stack) > 0:
+			glEnable(GL_SCISSOR_TEST)
+			self.__scissor(*self.__clip_stack[-1])
+		self.begin()
+		return regions
+
+	def draw_layer(self, framebuffer, x, y):
+		"""Draws a layer rendered with begin_layer()/end_layer()."""
+		if self.queued:
+			self.custom(
+				lambda: (self.begin(), self.__draw_layer(framebuffer, x, y), self.end()),
+				x, y, framebuffer.width, framebuffer.height
+			)
+			return
+		self.__draw_layer(framebuffer, x, y)
+
+	def __draw_layer(self, framebuffer, x, y):
+		glBlendFunc(GL_ONE, GL_ONE_MINUS_SRC_ALPHA)
+		## Flipped, since textures start at the bottom
+		self.draw(framebuffer.texture, x, y, framebuffer.width, framebuffer.height, (0, 1, 1, -1))
+		if self.__layer is None:
+			glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+		else:
+			GL.glBlendFuncSeparate(GL.GL_SRC_ALPHA, GL.GL_ONE_MINUS_SRC_ALPHA, GL.GL_ONE, GL.GL_ONE_MINUS_SRC_ALPHA)
+
 	def clip_start(self, sx, sy, sw, sh):
-		try:
-			vp = GL.glGetIntegerv(GL_VIEWPORT)
-		except:
-			vp = [0, 0, render.getWindowWidth(), render.getWindowHeight()]
 		if len(self.__clip_stack) > 0:
 			px, py, pw, ph = self.__clip_stack[-1]
 			minx = max(px, sx)
@@ -333,24 +999,36 @@ class Renderer:
 			sy = miny
 			sw = maxx - minx
 			sh = max(1, maxy - miny)
-		else:
+		elif not self.queued:
 			glEnable(GL_SCISSOR_TEST)
-		sx = vp[0] + sx
-		sy = vp[1] + (self.output.height - sy - sh)
+		## The stack is kept in output coordinates, so nested clips intersect properly
 		self.__clip_stack.append((sx, sy, sw, sh))
-		glScissor(int(sx), int(sy), int(sw), int(sh))
+		if not self.queued:
+			self.__scissor(sx, sy, sw, sh)
 		return True
 
 	def clip_end(self):
 		if len(self.__clip_stack) > 0:
 			self.__clip_stack.pop()
+		if self.queued:
+			## Recorded with each draw, see: flush()
+			return
 		if len(self.__clip_stack) > 0:
-			sx, sy, sw, sh = self.__clip_stack[-1]
-			glScissor(int(sx), int(sy), int(sw), int(sh))
+			self.__scissor(*self.__clip_stack[-1])
 		else:
-			glScissor(0, 0, self.output.width, self.output.height)
+			_, _, tw, th = self.__target()
+			glScissor(0, 0, tw, th)
 			glDisable(GL_SCISSOR_TEST)
 
+	def __scissor(self, sx, sy, sw, sh):
+		"""Sets the scissor box, converting from output (top-left origin) to window coordinates."""
+		try:
+			vp = GL.glGetIntegerv(GL_VIEWPORT)
+		except:
+			vp = [0, 0, render.getWindowWidth(), render.getWindowHeight()]
+		tx, ty, _, th = self.__target()
+		glScissor(int(vp[0] + sx - tx), int(vp[1] + (th - (sy - ty) - sh)), int(sw), int(sh))
+
 	def begin_text(self):
 		glPushMatrix()
 	
@@ -358,6 +1036,17 @@ class Renderer:
 		glPopMatrix()
 
 	def text(self, fid, text, x, y, color=(1.0, 1.0, 1.0), size=12.0):
+		if self.queued:
+			w, h = self.text_size(fid, text, size)
+			## Text can't be trimmed, but it only needs the scissor when it sticks out
+			clip = self.__clip()
+			if clip is not None and x >= clip[0] and y >= clip[1] and \
+					x + w <= clip[0] + clip[2] and y + h <= clip[1] + clip[3]:
+				clip = None
+			self.__record(QUEUE_ITEM_TEXT, ("text", fid), (x, y, w, h), (fid, text, x, y, color, size), clip)
+			return h
+		self.__state(("text", fid))
+		self.tui.stats.draw_calls += 1
 		blf.position(fid, int(x), int(-y), 0)
 		blf.size(fid, self.font_size(size), self.font_dpi(size))
 		_, h = blf.dimensions(fid, text)
@@ -388,4 +1077,11 @@ class Renderer:
 	def __del__(self):
 		glDeleteVertexArrays(1, self.vao)
 		glDeleteBuffers(1, self.vbo)
-		glDeleteBuffers(1, self.ibo)
\ No newline at end of file
+		glDeleteBuffers(1, self.ibo)
+		glDeleteVertexArrays(1, self.batch_vao)
+		glDeleteBuffers(1, self.batch_vbo)
+		glDeleteBuffers(1, self.batch_ibo)
+		if self.__shape_shader is not None:
+			glDeleteVertexArrays(1, self.shape_vao)
+			glDeleteBuffers(1, self.shape_vbo)
+			glDeleteBuffers(1, self.shape_ibo)
\ No newline at end of file
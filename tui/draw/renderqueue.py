@@ -0,0 +1,140 @@
+"""
+File: draw/renderqueue.py
+Description: State-sorted render queue
+Author:	Diego Lopes (TwisterGE/DCubix) < diego95lopes@gmail.com >
+"""
+
+QUEUE_ITEM_QUADS = 0
+QUEUE_ITEM_TEXT = 1
+QUEUE_ITEM_CUSTOM = 2
+QUEUE_ITEM_SHAPES = 3
+
+class QueueItem:
+	"""
+	A recorded draw.
+	Attributes:
+		kind: QUEUE_ITEM_QUADS, QUEUE_ITEM_TEXT, QUEUE_ITEM_SHAPES or QUEUE_ITEM_CUSTOM.
+		key: Render state (program, texture...). Items with the same key can be drawn together.
+		z: Layer. Higher layers are drawn on top.
+		rect: Area covered, (x1, y1, x2, y2) in output coordinates, or None for everything.
+		clip: Clip rectangle (x, y, w, h), or None.
+		data: What to draw. Depends on the kind.
+	"""
+	__slots__ = ("kind", "key", "z", "rect", "clip", "data")
+
+	def __init__(self, kind, key, z, rect, clip, data):
+		self.kind = kind
+		self.key = key
+		self.z = z
+		self.rect = rect
+		self.clip = clip
+		self.data = data
+
+class QueueBatch:
+	"""
+	Items drawn together, with the same render state.
+	Attributes:
+		kind: Kind of the items.
+		key: Render state of the items.
+		clip: Clip rectangle of the items.
+		items: The items, in painter's order.
+		rect: Area covered by all the items.
+	"""
+	__slots__ = ("kind", "key", "clip", "items", "rect")
+
+	def __init__(self, item):
+		self.kind = item.kind
+		self.key = item.key
+		self.clip = item.clip
+		self.items = [item]
+		self.rect = item.rect
+
+	def add(self, item):
+		self.items.append(item)
+		if self.rect is None or item.rect is None:
+			self.rect = None
+		else:
+			a = self.rect
+			b = item.rect
+			self.rect = (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+def _overlaps(a, b):
+	if a is None or b is None:
+		return True
+	return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+class RenderQueue:
+	"""
+	Collects draws, to be sorted by render state before being drawn.
+	Items are grouped by layer (z), then by (key, clip): an item joins an
+	earlier batch with the same state only if it doesn't overlap anything
+	drawn in between, so painter's order is kept wherever it matters.
+	Attributes:
+		items: Recorded items.
+		max_search: Max. number of batches looked back for a match.
+	"""
+	def __init__(self, max_search=64):
+		self.items = []
+		self.max_search = max_search
+
+	def __len__(self):
+		return len(self.items)
+
+	def add(self, kind, key, z, rect, clip, data):
+		"""
+		Records an item. Items completely clipped out are dropped.
+		Args:
+			rect: Area covered, (x, y, w, h), or None for everything.
+		"""
+		if rect is not None:
+			x1 = rect[0]
+			y1 = rect[1]
+			x2 = x1 + rect[2]
+			y2 = y1 + rect[3]
+			if clip is not None:
+				x1 = max(x1, clip[0])
+				y1 = max(y1, clip[1])
+				x2 = min(x2, clip[0] + clip[2])
+				y2 = min(y2, clip[1] + clip[3])
+				if x2 <= x1 or y2 <= y1:
+					return
+			rect = (x1, y1, x2, y2)
+		self.items.append(QueueItem(kind, key, z, rect, clip, data))
+
+	def clear(self):
+		self.items = []
+
+	def sort(self):
+		"""
+		Groups the items in batches, clearing the queue.
+		Returns:
+			The batches, in draw order, and the number of items moved.
+		"""
+		items = sorted(self.items, key=lambda i: i.z)
+		self.items = []
+
+		batches = []
+		reordered = 0
+		z = None
+		first = 0
+		for item in items:
+			if item.z != z:
+				## Batches never cross layers
+				z = item.z
+				first = len(batches)
+			target = None
+			if item.kind != QUEUE_ITEM_CUSTOM:
+				for i in range(len(batches) - 1, max(first, len(batches) - self.max_search) - 1, -1):
+					b = batches[i]
+					if b.key == item.key and b.clip == item.clip:
+						target = i
+						break
+					if _overlaps(b.rect, item.rect):
+						break
+			if target is None:
+				batches.append(QueueBatch(item))
+			else:
+				if target != len(batches) - 1:
+					reordered += 1
+				batches[target].add(item)
+		return batches, reordered
@@ -6,17 +6,196 @@ Author:	Diego Lopes (TwisterGE/DCubix) < diego95lopes@gmail.com >
 
 from OpenGL import GL
 from bge import texture as vtex
+from ctypes import c_void_p
+from collections import OrderedDict
+import threading
+import weakref
+import time
 import numpy
 
 from bgl import *
 
+class TextureManager:
+	"""
+	Keeps track of the video memory used by the textures, with a budget for the images.
+	Every Texture is counted. When the images (ImageTexture) take more than
+	the budget, trim() evicts the least recently drawn ones: their video
+	memory and pixel copy are released, but they stay usable and are loaded
+	again from their files the next time they're bound. Images drawn in the
+	last min_age seconds are never evicted, so the budget can be exceeded
+	while everything is on the screen.
+	Lazy images are loaded here too: they're queued when first drawn (or
+	prefetched) and load() decodes them, for at most load_time per frame.
+	Attributes:
+		budget: Max. video memory used by the images, in bytes. 0 means no limit.
+		min_age: Time an image must go without being drawn before it can be evicted, in seconds.
+		size: Video memory used by all the textures, in bytes.
+		image_size: Video memory used by the images, in bytes.
+		peak: Highest size so far, in bytes.
+		evictions: Images evicted so far.
+		restores: Evicted images loaded again so far.
+		load_time: Time spent loading lazy images per frame, in seconds. At least one is loaded.
+		loads: Lazy images loaded so far.
+	"""
+	def __init__(self, budget=64 * 1024 * 1024, min_age=1.0, load_time=0.004):
+		self.budget = budget
+		self.min_age = min_age
+		self.load_time = load_time
+		self.loads = 0
+		self.size = 0
+		self.image_size = 0
+		self.peak = 0
+		self.evictions = 0
+		self.restores = 0
+		self.__sizes = {}
+		self.__images = OrderedDict()
+		self.__pending = OrderedDict()
+		self.__prefetch = OrderedDict()
+		self.__placeholder = None
+
+	def __len__(self):
+		return len(self.__sizes)
+
+	@property
+	def resident(self):
+		"""Number of images in video memory."""
+		return len(self.__images)
+
+	@property
+	def pending(self):
+		"""Number of lazy images waiting to be loaded."""
+		return len(self.__pending) + len(self.__prefetch)
+
+	@property
+	def placeholder(self):
+		"""Get/Set the texture drawn in place of lazy images not loaded yet. Transparent by default."""
+		if self.__placeholder is None:
+			self.__placeholder = Texture(1, 1, numpy.zeros(4, dtype=numpy.uint8))
+		return self.__placeholder
+
+	@placeholder.setter
+	def placeholder(self, tex):
+		self.__placeholder = tex
+
+	def track(self, tex):
+		"""Counts the memory of a texture. Called again when its size or residency changes."""
+		key = id(tex)
+		old, was_image = self.__sizes.get(key, (0, False))
+		new = tex.size_bytes
+		image = isinstance(tex, ImageTexture)
+		self.__sizes[key] = (new, image)
+		self.size += new - old
+		if was_image:
+			self.image_size -= old
+		if image:
+			self.image_size += new
+			if new == 0:
+				self.__images.pop(key, None)
+		self.peak = max(self.peak, self.size)
+
+	def untrack(self, tex):
+		"""Stops counting a texture. Called when it's deleted."""
+		key = id(tex)
+		old, image = self.__sizes.pop(key, (0, False))
+		self.size -= old
+		if image:
+			self.image_size -= old
+		self.__images.pop(key, None)
+		self.__pending.pop(key, None)
+		self.__prefetch.pop(key, None)
+
+	def touch(self, tex):
+		"""Marks an image as just drawn."""
+		key = id(tex)
+		entry = self.__images.get(key, None)
+		if entry is None:
+			self.__images[key] = [weakref.ref(tex), time.monotonic()]
+		else:
+			entry[1] = time.monotonic()
+			self.__images.move_to_end(key)
+
+	def request(self, tex, prefetch=False):
+		"""
+		Queues a lazy image to be loaded.
+		Args:
+			prefetch: Load it after the images being drawn.
+		"""
+		key = id(tex)
+		if key in self.__pending:
+			return
+		if prefetch:
+			if key not in self.__prefetch:
+				self.__prefetch[key] = weakref.ref(tex)
+		else:
+			self.__prefetch.pop(key, None)
+			self.__pending[key] = weakref.ref(tex)
+
+	def load(self):
+		"""
+		Loads the queued lazy images, the ones being drawn first, for at most load_time.
+		Called once per frame by TUI.main_loop().
+		Returns:
+			Number of images loaded.
+		"""
+		start = time.monotonic()
+		count = 0
+		for queue in (self.__pending, self.__prefetch):
+			while queue:
+				if count > 0 and time.monotonic() - start >= self.load_time:
+					return count
+				_, ref = queue.popitem(last=False)
+				tex = ref()
+				if tex is None or tex.loaded:
+					continue
+				tex.load()
+				count += 1
+				self.loads += 1
+		return count
+
+	def trim(self):
+		"""
+		Evicts the least recently drawn images until they fit in the budget.
+		Called once per frame by TUI.main_loop().
+		Returns:
+			Number of images evicted.
+		"""
+		if self.budget <= 0 or self.image_size <= self.budget:
+			return 0
+		now = time.monotonic()
+		count = 0
+		for key in list(self.__images.keys()):
+			if self.image_size <= self.budget:
+				break
+			ref, last = self.__images[key]
+			if now - last < self.min_age:
+				## The rest were drawn even later
+				break
+			tex = ref()
+			if tex is None:
+				self.__images.pop(key, None)
+				continue
+			tex.evict()
+			count += 1
+		self.evictions += count
+		return count
+
 class Texture:
+	"""
+	Attributes:
+		width: Width, in pixels.
+		height: Height, in pixels.
+		valid: Whether the texture was created.
+		resident: Whether the texture is in video memory.
+		loaded: Whether the pixels were loaded. Only lazy images start unloaded.
+	"""
 	def __init__(self, width, height, data=None, interp=GL_LINEAR):
 		self.__bindCode = Buffer(GL_INT, 1)
 		glGenTextures(1, self.__bindCode)
 		self.bindCode = self.__bindCode[0]
 
 		self.valid = True
+		self.resident = True
+		self.loaded = True
 		self.width = width
 		self.height = height
 
@@ -27,6 +206,12 @@ class Texture:
 		glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
 		GL.glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA8, width, height, 0, GL_RGBA, GL_UNSIGNED_BYTE, data)
 		glBindTexture(GL_TEXTURE_2D, 0)
+		textures.track(self)
+
+	@property
+	def size_bytes(self):
+		"""Video memory used, in bytes."""
+		return self.width * self.height * 4 if self.resident else 0
 
 	def bind(self, slot=0):
 		glActiveTexture(GL_TEXTURE0 + slot)
@@ -35,22 +220,295 @@ class Texture:
 	def unbind(self):
 		glBindTexture(GL_TEXTURE_2D, 0)
 
+	def request(self, listener=None):
+		"""
+		Asks for the pixels to be loaded, if they aren't yet (see: ImageTexture lazy).
+		Args:
+			listener: Called once they're loaded.
+		"""
+		pass
+
+	def prefetch(self):
+		"""Hints that the texture will be drawn soon, so it's loaded in the background if lazy."""
+		pass
+
+	def update(self, data, x=0, y=0, width=None, height=None):
+		"""
+		Replaces the pixels of a region of the texture, without reallocating it.
+		Args:
+			data: RGBA pixels (width * height * 4 bytes). A NumPy array, memoryview or bytes.
+			x: Left of the region.
+			y: Top of the region.
+			width: Width of the region. None means the texture width.
+			height: Height of the region. None means the texture height.
+		"""
+		width = self.width if width is None else width
+		height = self.height if height is None else height
+		glBindTexture(GL_TEXTURE_2D, self.bindCode)
+		GL.glPixelStorei(GL.GL_UNPACK_ALIGNMENT, 1)
+		GL.glTexSubImage2D(GL_TEXTURE_2D, 0, x, y, width, height, GL_RGBA, GL_UNSIGNED_BYTE, data)
+		glBindTexture(GL_TEXTURE_2D, 0)
+
 	def __del__(self):
+		textures.untrack(self)
 		glDeleteTextures(1, self.__bindCode)
 
+class StreamTexture(Texture):
+	"""
+	Texture for frames produced continuously. i.e: Video, cameras, minimaps.
+	Frames are submitted from any thread and uploaded when the texture is
+	drawn, through two pixel unpack buffers: the texture is updated from the
+	buffer filled in the previous upload while the new frame is copied to the
+	other one, so the upload doesn't stall the pipeline (one frame of latency).
+	If frames are submitted faster than they are drawn, the older ones are dropped.
+	The changed region of each frame is copied when it's submitted, so the
+	producer can reuse its buffer right away.
+	Attributes:
+		dropped: Number of frames dropped.
+		frames: Number of frames uploaded.
+	"""
+	def __init__(self, width, height, interp=GL_LINEAR):
+		super().__init__(width, height, numpy.zeros(width * height * 4, dtype=numpy.uint8), interp)
+		self.dropped = 0
+		self.frames = 0
+
+		self.__pbos = Buffer(GL_INT, 2)
+		glGenBuffers(2, self.__pbos)
+		self.__pbo_rects = [None, None]
+		self.__index = 0
+
+		self.__lock = threading.Lock()
+		self.__staging = numpy.zeros((height, width, 4), dtype=numpy.uint8)
+		self.__pending_rect = None
+
+	@property
+	def pending(self):
+		"""Whether there's a frame waiting to be uploaded."""
+		return self.__pending_rect is not None or self.__pbo_rects[self.__index] is not None
+
+	def submit(self, frame, rect=None):
+		"""
+		Submits a new frame. Safe to call from any thread.
+		Args:
+			frame: The whole image, RGBA, top row first. A NumPy array, memoryview or bytes.
+			rect: Region that changed (x, y, width, height). None means everything.
+		"""
+		frame = numpy.frombuffer(frame, dtype=numpy.uint8) if not isinstance(frame, numpy.ndarray) else frame
+		frame = frame.reshape(self.height, self.width, 4)
+		rect = (0, 0, self.width, self.height) if rect is None else tuple(rect)
+		x, y, w, h = rect
+		with self.__lock:
+			self.__staging[y:y + h, x:x + w] = frame[y:y + h, x:x + w]
+			if self.__pending_rect is not None:
+				## The previous frame was never drawn, so its changes are merged into this one
+				self.dropped += 1
+				px, py, pw, ph = self.__pending_rect
+				x = min(px, rect[0])
+				y = min(py, rect[1])
+				rect = (x, y, max(px + pw, rect[0] + rect[2]) - x, max(py + ph, rect[1] + rect[3]) - y)
+			self.__pending_rect = rect
+
+	def upload(self):
+		"""Uploads the submitted frame, if any. Called by the widgets that draw it."""
+		data = None
+		with self.__lock:
+			rect = self.__pending_rect
+			if rect is not None:
+				x, y, w, h = rect
+				data = numpy.ascontiguousarray(self.__staging[y:y + h, x:x + w])
+			self.__pending_rect = None
+		cur = self.__index
+		nxt = 1 - cur
+
+		## Texture <- buffer filled by the last upload
+		if self.__pbo_rects[cur] is not None:
+			x, y, w, h = self.__pbo_rects[cur]
+			GL.glBindBuffer(GL.GL_PIXEL_UNPACK_BUFFER, self.__pbos[cur])
+			glBindTexture(GL_TEXTURE_2D, self.bindCode)
+			GL.glPixelStorei(GL.GL_UNPACK_ALIGNMENT, 1)
+			GL.glTexSubImage2D(GL_TEXTURE_2D, 0, x, y, w, h, GL_RGBA, GL_UNSIGNED_BYTE, c_void_p(0))
+			glBindTexture(GL_TEXTURE_2D, 0)
+			self.__pbo_rects[cur] = None
+			self.frames += 1
+
+		## Other buffer <- new frame
+		if data is not None:
+			GL.glBindBuffer(GL.GL_PIXEL_UNPACK_BUFFER, self.__pbos[nxt])
+			GL.glBufferData(GL.GL_PIXEL_UNPACK_BUFFER, data.nbytes, None, GL.GL_STREAM_DRAW)
+			GL.glBufferSubData(GL.GL_PIXEL_UNPACK_BUFFER, 0, data.nbytes, data)
+			self.__pbo_rects[nxt] = rect
+			self.__index = nxt
+		GL.glBindBuffer(GL.GL_PIXEL_UNPACK_BUFFER, 0)
+
+	def __del__(self):
+		glDeleteBuffers(2, self.__pbos)
+		super().__del__()
+
 class ImageTexture(Texture):
-	def __init__(self, fileName, interp=GL_LINEAR):
+	"""
+	Texture loaded from an image file.
+	A copy of the pixels is kept, so reload() can upload only what changed.
+	Images count against the TextureManager budget: when evicted, they're
+	loaded again the next time they're bound.
+	Lazy images hold only the file name until they're first drawn: they're
+	queued then, and drawn as TextureManager.placeholder until loaded, so
+	creating them costs nothing. Their size is unknown until then, unless given.
+	Images are loaded right away by default; Label and ImageView create lazy
+	ones when given a file name instead of a texture.
+	Attributes:
+		file_name: Image file.
+		pixels: RGBA pixels (height, width, 4), as uploaded.
+	"""
+	def __init__(self, fileName, interp=GL_LINEAR, lazy=False, size=None):
+		self.file_name = fileName
+		self.pixels = None
+		self.__listeners = []
+		if lazy:
+			super().__init__(0, 0, None, interp)
+			self.width, self.height = size if size is not None else (0, 0)
+			self.resident = False
+			self.loaded = False
+			return
+		w, h, data = ImageTexture.__decode(fileName)
+
+		super().__init__(w, h, data, interp)
+		self.pixels = data.reshape(h, w, 4) if data is not None else None
+
+		if data is None:
+			self.valid = False
+			self.__del__()
+			return
+		textures.touch(self)
+
+	def bind(self, slot=0):
+		if not self.loaded:
+			self.request()
+			textures.placeholder.bind(slot)
+			return
+		if not self.resident:
+			self.restore()
+		textures.touch(self)
+		super().bind(slot)
+
+	def load(self):
+		"""Loads a lazy image now. Usually called by TextureManager.load()."""
+		if self.loaded:
+			return
+		if self.reload():
+			textures.touch(self)
+		else:
+			self.valid = False
+			self.loaded = True
+			self.__notify()
+
+	def request(self, listener=None):
+		if self.loaded:
+			return
+		textures.request(self)
+		if listener is not None and listener not in self.__listeners:
+			self.__listeners.append(listener)
+
+	def prefetch(self):
+		if not self.loaded:
+			textures.request(self, prefetch=True)
+
+	def __notify(self):
+		listeners = self.__listeners
+		self.__listeners = []
+		for func in listeners:
+			func()
+
+	def evict(self):
+		"""Releases the video memory and the pixel copy. The texture name is kept."""
+		if not self.resident or not self.valid:
+			return
+		glBindTexture(GL_TEXTURE_2D, self.bindCode)
+		GL.glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA8, 0, 0, 0, GL_RGBA, GL_UNSIGNED_BYTE, None)
+		glBindTexture(GL_TEXTURE_2D, 0)
+		self.pixels = None
+		self.resident = False
+		textures.track(self)
+
+	def restore(self):
+		"""Loads an evicted image again."""
+		if self.resident or not self.valid:
+			return
+		if self.reload():
+			textures.restores += 1
+		else:
+			## Don't try again every frame
+			self.valid = False
+
+	@staticmethod
+	def __decode(fileName):
 		img = vtex.ImageFFmpeg(fileName)
 		img.scale = False
 		img.flip = False
 		data = img.image
 		w, h = img.size
+		if not data:
+			return (w, h, None)
+		return (w, h, numpy.array(data, dtype=numpy.uint8))
 
-		super().__init__(w, h, numpy.array(data, dtype=numpy.uint8), interp)
+	def reload(self, fileName=None, tile=64):
+		"""
+		Loads the image again, uploading only the tiles that changed.
+		If the size changed, the whole texture is replaced.
+		Args:
+			fileName: New image file. None reloads the current one.
+			tile: Size of the tiles compared, in pixels.
+		Returns:
+			List of the regions uploaded (x, y, width, height), in pixels.
+		"""
+		fileName = self.file_name if fileName is None else fileName
+		w, h, data = ImageTexture.__decode(fileName)
+		if data is None:
+			print("Could not load \"{}\".".format(fileName))
+			return []
+		self.file_name = fileName
+		new = data.reshape(h, w, 4)
 
-		if not data:
-			self.valid = False
-			self.__del__()
-			return
+		if self.pixels is None or (w, h) != (self.width, self.height):
+			self.width = w
+			self.height = h
+			glBindTexture(GL_TEXTURE_2D, self.bindCode)
+			GL.glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA8, w, h, 0, GL_RGBA, GL_UNSIGNED_BYTE, data)
+			glBindTexture(GL_TEXTURE_2D, 0)
+			self.pixels = new
+			self.valid = True
+			self.resident = True
+			textures.track(self)
+			if not self.loaded:
+				self.loaded = True
+				self.__notify()
+			return [(0, 0, w, h)]
+
+		## Changed tiles, padding the image to a multiple of the tile size
+		tw = (w + tile - 1) // tile
+		th = (h + tile - 1) // tile
+		diff = numpy.zeros((th * tile, tw * tile), dtype=bool)
+		diff[:h, :w] = numpy.any(self.pixels != new, axis=2)
+		dirty = diff.reshape(th, tile, tw, tile).any(axis=(1, 3))
+
+		rects = []
+		for ty in range(th):
+			tx = 0
+			while tx < tw:
+				if not dirty[ty, tx]:
+					tx += 1
+					continue
+				## Merge the dirty tiles next to each other
+				end = tx
+				while end < tw and dirty[ty, end]:
+					end += 1
+				x = tx * tile
+				y = ty * tile
+				rw = min(end * tile, w) - x
+				rh = min(y + tile, h) - y
+				self.update(numpy.ascontiguousarray(new[y:y + rh, x:x + rw]), x, y, rw, rh)
+				rects.append((x, y, rw, rh))
+				tx = end
+		self.pixels = new
+		return rects
 
-		img = None
\ No newline at end of file
+textures = TextureManager()
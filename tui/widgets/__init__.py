@@ -4,4 +4,11 @@ from .panel import *
 from .checkbox import *
 from .slider import *
 from .colorpicker import *
-from .edit import *
\ No newline at end of file
+from .edit import *
+from .listview import *
+from .textarea import *
+from .table import *
+from .plot import *
+from .console import *
+from .treeview import *
+from .image import *
\ No newline at end of file
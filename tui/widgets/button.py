@@ -48,8 +48,7 @@ class Button(Label):
 				else:
 					if self.clicked:
 						self.clicked = False
-						for listener in self.click_listeners:
-							listener(self, event)
+						self.notify(self.click_listeners, self, event)
 			else:
 				self.clicked = False
 				self.hovered = False
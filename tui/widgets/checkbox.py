@@ -32,8 +32,8 @@ class CheckBox(Label):
 		if c != self.__checked:
 			prev = self.__checked
 			self.__checked = c
-			for cl in self.change_listeners:
-				cl(self, prev)
+			self.invalidate_render()
+			self.notify(self.change_listeners, self, prev)
 
 	def render(self, renderer):
 		pl = self.padding[0] * self.tui.x_scaling
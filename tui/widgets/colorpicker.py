@@ -17,6 +17,8 @@ class ColorPicker(Widget):
 		hue: Color Hue.
 		saturation: Color Saturation.
 		value: Color value/lightness/brightness.
+		color_listeners: Color change listeners.
+		commit_listeners: Called once when the user stops dragging, with the HSV color from before it.
 	"""
 	def __init__(self, color=(1.0, 1.0, 1.0)):
 		super().__init__()
@@ -31,6 +33,7 @@ class ColorPicker(Widget):
 		self.__value = 1
 
 		self.color_listeners = []
+		self.commit_listeners = []
 
 		hsv = colorsys.rgb_to_hsv(*color)
 		self.hue = hsv[0]
@@ -57,8 +60,8 @@ class ColorPicker(Widget):
 		if v != self.__hue:
 			prev = self.__hue
 			self.__hue = v
-			for cl in self.color_listeners:
-				cl(self, [prev, self.__saturation, self.__value])
+			self.invalidate_render()
+			self.notify_change(self.color_listeners, [prev, self.__saturation, self.__value])
 
 	@property
 	def saturation(self):
@@ -69,8 +72,8 @@ class ColorPicker(Widget):
 		if v != self.__saturation:
 			prev = self.__saturation
 			self.__saturation = v
-			for cl in self.color_listeners:
-				cl(self, [self.__hue, prev, self.__value])
+			self.invalidate_render()
+			self.notify_change(self.color_listeners, [self.__hue, prev, self.__value])
 
 	@property
 	def value(self):
@@ -81,8 +84,8 @@ class ColorPicker(Widget):
 		if v != self.__value:
 			prev = self.__value
 			self.__value = v
-			for cl in self.color_listeners:
-				cl(self, [self.__hue, self.__saturation, prev])
+			self.invalidate_render()
+			self.notify_change(self.color_listeners, [self.__hue, self.__saturation, prev])
 
 	def render(self, renderer):
 		b = self.get_corrected_bounds_no_intersect()
@@ -121,10 +124,15 @@ class ColorPicker(Widget):
 		self.hue = angle / 360
 
 	def handle_events(self, event):
+		was_clicked = self.clicked
 		if event.get_type() == EVENT_TYPE_MOUSE_BUTTON:
 			if self.get_corrected_bounds().has_point(event.x, event.y) and event.button == BGE_Events.LEFTMOUSE:
-				self.clicked = True
-				self.__update_hue(event.x, event.y)
+				if event.status and not was_clicked:
+					## Only a press starts an interaction
+					self.begin_interaction()
+				if event.status or was_clicked:
+					self.clicked = True
+					self.__update_hue(event.x, event.y)
 			else:
 				self.clicked = False
 			if not event.status or event.button != BGE_Events.LEFTMOUSE:
@@ -134,4 +142,6 @@ class ColorPicker(Widget):
 				self.__update_hue(event.x, event.y)
 			else:
 				self.clicked = False
+		if was_clicked and not self.clicked:
+			self.commit_interaction(self.commit_listeners)
 		return super().handle_events(event)
\ No newline at end of file
@@ -0,0 +1,203 @@
+"""
+File: widgets/console.py
+Description: Log console
+Author:	Diego Lopes (TwisterGE/DCubix) < diego95lopes@gmail.com >
+"""
+
+import queue
+from tui.core import EVENT_TYPE_SCROLL, EVENT_TYPE_MOUSE_MOTION, EVENT_STATUS_CONSUMED
+from .panel import Panel
+from .slider import Slider, ORIENTATION_VERTICAL
+
+class _ConsoleLine:
+	"""A line of the console. run is the text actually drawn (elided to fit run_width)."""
+	__slots__ = ("text", "color", "run", "run_width")
+
+	def __init__(self, text, color):
+		self.text = text
+		self.color = color
+		self.run = None
+		self.run_width = -1
+
+class Console(Panel):
+	"""
+	Log console.
+	Lines are kept in a fixed-capacity ring buffer (the oldest ones are
+	dropped), and only the visible ones are drawn. The text drawn for each
+	line is measured (and elided) once, and cached until the width changes.
+	write() is thread-safe: lines are queued and added once per tick.
+	Attributes:
+		capacity: Max. number of lines kept.
+		font: Custom font.
+		font_size: Custom font size.
+		scrollbar: Vertical Slider used to scroll the lines.
+	"""
+	def __init__(self, capacity=5000):
+		super().__init__()
+		self.capacity = capacity
+		self.font = None
+		self.font_size = 8.0
+
+		self.scrollbar = Slider(0, 1, 1, rounded=True)
+		self.scrollbar.orientation = ORIENTATION_VERTICAL
+		self.scrollbar.bounds.w = 12
+		self.scrollbar.value = 1
+		self.scrollbar.parent = self
+		self.children.append(self.scrollbar)
+
+		self.hovered = False
+
+		self.__queue = queue.SimpleQueue()
+		self.__lines = [None] * capacity
+		self.__head = 0
+		self.__count = 0
+		self.__visible_lines = 1
+
+		self.bounds.set_value(0, 0, 300, 200)
+
+	def __len__(self):
+		return self.__count
+
+	def write(self, text, color=None):
+		"""
+		Queues text to be added. Safe to call from any thread.
+		Args:
+			text: The text. It's split into lines.
+			color: Text color. None uses the style color.
+		"""
+		self.__queue.put((text, color))
+
+	def clear(self):
+		"""Removes all the lines."""
+		self.__lines = [None] * self.capacity
+		self.__head = 0
+		self.__count = 0
+		self.invalidate_render()
+
+	def line(self, index):
+		"""
+		Returns:
+			The text of a line. 0 is the oldest one.
+		"""
+		return self.__line(index).text
+
+	def __line(self, index):
+		return self.__lines[(self.__head + index) % self.capacity]
+
+	@property
+	def scroll(self):
+		"""Get/Set the scroll offset, in lines from the bottom. 0 follows the new lines."""
+		return int(self.scrollbar.range.maximum - self.scrollbar.value)
+
+	@scroll.setter
+	def scroll(self, lines):
+		r = self.scrollbar.range
+		self.scrollbar.value = int(r.maximum - max(0, min(lines, r.maximum)))
+
+	def __append(self, text, color):
+		line = _ConsoleLine(text, color)
+		if self.__count < self.capacity:
+			self.__lines[(self.__head + self.__count) % self.capacity] = line
+			self.__count += 1
+		else:
+			self.__lines[self.__head] = line
+			self.__head = (self.__head + 1) % self.capacity
+
+	def __drain(self):
+		"""
+		Adds the queued lines.
+		Returns:
+			The number of lines added.
+		"""
+		added = 0
+		while True:
+			try:
+				text, color = self.__queue.get_nowait()
+			except queue.Empty:
+				break
+			for ln in str(text).split("\n"):
+				self.__append(ln, color)
+				added += 1
+		return added
+
+	def __fid(self):
+		return self.style.font.id if self.font is None else self.font.id
+
+	def update(self):
+		scroll = self.scroll
+		added = self.__drain()
+		if added > 0:
+			self.invalidate_render()
+
+		bounds = self.get_content_bounds()
+		sb = self.scrollbar
+		sb.style = self.style
+		sb.tui = self.tui
+		max_scroll = max(0, self.__count - self.__visible_lines)
+		sb.visible = max_scroll > 0
+		sb.range.maximum = max(1, max_scroll)
+		sb.bounds.x = bounds.x + bounds.w - sb.bounds.w
+		sb.bounds.y = bounds.y
+		sb.set_size(sb.bounds.w, bounds.h)
+		## Stay at the bottom, or keep showing the same lines when scrolled up
+		self.scroll = scroll + added if scroll > 0 else 0
+		super().update()
+
+	def __run(self, renderer, line, width):
+		"""
+		Returns:
+			The text to draw for a line, elided to fit the width. Cached.
+		"""
+		if line.run_width == width:
+			return line.run
+		fid = self.__fid()
+		text = line.text
+		if renderer.text_size(fid, text, self.font_size)[0] > width:
+			## Binary search for the longest fitting prefix
+			lo = 0
+			hi = len(text)
+			while lo < hi:
+				mid = (lo + hi + 1) // 2
+				if renderer.text_size(fid, text[:mid] + "...", self.font_size)[0] <= width:
+					lo = mid
+				else:
+					hi = mid - 1
+			text = text[:lo] + "..."
+		line.run = text
+		line.run_width = width
+		return text
+
+	def render(self, renderer):
+		super().render(renderer)
+		if self.style is None:
+			return
+		b = self.get_corrected_bounds_no_intersect()
+		fid = self.__fid()
+		pad = 3 * self.tui.x_scaling
+		sbw = self.scrollbar.bounds.w * self.tui.x_scaling if self.scrollbar.visible else 0
+		x = b.x + pad
+		width = int(b.w - pad * 2 - sbw)
+		_, line_h = renderer.text_size(fid, "Ay", self.font_size)
+		line_h += 2
+		self.__visible_lines = max(1, int((b.h - pad * 2) // line_h))
+
+		last = self.__count - self.scroll
+		first = max(0, last - self.__visible_lines)
+		y = b.y + pad
+		default = self.style.text_color if self.enabled else self.style.disabled_text_color
+
+		renderer.end()
+		for i in range(first, last):
+			line = self.__line(i)
+			color = default if line.color is None else line.color
+			renderer.text(fid, self.__run(renderer, line, width), x, y, color, self.font_size)
+			y += line_h
+		renderer.begin()
+
+	def handle_events(self, event):
+		if event.get_type() == EVENT_TYPE_MOUSE_MOTION:
+			self.hovered = self.get_corrected_bounds().has_point(event.x, event.y)
+		elif event.get_type() == EVENT_TYPE_SCROLL and self.hovered and self.enabled and self.visible:
+			self.scroll += event.delta * 3
+			return EVENT_STATUS_CONSUMED
+		return super().handle_events(event)
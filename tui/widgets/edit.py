@@ -6,7 +6,7 @@ Author:	Diego Lopes (TwisterGE/DCubix) < diego95lopes@gmail.com >
 
 from bge import events as BGE_Events
 from bge import logic as BGE_Logic
-from tui.core import Widget
+from tui.core import Widget, UndoStack, has_ctrl, has_shift
 from tui.core import EVENT_STATUS_CONSUMED, EVENT_TYPE_KEY, EVENT_TYPE_TEXT, EVENT_TYPE_FOCUS, EVENT_TYPE_MOUSE_BUTTON, EVENT_TYPE_MOUSE_MOTION
 
 class Edit(Widget):
@@ -19,10 +19,11 @@ class Edit(Widget):
 		editable: When False, makes the Edit read-only.
 		masked: Replaces all the characters with "mask".
 		mask: Mask character.
+		undo_stack: Edit history. Ctrl+Z undoes, Ctrl+Y (or Ctrl+Shift+Z) redoes.
 	"""
 	def __init__(self, text=""):
 		super().__init__()
-		self.text = text
+		self.__text = text
 
 		self.__mouse_x = -1
 		self.__mouse_drag_x = 0
@@ -43,9 +44,54 @@ class Edit(Widget):
 		self.editable = True
 		self.masked = False
 		self.mask = "*"
+		self.undo_stack = UndoStack()
 
 		self.bounds.set_value(0, 0, 190, 20)
 
+	@property
+	def text(self):
+		"""Get/Set the text."""
+		return self.__text
+
+	@text.setter
+	def text(self, t):
+		if t != self.__text:
+			self.__text = t
+			self.undo_stack.clear()
+			self.invalidate()
+
+	def insert(self, pos, text):
+		"""Inserts text, recording it for undo."""
+		self.undo_stack.record_insert(pos, text)
+		self.__text = self.__text[:pos] + text + self.__text[pos:]
+		self.invalidate()
+
+	def delete(self, pos, length):
+		"""
+		Deletes text, recording it for undo.
+		Returns:
+			The deleted text.
+		"""
+		removed = self.__text[pos:pos+length]
+		self.undo_stack.record_delete(pos, removed)
+		self.__text = self.__text[:pos] + self.__text[pos+length:]
+		self.invalidate()
+		return removed
+
+	def undo(self):
+		"""Reverts the last edit."""
+		caret = self.undo_stack.undo(self.insert, self.delete)
+		if caret > -1:
+			self.__caret_x = caret
+			self.__selection = -1
+
+	def redo(self):
+		"""Applies the last reverted edit again."""
+		caret = self.undo_stack.redo(self.insert, self.delete)
+		if caret > -1:
+			self.__caret_x = caret
+			self.__selection = -1
+
 	def update(self):
 		self.__textOffset = 3
 		if not self.focused:
@@ -56,6 +102,8 @@ class Edit(Widget):
 		if self.__blink_time >= 0.5:
 			self.__blink = not self.__blink
 			self.__blink_time = 0.0
+			if self.focused:
+				self.invalidate_render()
 
 	def __compute_glyph_positions(self, renderer, text):
 		fid = self.style.font.id if self.font is None else self.font.id
@@ -218,10 +266,7 @@ class Edit(Widget):
 				begin = end
 				end = tmp
 			
-			if begin == end-1:
-				self.text = self.text[:begin] + self.text[begin+1:]
-			else:
-				self.text = self.text[:begin] + self.text[end:]
+			self.delete(begin, end - begin)
 			
 			self.__caret_x = begin
 			self.__selection = -1
@@ -233,8 +278,11 @@ class Edit(Widget):
 
 	def handle_events(self, event):
 		nbounds = self.get_corrected_bounds_no_intersect()
-		if event.get_type() == EVENT_TYPE_TEXT and self.focused and self.editable:
-			self.text = self.text[:self.__caret_x] + event.character + self.text[self.__caret_x:]
+		if self.focused and event.get_type() in (EVENT_TYPE_TEXT, EVENT_TYPE_KEY, EVENT_TYPE_MOUSE_BUTTON, EVENT_TYPE_MOUSE_MOTION):
+			## Caret, selection or text may change
+			self.invalidate_render()
+		if event.get_type() == EVENT_TYPE_TEXT and self.focused and self.editable and not has_ctrl(event.modifiers):
+			self.insert(self.__caret_x, event.character)
 			self.__delete_selection()
 			self.__caret_x += 1
 			self.__selection = -1
@@ -242,7 +290,14 @@ class Edit(Widget):
 		elif event.get_type() == EVENT_TYPE_KEY and self.focused and self.editable:
 			# TODO Implement shortcuts for copying, pasting, selecting all, etc...
 			if event.status:
-				if event.key == BGE_Events.LEFTARROWKEY:
+				if event.key in (BGE_Events.LEFTARROWKEY, BGE_Events.RIGHTARROWKEY, BGE_Events.HOMEKEY, BGE_Events.ENDKEY):
+					self.undo_stack.seal()
+				if has_ctrl(event.modifiers):
+					if event.key == BGE_Events.ZKEY and not has_shift(event.modifiers):
+						self.undo()
+					elif event.key == BGE_Events.YKEY or event.key == BGE_Events.ZKEY:
+						self.redo()
+				elif event.key == BGE_Events.LEFTARROWKEY:
 					self.__caret_x -= 1 if self.__caret_x > 0 else 0
 					self.__selection = -1
 				elif event.key == BGE_Events.RIGHTARROWKEY:
@@ -257,15 +312,14 @@ class Edit(Widget):
 				elif event.key == BGE_Events.DELKEY:
 					if not self.__delete_selection():
 						if self.__caret_x < len(self.text):
-							self.text = self.text[:self.__caret_x] + self.text[self.__caret_x+1:]
+							self.delete(self.__caret_x, 1)
 					else:
 						self.__textOffset = 3
 					self.__selection = -1
 				elif event.key == BGE_Events.BACKSPACEKEY:
 					if not self.__delete_selection():
 						if self.__caret_x > 0:
-							i = self.__caret_x-1
-							self.text = self.text[:i] + self.text[i+1:]
+							self.delete(self.__caret_x-1, 1)
 							self.__caret_x -= 1
 					else:
 						self.__textOffset = 3
@@ -274,6 +328,7 @@ class Edit(Widget):
 		elif event.get_type() == EVENT_TYPE_MOUSE_BUTTON and self.editable:
 			if self.get_corrected_bounds().has_point(event.x, event.y):
 				if event.status:
+					self.undo_stack.seal()
 					self.__mouse_drag_x = -1
 					self.__mouse_x = event.x - nbounds.x
 					self.__mouse_mod = event.modifiers[0] if len(event.modifiers) > 0 else None
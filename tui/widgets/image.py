@@ -0,0 +1,68 @@
+"""
+File: widgets/image.py
+Description: Image display
+Author:	Diego Lopes (TwisterGE/DCubix) < diego95lopes@gmail.com >
+"""
+
+from tui.core import Widget
+from tui.draw import StreamTexture, ImageTexture
+
+class ImageView(Widget):
+	"""
+	Image display.
+	Shows any Texture. When it's a StreamTexture, the last submitted
+	frame is uploaded right before drawing.
+	Attributes:
+		texture: The texture. A file name is loaded lazily, when it's first drawn. See: ImageTexture.
+		keep_aspect: Fit the image preserving its aspect ratio.
+		color: Tint color.
+	"""
+	def __init__(self, texture=None, keep_aspect=True):
+		super().__init__()
+		self.__texture = None
+		self.texture = texture
+		self.keep_aspect = keep_aspect
+		self.color = (1, 1, 1, 1)
+
+		self.bounds.set_value(0, 0, 160, 120)
+
+	@property
+	def texture(self):
+		"""Get/Set the texture (a Texture, or a file name)."""
+		return self.__texture
+
+	@texture.setter
+	def texture(self, tex):
+		if isinstance(tex, str):
+			tex = ImageTexture(tex, lazy=True)
+		self.__texture = tex
+		self.invalidate_render()
+
+	def update(self):
+		if isinstance(self.texture, StreamTexture) and self.texture.pending:
+			self.invalidate_render()
+		super().update()
+
+	def render(self, renderer):
+		tex = self.texture
+		if tex is None or not tex.valid:
+			return
+		if isinstance(tex, StreamTexture):
+			tex.upload()
+		tex.request(self.invalidate_render)
+		b = self.get_corrected_bounds_no_intersect()
+		x, y, w, h = b.packed()
+		if self.keep_aspect and tex.width > 0 and tex.height > 0:
+			scale = min(w / tex.width, h / tex.height)
+			iw = tex.width * scale
+			ih = tex.height * scale
+			x += (w - iw) / 2
+			y += (h - ih) / 2
+			w = iw
+			h = ih
+		renderer.draw(tex, x, y, w, h, color=self.color, gray=(not self.enabled))
+		super().render(renderer)
+
+	def prefetch(self):
+		if self.texture is not None:
+			self.texture.prefetch()
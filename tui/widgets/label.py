@@ -5,6 +5,7 @@ Author:	Diego Lopes (TwisterGE/DCubix) < diego95lopes@gmail.com >
 """
 
 from tui.core import Widget
+from tui.draw import ImageTexture
 
 ALIGN_LEFT = 2
 ALIGN_CENTER = 4
@@ -25,7 +26,7 @@ class Label(Widget):
 			- ALIGN_TOP (y)
 			- ALIGN_MIDDLE (y)
 			- ALIGN_BOTTOM (y)
-		image: Icon image.
+		image: Icon image. A file name is loaded lazily, when the label is first drawn. See: ImageTexture.
 		image_align: Image alignment. One of the above (x) ones.
 		font: Custom font.
 		font_size: Custom font size.
@@ -33,8 +34,10 @@ class Label(Widget):
 	"""
 	def __init__(self, text="", text_align=(ALIGN_LEFT | ALIGN_MIDDLE), image_align=ALIGN_CENTER, image=None):
 		super().__init__()
-		self.text = text
+		self.__text = text
+		self.__pref_size = (0, 0)
 		self.text_align = text_align
+		self.__image = None
 		self.image = image
 		self.image_align = image_align
 		self.font_size = 8.0
@@ -43,9 +46,42 @@ class Label(Widget):
 
 		self.bounds.set_value(0, 0, 80, 32)
 
-		self.pref_size = (0, 0)
 		self.auto_size = True
 
+	@property
+	def image(self):
+		"""Get/Set the icon image (a Texture, or a file name)."""
+		return self.__image
+
+	@image.setter
+	def image(self, img):
+		if isinstance(img, str):
+			img = ImageTexture(img, lazy=True)
+		self.__image = img
+		self.invalidate_render()
+
+	@property
+	def text(self):
+		"""Get/Set the text."""
+		return self.__text
+
+	@text.setter
+	def text(self, t):
+		if t != self.__text:
+			self.__text = t
+			self.invalidate()
+
+	@property
+	def pref_size(self):
+		"""Text size, as measured by the last render."""
+		return self.__pref_size
+
+	@pref_size.setter
+	def pref_size(self, s):
+		if s != self.__pref_size:
+			self.__pref_size = s
+			self.invalidate()
+
 	def get_preferred_size(self):
 		if self.auto_size:
 			return self.pref_size
@@ -97,6 +133,7 @@ class Label(Widget):
 			)
 			renderer.begin()
 		if self.image is not None:
+			self.image.request(self.invalidate_render)
 			bounds = self.get_corrected_bounds_no_intersect()
 			ix = bounds.x
 			iw = self.image.width
@@ -109,4 +146,8 @@ class Label(Widget):
 			elif self.image_align == ALIGN_LEFT:
 				ix += pl
 			renderer.draw(self.image, ix, bounds.y + (bounds.h / 2 - ih / 2), iw, ih, gray=(not self.enabled))
-		super().render(renderer)
\ No newline at end of file
+		super().render(renderer)
+
+	def prefetch(self):
+		if self.image is not None:
+			self.image.prefetch()
\ No newline at end of file
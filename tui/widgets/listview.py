@@ -0,0 +1,169 @@
+"""
+File: widgets/listview.py
+Description: Virtualized list
+Author:	Diego Lopes (TwisterGE/DCubix) < diego95lopes@gmail.com >
+"""
+
+import math
+from tui.core import EVENT_TYPE_SCROLL, EVENT_TYPE_MOUSE_MOTION, EVENT_STATUS_CONSUMED
+from .panel import Panel
+from .label import Label
+from .slider import Slider, ORIENTATION_VERTICAL
+
+class ListAdapter:
+	"""
+	List data source.
+	Override it to feed a ListView.
+	"""
+	def get_count(self):
+		"""Gets the number of items."""
+		return 0
+
+	def create_row(self):
+		"""Creates a new row widget. Rows are recycled, so this is called only for the visible ones."""
+		return Label()
+
+	def bind_row(self, row, index):
+		"""
+		Fills a row widget with an item.
+		Args:
+			row: A row created by create_row().
+			index: The item index.
+		"""
+		pass
+
+class SequenceAdapter(ListAdapter):
+	"""
+	Adapter for a Python sequence, showing each item as a Label.
+	Attributes:
+		items: The sequence.
+	"""
+	def __init__(self, items):
+		self.items = items
+
+	def get_count(self):
+		return len(self.items)
+
+	def bind_row(self, row, index):
+		row.text = str(self.items[index])
+
+class ListView(Panel):
+	"""
+	Virtualized list.
+	Only the visible rows (plus the overscan) are alive, and they are
+	recycled when scrolling, so the cost depends on the height of the
+	list, not on the number of items.
+	Attributes:
+		adapter: Data source. See: ListAdapter.
+		row_height: Height of every row.
+		overscan: Rows kept alive above and below the visible ones.
+		scrollbar: Vertical Slider used to scroll the list.
+	"""
+	def __init__(self, adapter=None, row_height=24, overscan=2):
+		super().__init__()
+		self.adapter = adapter if adapter is not None else ListAdapter()
+		self.row_height = row_height
+		self.overscan = overscan
+
+		self.scrollbar = Slider(0, 1, row_height)
+		self.scrollbar.orientation = ORIENTATION_VERTICAL
+		self.scrollbar.bounds.w = 12
+		self.scrollbar.parent = self
+		self.children.append(self.scrollbar)
+
+		self.hovered = False
+
+		self.__rows = {}
+		self.__pool = []
+
+		self.bounds.set_value(0, 0, 200, 240)
+
+	@property
+	def scroll(self):
+		"""Get/Set the scroll offset."""
+		return self.scrollbar.value
+
+	@scroll.setter
+	def scroll(self, v):
+		self.scrollbar.value = self.scrollbar.range.clamp(v)
+
+	def scroll_to(self, index):
+		"""Scrolls the minimum needed to show an item."""
+		top = index * self.row_height
+		view = self.get_content_bounds().h
+		if top < self.scroll:
+			self.scroll = top
+		elif top + self.row_height > self.scroll + view:
+			self.scroll = top + self.row_height - view
+
+	def data_changed(self):
+		"""Binds the visible rows again. Call it after changing the data."""
+		self.invalidate_render()
+		for index, row in list(self.__rows.items()):
+			self.__recycle(index)
+
+	def invalidate_layout(self):
+		## The rows don't change the size of the list.
+		self.needs_layout = True
+		self.layout_cache.clear()
+
+	def __recycle(self, index):
+		row = self.__rows.pop(index)
+		self.children.remove(row)
+		self.__pool.append(row)
+
+	def __obtain(self, index):
+		if self.__pool:
+			row = self.__pool.pop()
+		else:
+			row = self.adapter.create_row()
+			row.auto_size = False
+			row.parent = self
+		row.style = self.style
+		row.tui = self.tui
+		self.adapter.bind_row(row, index)
+		self.children.append(row)
+		self.__rows[index] = row
+		return row
+
+	def update(self):
+		bounds = self.get_content_bounds()
+		count = self.adapter.get_count()
+
+		sb = self.scrollbar
+		sb.style = self.style
+		sb.tui = self.tui
+		max_scroll = max(0, count * self.row_height - bounds.h)
+		sb.visible = max_scroll > 0
+		sb.range.maximum = max(1, max_scroll)
+		sb.bounds.x = bounds.x + bounds.w - sb.bounds.w
+		sb.bounds.y = bounds.y
+		sb.set_size(sb.bounds.w, bounds.h)
+		self.scroll = self.scroll
+
+		scroll = self.scroll
+		first = max(0, int(scroll // self.row_height) - self.overscan)
+		last = min(count, int(math.ceil((scroll + bounds.h) / self.row_height)) + self.overscan)
+
+		for index in list(self.__rows.keys()):
+			if index < first or index >= last:
+				self.__recycle(index)
+
+		row_width = bounds.w - (sb.bounds.w if sb.visible else 0)
+		for index in range(first, last):
+			row = self.__rows.get(index, None)
+			if row is None:
+				row = self.__obtain(index)
+			row.bounds.x = bounds.x
+			row.bounds.y = bounds.y + index * self.row_height - scroll
+			row.set_size(row_width, self.row_height)
+
+		super().update()
+
+	def handle_events(self, event):
+		if event.get_type() == EVENT_TYPE_MOUSE_MOTION:
+			self.hovered = self.get_corrected_bounds().has_point(event.x, event.y)
+		elif event.get_type() == EVENT_TYPE_SCROLL and self.hovered and self.enabled and self.visible:
+			self.scroll -= event.delta * self.row_height
+			return EVENT_STATUS_CONSUMED
+		return super().handle_events(event)
@@ -4,6 +4,7 @@ Description: Basic widget container
 Author:	Diego Lopes (TwisterGE/DCubix) < diego95lopes@gmail.com >
 """
 
+import math
 from tui.core import Widget
 from tui.draw import Rect
 from tui.core import EVENT_STATUS_CONSUMED, EVENT_STATUS_AVAILABLE
@@ -15,17 +16,48 @@ class Panel(Widget):
 		children: List of widgets.
 		background: Enable/Disable background rendering.
 		layout: Layout manager.
+		cache_as_layer: Draw the panel (and its children) to an offscreen layer,
+			which is drawn again only when something inside it changes. For static panels.
+		layer_regions: Names of the style regions drawn in the layer, the last time it was drawn.
 	"""
 	def __init__(self, layout=None):
 		super().__init__()
 
 		self.children = []
 		self.background = True
-		self.layout = layout
+		self.__layout = layout
+		self.__cache_as_layer = False
+		self.layer_regions = set()
+
+	@property
+	def layout(self):
+		"""Get/Set the layout manager."""
+		return self.__layout
+
+	@layout.setter
+	def layout(self, l):
+		self.__layout = l
+		self.invalidate_layout()
+
+	@property
+	def cache_as_layer(self):
+		return self.__cache_as_layer
+
+	@cache_as_layer.setter
+	def cache_as_layer(self, c):
+		self.__cache_as_layer = c
+		if not c and self.tui is not None:
+			self.tui.renderer.layers.release(self)
+		self.invalidate_render()
 
 	def get_content_bounds(self):
 		return Rect(1, 1, self.bounds.w - 2, self.bounds.h - 2)
 
+	def get_preferred_size(self):
+		if self.auto_size and self.layout is not None:
+			return self.layout.measure(self, float("inf"), float("inf"))
+		return super().get_preferred_size()
+
 	def add(self, widget, layout_args=-1):
 		"""
 		Adds a new widget to the container.
@@ -38,22 +70,72 @@ class Panel(Widget):
 			return self
 		elif widget.parent is not None:
 			widget.parent.children.remove(widget)
+			widget.parent.invalidate_layout()
 		
 		widget.parent = self
 		widget.tui = self.tui
 		widget.layout_args = layout_args
 		self.children.append(widget)
+		self.invalidate_layout()
 		return widget
 
+	def prefetch(self):
+		for w in self.children:
+			w.prefetch()
+
 	def update(self):
 		for w in self.children:
 			w.update()
-			if self.layout is not None:
-				self.layout.set_args(w)
+		super().update()
+		self.update_layout()
+
+	def update_layout(self):
+		if not self.needs_layout and (self.layout is None or not self.layout.is_outdated(self)):
+			return
+		self.arranging = True
 		if self.layout is not None:
+			for w in self.children:
+				self.layout.set_args(w)
 			self.layout.perform_layout(self)
+			self.invalidate_render()
+			if self.tui is not None:
+				self.tui.stats.layouts += 1
+		self.arranging = False
+		self.needs_layout = False
+
+		## Children resized by the layout are arranged right away
+		for w in self.children:
+			if w.needs_layout:
+				w.update_layout()
 
 	def render(self, renderer):
+		if self.__cache_as_layer and self.__render_layer(renderer):
+			return
+		self.render_contents(renderer)
+
+	def __render_layer(self, renderer):
+		"""
+		Draws the cached layer, rendering it again first if needed.
+		Returns:
+			False if the layer isn't available (i.e: out of budget).
+		"""
+		b = self.get_corrected_bounds_no_intersect()
+		x = int(b.x)
+		y = int(b.y)
+		fb, new = renderer.layers.get(self, int(math.ceil(b.x + b.w)) - x, int(math.ceil(b.y + b.h)) - y)
+		if fb is None:
+			return False
+		if new or self.needs_render:
+			renderer.begin_layer(fb, x, y)
+			self.render_contents(renderer)
+			self.layer_regions = renderer.end_layer()
+			self.needs_render = False
+			self.tui.stats.layer_renders += 1
+		renderer.draw_layer(fb, x, y)
+		return True
+
+	def render_contents(self, renderer):
+		"""Draws the background and the children."""
 		if self.background and self.style is not None:
 			n = self.style.textures["Panel"]
 			b = self.get_corrected_bounds_no_intersect()
@@ -63,9 +145,12 @@ class Panel(Widget):
 				b = w.get_corrected_bounds()
 				b.y -= 1
 				b.h += 1
-				renderer.clip_start(*b.packed())
-				w.render(renderer)
-				renderer.clip_end()
+				if renderer.clip_start(*b.packed()):
+					z = renderer.z
+					renderer.z = z + w.z
+					w.render(renderer)
+					renderer.z = z
+					renderer.clip_end()
 		super().render(renderer)
 
 	def handle_events(self, event):
@@ -0,0 +1,373 @@
+"""
+File: widgets/plot.py
+Description: Real-time line plot
+Author:	Diego Lopes (TwisterGE/DCubix) < diego95lopes@gmail.com >
+"""
+
+import math
+import numpy
+from ctypes import c_void_p
+from OpenGL import GL
+from bgl import *
+from tui.core import Widget
+from tui.draw import ShaderProgram
+
+class PlotSeries:
+	"""
+	A series of samples, stored in a fixed-size ring buffer.
+	Appending is O(1): the oldest samples are overwritten when it's full.
+	Attributes:
+		name: Series name.
+		color: Line color.
+		capacity: Max. number of samples kept.
+		count: Number of samples kept.
+		total: Number of samples ever appended (since the last clear()).
+		generation: Number of times it was cleared.
+	"""
+	def __init__(self, capacity=4096, color=(1, 1, 1, 1), name=""):
+		self.name = name
+		self.color = color
+		self.capacity = capacity
+		self.count = 0
+		self.total = 0
+		self.generation = 0
+		self.data = numpy.zeros(capacity, dtype=numpy.float32)
+
+		self.__buckets = None
+
+	def append(self, value):
+		"""Appends a sample."""
+		self.data[self.total % self.capacity] = value
+		self.total += 1
+		self.count = min(self.count + 1, self.capacity)
+
+	def extend(self, values):
+		"""Appends many samples at once."""
+		values = numpy.asarray(values, dtype=numpy.float32)
+		full = len(values)
+		if full == 0:
+			return
+		## Only the last capacity ones are kept, in the slots they'd have been appended to
+		values = values[-self.capacity:]
+		n = len(values)
+		head = (self.total + full - n) % self.capacity
+		first = min(n, self.capacity - head)
+		self.data[head:head + first] = values[:first]
+		self.data[:n - first] = values[first:]
+		self.total += full
+		self.count = min(self.count + full, self.capacity)
+
+	def clear(self):
+		"""Removes all the samples."""
+		self.count = 0
+		self.total = 0
+		self.generation += 1
+		self.__buckets = None
+
+	def values(self, start=0, end=None):
+		"""
+		Args:
+			start: Absolute index of the first sample (see: total).
+			end: Absolute index after the last sample.
+		Returns:
+			A copy of the samples, oldest first.
+		"""
+		end = self.total if end is None else end
+		start = max(start, self.total - self.count)
+		if end <= start:
+			return numpy.zeros(0, dtype=numpy.float32)
+		a = start % self.capacity
+		b = a + (end - start)
+		if b <= self.capacity:
+			return self.data[a:b].copy()
+		return numpy.concatenate([self.data[a:], self.data[:b - self.capacity]])
+
+	def decimate(self, start, bucket):
+		"""
+		Computes the min and max of every group of samples, so that a
+		plot never draws more than about two vertices per pixel.
+		The groups are aligned to absolute sample indices, so when new
+		samples arrive only the last groups are computed.
+		Args:
+			start: Absolute index of the first sample.
+			bucket: Samples per group.
+		Returns:
+			The first group index, and arrays with the min and max of each group.
+		"""
+		end = self.total
+		start = max(start, end - self.count)
+		first = start // bucket
+		last = (end - 1) // bucket + 1
+
+		cache = self.__buckets
+		if cache is not None and cache[0] == bucket and cache[1] <= first < cache[2]:
+			## The groups between the first and the last cached ones are complete and didn't change
+			_, cfirst, clast, cmins, cmaxs = cache
+			lo = first + 1
+			hi = max(lo, clast - 1)
+			hmin, hmax = self.__reduce(start, min(end, lo * bucket), first, lo, bucket)
+			tmin, tmax = self.__reduce(hi * bucket, end, hi, last, bucket)
+			mins = numpy.concatenate([hmin, cmins[lo - cfirst:hi - cfirst], tmin])
+			maxs = numpy.concatenate([hmax, cmaxs[lo - cfirst:hi - cfirst], tmax])
+		else:
+			mins, maxs = self.__reduce(start, end, first, last, bucket)
+
+		self.__buckets = (bucket, first, last, mins, maxs)
+		return first, mins, maxs
+
+	def __reduce(self, start, end, first, last, bucket):
+		if end <= start or last <= first:
+			empty = numpy.zeros(0, dtype=numpy.float32)
+			return empty, empty
+		vals = self.values(start, end)
+		bounds = numpy.arange(first, last) * bucket - start
+		bounds[0] = 0
+		return numpy.minimum.reduceat(vals, bounds), numpy.maximum.reduceat(vals, bounds)
+
+class _SeriesBuffer:
+	"""GPU side of a series: a persistent VBO with every sample stored twice (ring), plus the decimated vertices."""
+	def __init__(self, series):
+		self.capacity = series.capacity
+		self.uploaded = 0
+		self.generation = series.generation
+
+		self.vao = Buffer(GL_INT, 1)
+		glGenVertexArrays(1, self.vao)
+		self.vbo = Buffer(GL_INT, 1)
+		glGenBuffers(1, self.vbo)
+
+		self.dvao = Buffer(GL_INT, 1)
+		glGenVertexArrays(1, self.dvao)
+		self.dvbo = Buffer(GL_INT, 1)
+		glGenBuffers(1, self.dvbo)
+		self.dlen = 0
+		self.dkey = None
+		self.drange = (0.0, 1.0)
+
+		## Slot i and i + capacity hold the same sample, so the last N
+		## samples are always a contiguous range, drawable as a single strip.
+		verts = numpy.zeros((self.capacity * 2, 2), dtype=numpy.float32)
+		verts[:, 0] = numpy.arange(self.capacity * 2)
+		self.__setup(self.vao, self.vbo, verts, GL.GL_DYNAMIC_DRAW)
+		self.__setup(self.dvao, self.dvbo, None, GL.GL_DYNAMIC_DRAW)
+
+	def __setup(self, vao, vbo, verts, usage):
+		glBindVertexArray(vao[0])
+		GL.glBindBuffer(GL.GL_ARRAY_BUFFER, vbo[0])
+		if verts is not None:
+			GL.glBufferData(GL.GL_ARRAY_BUFFER, verts.nbytes, verts, usage)
+		glEnableVertexAttribArray(0)
+		GL.glVertexAttribPointer(0, 2, GL.GL_FLOAT, False, 8, c_void_p(0))
+		glBindVertexArray(0)
+
+	def __check_cleared(self, series):
+		"""Forgets what was uploaded if the series was cleared since."""
+		if series.generation != self.generation:
+			self.generation = series.generation
+			self.uploaded = 0
+			self.dkey = None
+
+	def sync(self, series):
+		"""Uploads only the samples appended since the last call."""
+		self.__check_cleared(series)
+		new = series.total - self.uploaded
+		if new <= 0:
+			return
+		cap = self.capacity
+		start = series.total - min(new, series.count)
+		GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.vbo[0])
+		while start < series.total:
+			slot = start % cap
+			n = min(series.total - start, cap - slot)
+			verts = numpy.empty((n, 2), dtype=numpy.float32)
+			verts[:, 0] = numpy.arange(slot, slot + n)
+			verts[:, 1] = series.data[slot:slot + n]
+			GL.glBufferSubData(GL.GL_ARRAY_BUFFER, slot * 8, verts.nbytes, verts)
+			verts[:, 0] += cap
+			GL.glBufferSubData(GL.GL_ARRAY_BUFFER, (slot + cap) * 8, verts.nbytes, verts)
+			start += n
+		GL.glBindBuffer(GL.GL_ARRAY_BUFFER, 0)
+		self.uploaded = series.total
+
+	def sync_decimated(self, series, start, bucket):
+		"""Uploads the decimated vertices, if the samples or the grouping changed."""
+		self.__check_cleared(series)
+		key = (series.total, start, bucket)
+		if key == self.dkey:
+			return
+		self.dkey = key
+		first, mins, maxs = series.decimate(start, bucket)
+		n = len(mins)
+		verts = numpy.empty((n, 2, 2), dtype=numpy.float32)
+		xs = (numpy.arange(first, first + n) * bucket - start).astype(numpy.float32)
+		verts[:, 0, 0] = xs
+		verts[:, 1, 0] = xs + bucket * 0.5
+		verts[:, 0, 1] = mins
+		verts[:, 1, 1] = maxs
+		GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.dvbo[0])
+		GL.glBufferData(GL.GL_ARRAY_BUFFER, verts.nbytes, verts, GL.GL_DYNAMIC_DRAW)
+		GL.glBindBuffer(GL.GL_ARRAY_BUFFER, 0)
+		self.dlen = n * 2
+		if n > 0:
+			self.drange = (float(mins.min()), float(maxs.max()))
+
+	def __del__(self):
+		glDeleteVertexArrays(1, self.vao)
+		glDeleteBuffers(1, self.vbo)
+		glDeleteVertexArrays(1, self.dvao)
+		glDeleteBuffers(1, self.dvbo)
+
+class Plot(Widget):
+	"""
+	Real-time line plot.
+	Each series is drawn as a single line strip from a persistent VBO,
+	to which only the new samples are uploaded. When there are more
+	samples than pixels, the min/max of each pixel column is drawn
+	instead, so the cost doesn't depend on the number of samples.
+	Attributes:
+		series: List of PlotSeries.
+		window: Number of (most recent) samples shown. 0 shows all of them.
+		range: Fixed (min, max) of the vertical axis. None fits the samples.
+		line_width: Line width, in pixels.
+		background: Enable/Disable background rendering.
+	"""
+
+	__shader = None
+
+	def __init__(self, window=0, range=None):
+		super().__init__()
+		self.series = []
+		self.window = window
+		self.range = range
+		self.line_width = 1.0
+		self.background = True
+
+		self.__buffers = {}
+		self.__totals = ()
+
+		self.bounds.set_value(0, 0, 200, 100)
+
+	def add_series(self, capacity=4096, color=(1, 1, 1, 1), name=""):
+		"""
+		Adds a new series.
+		Returns:
+			The PlotSeries.
+		"""
+		s = PlotSeries(capacity, color, name)
+		self.series.append(s)
+		return s
+
+	def remove_series(self, series):
+		"""Removes a series, releasing its GPU buffers."""
+		self.series.remove(series)
+		self.__buffers.pop(series, None)
+
+	def update(self):
+		totals = tuple(s.total for s in self.series)
+		if totals != self.__totals:
+			self.__totals = totals
+			self.invalidate_render()
+		super().update()
+
+	@classmethod
+	def __get_shader(cls):
+		if cls.__shader is None:
+			VS = """
+			attribute vec2 v_position;
+			uniform vec4 transform;
+			void main() {
+				vec2 fpos = transform.xy + (v_position * transform.zw);
+				gl_Position = gl_ModelViewProjectionMatrix * vec4(fpos, 0.0, 1.0);
+			}
+			"""
+			FS = """
+			uniform vec4 color;
+			void main() {
+				gl_FragColor = color;
+			}
+			"""
+			cls.__shader = ShaderProgram()
+			cls.__shader.add(VS, GL_VERTEX_SHADER)
+			cls.__shader.add(FS, GL_FRAGMENT_SHADER)
+			glBindAttribLocation(cls.__shader.bindCode, 0, "v_position")
+			cls.__shader.link()
+		return cls.__shader
+
+	def render(self, renderer):
+		if self.style is None:
+			return
+		b = self.get_corrected_bounds_no_intersect()
+		if self.background:
+			renderer.nine_patch_object(self.style.textures["Panel"], *b.packed())
+		super().render(renderer)
+		if not self.series:
+			return
+
+		pad = 2 * self.tui.x_scaling
+		x = b.x + pad
+		y = b.y + pad
+		w = b.w - pad * 2
+		h = b.h - pad * 2
+		if w < 1 or h < 1:
+			return
+		columns = max(1, int(w))
+
+		## Upload the new data, and find the range of what will be drawn
+		draws = []
+		lo = math.inf
+		hi = -math.inf
+		for s in self.series:
+			if s.count < 2:
+				continue
+			buf = self.__buffers.get(s, None)
+			if buf is None or buf.capacity != s.capacity:
+				buf = self.__buffers[s] = _SeriesBuffer(s)
+			window = s.capacity if self.window <= 0 else self.window
+			n = min(s.count, window)
+			start = s.total - n
+			if n <= columns * 2:
+				buf.sync(s)
+				vals = s.values(start)
+				vlo, vhi = float(vals.min()), float(vals.max())
+				bucket = 0
+			else:
+				## Power of two groups, so that the grouping rarely changes
+				bucket = 1 << max(0, int(math.ceil(math.log2(n / columns))))
+				buf.sync_decimated(s, start, bucket)
+				vlo, vhi = buf.drange
+			lo = min(lo, vlo)
+			hi = max(hi, vhi)
+			draws.append((s, buf, window, n, start, bucket))
+
+		if self.range is not None:
+			lo, hi = self.range
+		elif lo > hi:
+			lo, hi = (0.0, 1.0)
+		if hi - lo < 1e-6:
+			lo -= 0.5
+			hi += 0.5
+		sy = h / (hi - lo)
+
+		shader = self.__get_shader()
+
+		def draw_lines():
+			shader.bind()
+			glLineWidth(self.line_width)
+			for s, buf, window, n, start, bucket in draws:
+				sx = w / max(1, window - 1)
+				color = s.color if len(s.color) == 4 else (*s.color, 1.0)
+				shader.get_uniform("color").set_value(color)
+				if bucket == 0:
+					slot = start % s.capacity
+					shader.get_uniform("transform").set_value((x + w - (n - 1 + slot) * sx, y + h + lo * sy, sx, -sy))
+					glBindVertexArray(buf.vao[0])
+					GL.glDrawArrays(GL.GL_LINE_STRIP, slot, n)
+				else:
+					shader.get_uniform("transform").set_value((x + w - (n - 1) * sx, y + h + lo * sy, sx, -sy))
+					glBindVertexArray(buf.dvao[0])
+					GL.glDrawArrays(GL.GL_LINE_STRIP, 0, buf.dlen)
+			glBindVertexArray(0)
+			glLineWidth(1.0)
+			shader.unbind()
+
+		renderer.custom(draw_lines, x, y, w, h)
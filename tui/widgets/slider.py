@@ -44,6 +44,7 @@ class Slider(Widget):
 		rounded: Round/Snap the value to step.
 		orientation: Slider orientation. One of: ORIENTATION_HORIZONTAL, ORIENTATION_VERTICAL.
 		change_listeners: Change event listeners.
+		commit_listeners: Called once when the user stops dragging/scrolling, with the value from before it.
 	"""
 	def __init__(self, minimum=0, maximum=100, step=1, rounded=False):
 		super().__init__()
@@ -52,6 +53,7 @@ class Slider(Widget):
 		self.rounded = rounded
 		self.orientation = ORIENTATION_HORIZONTAL
 		self.change_listeners = []
+		self.commit_listeners = []
 
 		self.clicked = False
 		self.hover = False
@@ -62,6 +64,15 @@ class Slider(Widget):
 
 		self.bounds.set_value(0, 0, 120, 9)
 
+	@property
+	def hover(self):
+		"""Same as hovered."""
+		return self.hovered
+
+	@hover.setter
+	def hover(self, h):
+		self.hovered = h
+
 	@property
 	def value(self):
 		return self.__value
@@ -71,8 +82,8 @@ class Slider(Widget):
 		if v != self.__value:
 			prev = self.__value
 			self.__value = v
-			for cl in self.change_listeners:
-				cl(self, prev)
+			self.invalidate_render()
+			self.notify_change(self.change_listeners, prev)
 
 	def __thumb_size(self):
 		b = self.get_corrected_bounds_no_intersect()
@@ -151,22 +162,28 @@ class Slider(Widget):
 
 	def handle_events(self, event):
 		if event.get_type() == EVENT_TYPE_SCROLL and self.focused:
+			self.begin_interaction()
 			if self.orientation == ORIENTATION_VERTICAL:
 				self.value -= event.delta * self.step
 			else:
 				self.value += event.delta * self.step
+			self.commit_interaction(self.commit_listeners)
 			return EVENT_STATUS_CONSUMED
 		elif event.get_type() == EVENT_TYPE_MOUSE_BUTTON:
+			was_clicked = self.clicked
 			if self.get_corrected_bounds().has_point(event.x, event.y):
 				self.clicked = event.status
 				if self.clicked:
 					self.hover = True
+					self.begin_interaction()
 					self.__update_slider(event.x if self.orientation == ORIENTATION_HORIZONTAL else event.y)
 			else:
 				self.clicked = False
 			if not event.status:
 				self.hover = False
 				self.clicked = False
+			if was_clicked and not self.clicked:
+				self.commit_interaction(self.commit_listeners)
 		elif event.get_type() == EVENT_TYPE_MOUSE_MOTION:
 			if self.get_corrected_bounds().has_point(event.x, event.y):
 				self.hover = True
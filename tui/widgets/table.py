@@ -0,0 +1,381 @@
+"""
+File: widgets/table.py
+Description: Column-oriented data table
+Author:	Diego Lopes (TwisterGE/DCubix) < diego95lopes@gmail.com >
+"""
+
+import math
+import numpy
+from tui.core import EVENT_TYPE_SCROLL, EVENT_TYPE_MOUSE_BUTTON, EVENT_TYPE_MOUSE_MOTION, EVENT_STATUS_CONSUMED
+from .panel import Panel
+from .label import ALIGN_LEFT, ALIGN_CENTER, ALIGN_RIGHT
+from .slider import Slider, ORIENTATION_VERTICAL, ORIENTATION_HORIZONTAL
+
+class TableColumn:
+	"""
+	Table column.
+	Attributes:
+		title: Header text.
+		data: The values. A NumPy array or any sequence.
+		width: Column width.
+		format: Cell format. A format string (i.e: "{:.2f}"), a callable or None (str).
+		align: Text alignment. One of: ALIGN_LEFT, ALIGN_CENTER, ALIGN_RIGHT.
+	"""
+	def __init__(self, title, data, width=100, format=None, align=ALIGN_LEFT):
+		self.title = title
+		self.data = data
+		self.width = width
+		self.format = format
+		self.align = align
+
+	def format_cell(self, row):
+		"""
+		Returns:
+			The text of a cell.
+		"""
+		value = self.data[row]
+		if self.format is None:
+			return str(value)
+		elif callable(self.format):
+			return self.format(value)
+		return self.format.format(value)
+
+class Table(Panel):
+	"""
+	Column-oriented data table.
+	The cells aren't widgets: only the visible rows and columns are
+	formatted (and cached until they scroll away or the data changes), and
+	they are drawn in a single batched pass. Sorting never moves the data,
+	it only computes an index array with NumPy.
+	Attributes:
+		columns: List of TableColumn.
+		row_height: Height of every row.
+		header_height: Height of the header. Click a title to sort by it.
+		font: Custom font.
+		font_size: Custom font size.
+		selected: Selected data row, or -1.
+		select_listeners: Called with (table, row) when a row is clicked.
+		header_color: Header background color.
+		stripe_color: Background color of the odd rows.
+		selection_color: Background color of the selected row.
+		grid_color: Column separator color.
+		scrollbar: Vertical Slider.
+		hscrollbar: Horizontal Slider.
+	"""
+	def __init__(self, columns=None, row_height=20, header_height=22):
+		super().__init__()
+		self.columns = columns if columns is not None else []
+		self.row_height = row_height
+		self.header_height = header_height
+		self.font = None
+		self.font_size = 8.0
+		self.selected = -1
+		self.select_listeners = []
+		self.header_color = (0.0, 0.0, 0.0, 0.2)
+		self.stripe_color = (0.0, 0.0, 0.0, 0.06)
+		self.selection_color = (0.25, 0.5, 1.0, 0.35)
+		self.grid_color = (0.0, 0.0, 0.0, 0.15)
+
+		self.scrollbar = Slider(0, 1, row_height)
+		self.scrollbar.orientation = ORIENTATION_VERTICAL
+		self.scrollbar.bounds.w = 12
+		self.scrollbar.parent = self
+		self.children.append(self.scrollbar)
+
+		self.hscrollbar = Slider(0, 1, 10)
+		self.hscrollbar.orientation = ORIENTATION_HORIZONTAL
+		self.hscrollbar.bounds.h = 12
+		self.hscrollbar.parent = self
+		self.children.append(self.hscrollbar)
+
+		self.hovered = False
+
+		self.__order = None
+		self.__sort_column = -1
+		self.__sort_descending = False
+		self.__cells = {}
+
+		self.bounds.set_value(0, 0, 320, 240)
+
+	def add_column(self, title, data, width=100, format=None, align=ALIGN_LEFT):
+		"""
+		Adds a new column.
+		Returns:
+			The TableColumn.
+		"""
+		col = TableColumn(title, data, width, format, align)
+		self.columns.append(col)
+		self.data_changed()
+		return col
+
+	@property
+	def row_count(self):
+		"""Number of rows (the length of the shortest column)."""
+		if not self.columns:
+			return 0
+		return min(len(c.data) for c in self.columns)
+
+	@property
+	def sort_column(self):
+		"""Index of the column used to sort, or -1."""
+		return self.__sort_column
+
+	@property
+	def sort_descending(self):
+		return self.__sort_descending
+
+	@property
+	def scroll(self):
+		"""Get/Set the vertical scroll offset."""
+		return self.scrollbar.value
+
+	@scroll.setter
+	def scroll(self, v):
+		self.scrollbar.value = self.scrollbar.range.clamp(v)
+
+	@property
+	def scroll_x(self):
+		"""Get/Set the horizontal scroll offset."""
+		return self.hscrollbar.value
+
+	@scroll_x.setter
+	def scroll_x(self, v):
+		self.hscrollbar.value = self.hscrollbar.range.clamp(v)
+
+	def sort(self, column, descending=False):
+		"""
+		Sorts the rows by a column (stable), without reordering the data.
+		Args:
+			column: Column index, or -1 to restore the data order.
+			descending: Sort order.
+		"""
+		self.__sort_column = column
+		self.__sort_descending = descending
+		self.__cells.clear()
+		self.invalidate_render()
+		if column < 0 or column >= len(self.columns):
+			self.__order = None
+			return
+		data = numpy.asarray(self.columns[column].data)[:self.row_count]
+		if descending:
+			## Stable descending: sort the reversed data and map back
+			order = numpy.argsort(data[::-1], kind="stable")
+			self.__order = (len(data) - 1 - order)[::-1]
+		else:
+			self.__order = numpy.argsort(data, kind="stable")
+
+	def data_row(self, index):
+		"""
+		Returns:
+			The data row shown at a (sorted) position.
+		"""
+		return int(self.__order[index]) if self.__order is not None else index
+
+	def data_changed(self):
+		"""Forgets the formatted cells and sorts the rows again. Call it after changing the data."""
+		self.sort(self.__sort_column, self.__sort_descending)
+
+	def scroll_to(self, index):
+		"""Scrolls the minimum needed to show a (sorted) row."""
+		top = index * self.row_height
+		view = self.__body_height()
+		if top < self.scroll:
+			self.scroll = top
+		elif top + self.row_height > self.scroll + view:
+			self.scroll = top + self.row_height - view
+
+	def __fid(self):
+		return self.style.font.id if self.font is None else self.font.id
+
+	def __body_height(self):
+		hsb = self.hscrollbar.bounds.h if self.hscrollbar.visible else 0
+		return max(0, self.bounds.h - 2 - self.header_height - hsb)
+
+	def __body_width(self):
+		vsb = self.scrollbar.bounds.w if self.scrollbar.visible else 0
+		return max(0, self.bounds.w - 2 - vsb)
+
+	def __visible_columns(self, view_w):
+		"""
+		Returns:
+			The first and last (exclusive) visible columns, and the left edge of every column.
+		"""
+		widths = numpy.array([c.width for c in self.columns], dtype=numpy.float64)
+		rights = numpy.cumsum(widths) - self.scroll_x
+		lefts = rights - widths
+		first = int(numpy.searchsorted(rights, 0, side="right"))
+		last = int(numpy.searchsorted(lefts, view_w, side="left"))
+		return first, last, lefts
+
+	def __visible_rows(self):
+		count = self.row_count
+		first = max(0, int(self.scroll // self.row_height))
+		last = min(count, int(math.ceil((self.scroll + self.__body_height()) / self.row_height)))
+		return first, last
+
+	def __cell(self, renderer, row, col):
+		"""
+		Returns:
+			The (text, width) of a cell, formatting and measuring it only once.
+		"""
+		key = (row, col)
+		cell = self.__cells.get(key, None)
+		if cell is None:
+			column = self.columns[col]
+			text = column.format_cell(row)
+			w = 0
+			if column.align != ALIGN_LEFT:
+				w, _ = renderer.text_size(self.__fid(), text, self.font_size)
+			cell = self.__cells[key] = (text, w)
+		return cell
+
+	def update(self):
+		vsb = self.scrollbar
+		hsb = self.hscrollbar
+		for sb in (vsb, hsb):
+			sb.style = self.style
+			sb.tui = self.tui
+
+		## Each scrollbar takes space from the other one
+		total_w = sum(c.width for c in self.columns)
+		total_h = self.row_count * self.row_height
+		view_w = self.bounds.w - 2
+		view_h = self.bounds.h - 2 - self.header_height
+		show_h = total_w > view_w
+		show_v = total_h > view_h - (hsb.bounds.h if show_h else 0)
+		show_h = total_w > view_w - (vsb.bounds.w if show_v else 0)
+		vsb.visible = show_v
+		hsb.visible = show_h
+		max_scroll = max(0, total_h - self.__body_height())
+		max_scroll_x = max(0, total_w - self.__body_width())
+
+		vsb.range.maximum = max(1, max_scroll)
+		vsb.bounds.x = self.bounds.w - 1 - vsb.bounds.w
+		vsb.bounds.y = 1 + self.header_height
+		vsb.set_size(vsb.bounds.w, self.__body_height())
+		self.scroll = self.scroll
+
+		hsb.range.maximum = max(1, max_scroll_x)
+		hsb.bounds.x = 1
+		hsb.bounds.y = self.bounds.h - 1 - hsb.bounds.h
+		hsb.set_size(self.__body_width(), hsb.bounds.h)
+		self.scroll_x = self.scroll_x
+
+		super().update()
+
+	def render(self, renderer):
+		super().render(renderer)
+		if self.style is None or not self.columns:
+			return
+
+		sx = self.tui.x_scaling
+		sy = self.tui.y_scaling
+		b = self.get_corrected_bounds_no_intersect()
+		x = b.x + sx
+		y = b.y + sy
+		view_w = self.__body_width()
+		hh = self.header_height * sy
+		rh = self.row_height * sy
+
+		cfirst, clast, lefts = self.__visible_columns(view_w)
+		rfirst, rlast = self.__visible_rows()
+		rows = [self.data_row(i) for i in range(rfirst, rlast)]
+		body_y = y + hh - (self.scroll % self.row_height) * sy
+		body_h = self.__body_height() * sy
+
+		## Backgrounds: header, stripes, selection and separators in one batch
+		rects = [(x, y, view_w * sx, hh)]
+		colors = [self.header_color]
+		for i, row in enumerate(rows):
+			ry = body_y + i * rh
+			if row == self.selected:
+				rects.append((x, ry, view_w * sx, rh))
+				colors.append(self.selection_color)
+			elif (rfirst + i) % 2 == 1:
+				rects.append((x, ry, view_w * sx, rh))
+				colors.append(self.stripe_color)
+		for c in range(cfirst, clast):
+			rects.append((x + (lefts[c] + self.columns[c].width) * sx - 1, y, 1, hh + body_h))
+			colors.append(self.grid_color)
+
+		if renderer.clip_start(x, y, view_w * sx, hh + body_h):
+			renderer.draw_quads(None, rects, colors=colors)
+
+			## Text: a single pass, since BLF needs the renderer to be ended
+			fid = self.__fid()
+			color = self.style.text_color if self.enabled else self.style.disabled_text_color
+			pad = 4 * sx
+			_, th = renderer.text_size(fid, "Ay", self.font_size)
+			renderer.end()
+			for c in range(cfirst, clast):
+				col = self.columns[c]
+				title = col.title
+				if c == self.__sort_column:
+					title += " v" if self.__sort_descending else " ^"
+				renderer.text(fid, title, x + lefts[c] * sx + pad, y + (hh - th) / 2, color, self.font_size)
+
+			if renderer.clip_start(x, y + hh, view_w * sx, body_h):
+				for c in range(cfirst, clast):
+					col = self.columns[c]
+					cx = x + lefts[c] * sx
+					cw = col.width * sx
+					for i, row in enumerate(rows):
+						text, w = self.__cell(renderer, row, c)
+						tx = cx + pad
+						if col.align == ALIGN_RIGHT:
+							tx = cx + cw - w - pad
+						elif col.align == ALIGN_CENTER:
+							tx = cx + (cw - w) / 2
+						renderer.text(fid, text, tx, body_y + i * rh + (rh - th) / 2, color, self.font_size)
+				renderer.clip_end()
+			renderer.begin()
+			renderer.clip_end()
+
+		## Forget the cells that scrolled away
+		visible = (rlast - rfirst) * (clast - cfirst)
+		if len(self.__cells) > visible * 4 + 256:
+			keep = set(rows)
+			self.__cells = { k: v for k, v in self.__cells.items() if k[0] in keep and cfirst <= k[1] < clast }
+
+	def __hit(self, mx, my):
+		"""
+		Returns:
+			The (sorted row, column) at a point in output coordinates. The row is -1 for the header.
+		"""
+		sx = self.tui.x_scaling
+		sy = self.tui.y_scaling
+		b = self.get_corrected_bounds_no_intersect()
+		lx = (mx - b.x) / sx - 1
+		ly = (my - b.y) / sy - 1
+		if lx < 0 or lx >= self.__body_width() or ly < 0 or ly >= self.header_height + self.__body_height():
+			return None
+		_, _, lefts = self.__visible_columns(self.__body_width())
+		col = int(numpy.searchsorted(lefts, lx, side="right")) - 1
+		if col < 0 or lx >= lefts[col] + self.columns[col].width:
+			col = -1
+		if ly < self.header_height:
+			return (-1, col)
+		row = int((ly - self.header_height + self.scroll) // self.row_height)
+		if row >= self.row_count:
+			return None
+		return (row, col)
+
+	def handle_events(self, event):
+		etype = event.get_type()
+		if etype == EVENT_TYPE_MOUSE_MOTION:
+			self.hovered = self.get_corrected_bounds().has_point(event.x, event.y)
+		elif etype == EVENT_TYPE_SCROLL and self.hovered and self.enabled and self.visible:
+			self.scroll -= event.delta * self.row_height
+			return EVENT_STATUS_CONSUMED
+		elif etype == EVENT_TYPE_MOUSE_BUTTON and event.status and self.enabled and self.visible and self.columns and \
+				self.get_corrected_bounds().has_point(event.x, event.y):
+			hit = self.__hit(event.x, event.y)
+			if hit is not None:
+				row, col = hit
+				if row == -1 and col != -1:
+					self.sort(col, not self.__sort_descending if col == self.__sort_column else False)
+				elif row != -1:
+					self.selected = self.data_row(row)
+					self.invalidate_render()
+					self.notify(self.select_listeners, self, self.selected)
+		return super().handle_events(event)
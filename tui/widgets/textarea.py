@@ -0,0 +1,352 @@
+"""
+File: widgets/textarea.py
+Description: Multi-line text editor
+Author:	Diego Lopes (TwisterGE/DCubix) < diego95lopes@gmail.com >
+"""
+
+from bge import events as BGE_Events
+from bge import logic as BGE_Logic
+from tui.core import PieceTable, UndoStack, has_ctrl, has_shift
+from tui.core import EVENT_STATUS_CONSUMED, EVENT_TYPE_KEY, EVENT_TYPE_TEXT, EVENT_TYPE_FOCUS, EVENT_TYPE_MOUSE_BUTTON, EVENT_TYPE_MOUSE_MOTION, EVENT_TYPE_SCROLL
+from .panel import Panel
+from .slider import Slider, ORIENTATION_VERTICAL
+
+class TextArea(Panel):
+	"""
+	Multi-line text editor.
+	The text is stored in a PieceTable, and only the visible lines are
+	measured, wrapped and drawn. Wrapped lines are cached and re-wrapped
+	only when edited, so it stays responsive with very long texts (i.e. logs).
+	Attributes:
+		buffer: Text buffer. See: PieceTable.
+		text: The whole text. Setting it replaces the buffer.
+		caret: Caret position (character index).
+		word_wrap: Break the lines that don't fit the width.
+		font: Custom font.
+		font_size: Custom font size.
+		editable: When False, makes the TextArea read-only.
+		scrollbar: Vertical Slider used to scroll the text.
+		undo_stack: Edit history. Ctrl+Z undoes, Ctrl+Y (or Ctrl+Shift+Z) redoes.
+	"""
+	def __init__(self, text=""):
+		super().__init__()
+		self.buffer = PieceTable(text)
+		self.caret = 0
+		self.word_wrap = True
+		self.font = None
+		self.font_size = 10.0
+		self.editable = True
+		self.background = False
+		self.undo_stack = UndoStack()
+
+		self.scrollbar = Slider(0, 1, 1, rounded=True)
+		self.scrollbar.orientation = ORIENTATION_VERTICAL
+		self.scrollbar.bounds.w = 12
+		self.scrollbar.parent = self
+		self.children.append(self.scrollbar)
+
+		self.hovered = False
+		self.clicked = False
+
+		self.__wraps = {}
+		self.__wrap_width = -1
+		self.__rows = []
+		self.__visible_lines = 1
+		self.__mouse = None
+		self.__follow_caret = False
+		self.__blink = True
+		self.__blink_time = 0.0
+
+		self.bounds.set_value(0, 0, 300, 200)
+
+	@property
+	def text(self):
+		return self.buffer.get_text()
+
+	@text.setter
+	def text(self, t):
+		self.buffer = PieceTable(t)
+		self.invalidate_render()
+		self.caret = min(self.caret, len(t))
+		self.undo_stack.clear()
+		self.__wraps.clear()
+
+	@property
+	def scroll(self):
+		"""Get/Set the first visible line."""
+		return int(self.scrollbar.value)
+
+	@scroll.setter
+	def scroll(self, line):
+		self.scrollbar.value = int(self.scrollbar.range.clamp(line))
+
+	def insert(self, pos, text):
+		"""Inserts text, re-wrapping only the affected lines."""
+		self.undo_stack.record_insert(pos, text)
+		line = self.buffer.line_of(pos)
+		before = self.buffer.line_count
+		self.buffer.insert(pos, text)
+		self.__lines_changed(line, self.buffer.line_count - before)
+		if self.caret >= pos:
+			self.caret += len(text)
+
+	def delete(self, pos, length):
+		"""
+		Deletes text, re-wrapping only the affected lines.
+		Returns:
+			The deleted text.
+		"""
+		line = self.buffer.line_of(pos)
+		before = self.buffer.line_count
+		removed = self.buffer.delete(pos, length)
+		self.undo_stack.record_delete(pos, removed)
+		self.__lines_changed(line, self.buffer.line_count - before)
+		if self.caret > pos:
+			self.caret = max(pos, self.caret - len(removed))
+		return removed
+
+	def undo(self):
+		"""Reverts the last edit."""
+		caret = self.undo_stack.undo(self.insert, self.delete)
+		if caret > -1:
+			self.caret = caret
+			self.__follow_caret = True
+
+	def redo(self):
+		"""Applies the last reverted edit again."""
+		caret = self.undo_stack.redo(self.insert, self.delete)
+		if caret > -1:
+			self.caret = caret
+			self.__follow_caret = True
+
+	def append(self, text):
+		"""Appends text at the end, keeping the view at the bottom if it already was."""
+		at_bottom = self.scroll >= self.scrollbar.range.maximum
+		self.insert(len(self.buffer), text)
+		if at_bottom:
+			self.scroll = self.buffer.line_count
+
+	def __lines_changed(self, line, delta):
+		"""Drops the wraps of an edited line and shifts the ones below it."""
+		self.invalidate_render()
+		wraps = {}
+		for l, segs in self.__wraps.items():
+			if l < line:
+				wraps[l] = segs
+			elif l > line - min(0, delta):
+				wraps[l + delta] = segs
+		self.__wraps = wraps
+
+	def __fid(self):
+		return self.style.font.id if self.font is None else self.font.id
+
+	def __wrap(self, renderer, line, width):
+		"""
+		Returns:
+			The start offsets of the rows of a line.
+		"""
+		if line in self.__wraps:
+			return self.__wraps[line]
+		text = self.buffer.line(line)
+		fid = self.__fid()
+		segs = [0]
+		if self.word_wrap and width > 0:
+			start = 0
+			while renderer.text_size(fid, text[start:], self.font_size)[0] > width:
+				## Binary search for the longest fitting prefix
+				lo = start + 1
+				hi = len(text)
+				while lo < hi:
+					mid = (lo + hi + 1) // 2
+					if renderer.text_size(fid, text[start:mid], self.font_size)[0] <= width:
+						lo = mid
+					else:
+						hi = mid - 1
+				space = text.rfind(" ", start, lo)
+				end = space + 1 if space > start else lo
+				segs.append(end)
+				start = end
+		self.__wraps[line] = segs
+		return segs
+
+	def __prune_wraps(self, first, last):
+		if len(self.__wraps) > (last - first) * 4 + 64:
+			self.__wraps = { l: s for l, s in self.__wraps.items() if first <= l <= last }
+
+	def update(self):
+		self.__blink_time += (1.0 / BGE_Logic.getLogicTicRate())
+		if self.__blink_time >= 0.5:
+			self.__blink = not self.__blink
+			self.__blink_time = 0.0
+			if self.focused:
+				self.invalidate_render()
+
+		bounds = self.get_content_bounds()
+		sb = self.scrollbar
+		sb.style = self.style
+		sb.tui = self.tui
+		max_scroll = max(0, self.buffer.line_count - self.__visible_lines)
+		sb.visible = max_scroll > 0
+		sb.range.maximum = max(1, max_scroll)
+		sb.bounds.x = bounds.x + bounds.w - sb.bounds.w
+		sb.bounds.y = bounds.y
+		sb.set_size(sb.bounds.w, bounds.h)
+		super().update()
+
+	def render(self, renderer):
+		if self.style is None:
+			return
+		nbounds = self.get_corrected_bounds_no_intersect()
+		n = None
+		if self.enabled:
+			n = self.style.textures["TextBox_click" if self.focused else ("TextBox_hover" if self.hovered else "TextBox_normal")]
+		else:
+			n = self.style.textures["TextBox_disabled"]
+		if n:
+			renderer.nine_patch_object(n, *nbounds.packed())
+
+		fid = self.__fid()
+		pad = 3 * self.tui.x_scaling
+		sbw = self.scrollbar.bounds.w * self.tui.x_scaling if self.scrollbar.visible else 0
+		x = nbounds.x + pad
+		width = nbounds.w - pad * 2 - sbw
+		if width != self.__wrap_width:
+			self.__wraps.clear()
+			self.__wrap_width = width
+		_, line_h = renderer.text_size(fid, "Ay", self.font_size)
+		line_h += 2
+		self.__visible_lines = max(1, int(nbounds.h // line_h))
+
+		caret_line = self.buffer.line_of(self.caret)
+		if self.__follow_caret:
+			if caret_line < self.scroll:
+				self.scroll = caret_line
+			elif caret_line >= self.scroll + self.__visible_lines:
+				self.scroll = caret_line - self.__visible_lines + 1
+			self.__follow_caret = False
+
+		color = self.style.text_color if self.enabled else self.style.disabled_text_color
+		first = self.scroll
+		y = nbounds.y + pad
+		bottom = nbounds.y + nbounds.h
+		self.__rows = []
+		caret_xy = None
+
+		renderer.end()
+		line = first
+		while line < self.buffer.line_count and y < bottom:
+			start = self.buffer.line_start(line)
+			text = self.buffer.line(line)
+			segs = self.__wrap(renderer, line, width)
+			for i, s in enumerate(segs):
+				if y >= bottom:
+					break
+				e = segs[i + 1] if i + 1 < len(segs) else len(text)
+				row = text[s:e]
+				renderer.text(fid, row, x, y, color, self.font_size)
+				self.__rows.append((start + s, start + e, y, line_h))
+				if caret_line == line and start + s <= self.caret <= start + e and caret_xy is None:
+					if self.caret < start + e or i + 1 == len(segs):
+						cw, _ = renderer.text_size(fid, row[:self.caret - (start + s)], self.font_size)
+						caret_xy = (x + cw, y)
+				y += line_h
+			line += 1
+		renderer.begin()
+		self.__prune_wraps(first, line)
+
+		if self.__mouse is not None:
+			self.caret = self.__position_at(renderer, *self.__mouse)
+			self.__mouse = None
+
+		if caret_xy is not None and self.__blink and self.focused and self.editable:
+			tcol = color if len(color) == 4 else [*color, 1.0]
+			renderer.rectangle(caret_xy[0], caret_xy[1], 1 * self.tui.x_scaling, line_h, color=tcol)
+		super().render(renderer)
+
+	def __position_at(self, renderer, mx, my):
+		"""Maps a point (in output coordinates) to a character position, using the rows of the last render."""
+		if not self.__rows:
+			return self.caret
+		row = self.__rows[-1]
+		for r in self.__rows:
+			if my < r[2] + r[3]:
+				row = r
+				break
+		start, end, _, _ = row
+		text = self.buffer.get_text(start, end)
+		x = self.get_corrected_bounds_no_intersect().x + 3 * self.tui.x_scaling
+		fid = self.__fid()
+		best = 0
+		for i in range(len(text) + 1):
+			w, _ = renderer.text_size(fid, text[:i], self.font_size)
+			if x + w > mx:
+				pw, _ = renderer.text_size(fid, text[:best], self.font_size)
+				if mx - (x + pw) > (x + w) - mx:
+					best = i
+				break
+			best = i
+		return start + best
+
+	def __move_vertical(self, delta):
+		line = self.buffer.line_of(self.caret)
+		col = self.caret - self.buffer.line_start(line)
+		target = max(0, min(self.buffer.line_count - 1, line + delta))
+		start = self.buffer.line_start(target)
+		self.caret = min(start + col, self.buffer.line_end(target))
+
+	def handle_events(self, event):
+		etype = event.get_type()
+		if self.focused and etype in (EVENT_TYPE_TEXT, EVENT_TYPE_KEY, EVENT_TYPE_MOUSE_BUTTON, EVENT_TYPE_MOUSE_MOTION):
+			## Caret, selection or text may change
+			self.invalidate_render()
+		if etype == EVENT_TYPE_TEXT and self.focused and self.editable and not has_ctrl(event.modifiers):
+			if event.character not in ("\r", "\n"):
+				self.insert(self.caret, event.character)
+				self.__follow_caret = True
+				self.__blink = True
+		elif etype == EVENT_TYPE_KEY and self.focused and event.status:
+			line = self.buffer.line_of(self.caret)
+			if event.key in (BGE_Events.LEFTARROWKEY, BGE_Events.RIGHTARROWKEY, BGE_Events.UPARROWKEY, BGE_Events.DOWNARROWKEY, BGE_Events.HOMEKEY, BGE_Events.ENDKEY):
+				self.undo_stack.seal()
+			if has_ctrl(event.modifiers):
+				if self.editable and event.key == BGE_Events.ZKEY and not has_shift(event.modifiers):
+					self.undo()
+				elif self.editable and (event.key == BGE_Events.YKEY or event.key == BGE_Events.ZKEY):
+					self.redo()
+			elif event.key == BGE_Events.LEFTARROWKEY:
+				self.caret = max(0, self.caret - 1)
+			elif event.key == BGE_Events.RIGHTARROWKEY:
+				self.caret = min(len(self.buffer), self.caret + 1)
+			elif event.key == BGE_Events.UPARROWKEY:
+				self.__move_vertical(-1)
+			elif event.key == BGE_Events.DOWNARROWKEY:
+				self.__move_vertical(1)
+			elif event.key == BGE_Events.HOMEKEY:
+				self.caret = self.buffer.line_start(line)
+			elif event.key == BGE_Events.ENDKEY:
+				self.caret = self.buffer.line_end(line)
+			elif self.editable:
+				if event.key == BGE_Events.ENTERKEY:
+					self.insert(self.caret, "\n")
+				elif event.key == BGE_Events.BACKSPACEKEY and self.caret > 0:
+					self.delete(self.caret - 1, 1)
+				elif event.key == BGE_Events.DELKEY:
+					self.delete(self.caret, 1)
+			self.__follow_caret = True
+			self.__blink = True
+		elif etype == EVENT_TYPE_SCROLL and self.hovered:
+			self.scroll -= event.delta * 3
+			return EVENT_STATUS_CONSUMED
+		elif etype == EVENT_TYPE_MOUSE_BUTTON and self.enabled:
+			inside = self.get_corrected_bounds().has_point(event.x, event.y)
+			if inside and event.status and not self.scrollbar.get_corrected_bounds().has_point(event.x, event.y):
+				self.__mouse = (event.x, event.y)
+				self.clicked = True
+				self.undo_stack.seal()
+			if not event.status:
+				self.clicked = False
+		elif etype == EVENT_TYPE_MOUSE_MOTION:
+			self.hovered = self.get_corrected_bounds().has_point(event.x, event.y)
+		elif etype == EVENT_TYPE_FOCUS:
+			self.hovered = False
+		return super().handle_events(event)
@@ -0,0 +1,337 @@
+"""
+File: widgets/treeview.py
+Description: Lazy tree view
+Author:	Diego Lopes (TwisterGE/DCubix) < diego95lopes@gmail.com >
+"""
+
+import bisect
+import math
+from tui.core import EVENT_TYPE_SCROLL, EVENT_TYPE_MOUSE_BUTTON, EVENT_TYPE_MOUSE_MOTION, EVENT_STATUS_CONSUMED
+from .panel import Panel
+from .slider import Slider, ORIENTATION_VERTICAL
+
+class TreeProvider:
+	"""
+	Tree data source.
+	Override it to feed a TreeView. Nodes can be any object, and are
+	requested only when they become visible.
+	"""
+	def root(self):
+		"""Gets the root node. It isn't shown, its children are the top rows."""
+		return None
+
+	def child_count(self, node):
+		"""Gets the number of children of a node."""
+		return 0
+
+	def child(self, node, index):
+		"""Gets a child of a node."""
+		return None
+
+	def label(self, node):
+		"""Gets the text of a node."""
+		return str(node)
+
+class _Expansion:
+	"""
+	An expanded node.
+	visible is the number of visible rows below it, and keys are the
+	(sorted) indices of its expanded children.
+	"""
+	__slots__ = ("node", "parent", "index", "count", "visible", "children", "keys")
+
+	def __init__(self, node, parent, index, count):
+		self.node = node
+		self.parent = parent
+		self.index = index
+		self.count = count
+		self.visible = count
+		self.children = {}
+		self.keys = []
+
+class TreeView(Panel):
+	"""
+	Lazy tree view.
+	Nodes come from a TreeProvider and only the expanded ones are kept,
+	with the number of rows they show. Expanding or collapsing updates
+	those numbers up to the root, and rows are found by descending the
+	expanded nodes, so a node with thousands of children costs the same
+	as one with a few. Only the visible rows are requested and drawn.
+	Attributes:
+		provider: Data source. See: TreeProvider.
+		row_height: Height of every row.
+		indent: Indentation of each level.
+		font: Custom font.
+		font_size: Custom font size.
+		selected: Path (tuple of child indices) of the selected node, or None.
+		select_listeners: Called with (tree, path, node) when a row is clicked.
+		expand_listeners: Called with (tree, path, expanded) when a node is expanded/collapsed.
+		selection_color: Background color of the selected row.
+		scrollbar: Vertical Slider used to scroll the tree.
+	"""
+	def __init__(self, provider=None, row_height=20, indent=14):
+		super().__init__()
+		self.__provider = provider if provider is not None else TreeProvider()
+		self.row_height = row_height
+		self.indent = indent
+		self.font = None
+		self.font_size = 8.0
+		self.selected = None
+		self.select_listeners = []
+		self.expand_listeners = []
+		self.selection_color = (0.25, 0.5, 1.0, 0.35)
+
+		self.scrollbar = Slider(0, 1, row_height)
+		self.scrollbar.orientation = ORIENTATION_VERTICAL
+		self.scrollbar.bounds.w = 12
+		self.scrollbar.parent = self
+		self.children.append(self.scrollbar)
+
+		self.hovered = False
+
+		self.__rows = {}
+		self.data_changed()
+
+		self.bounds.set_value(0, 0, 200, 240)
+
+	@property
+	def provider(self):
+		"""Get/Set the data source."""
+		return self.__provider
+
+	@provider.setter
+	def provider(self, p):
+		self.__provider = p
+		self.data_changed()
+
+	@property
+	def row_count(self):
+		"""Number of visible rows (if the tree was tall enough)."""
+		return self.__root.visible
+
+	@property
+	def scroll(self):
+		"""Get/Set the scroll offset."""
+		return self.scrollbar.value
+
+	@scroll.setter
+	def scroll(self, v):
+		self.scrollbar.value = self.scrollbar.range.clamp(v)
+
+	def data_changed(self):
+		"""Collapses everything and reloads the nodes. Call it after changing the data."""
+		root = self.__provider.root()
+		self.__root = _Expansion(root, None, -1, self.__provider.child_count(root))
+		self.__rows.clear()
+		self.invalidate_render()
+
+	def __expansion(self, path, create=False):
+		"""
+		Returns:
+			The expansion record of a node, or None if it's collapsed.
+		"""
+		e = self.__root
+		for index in path:
+			sub = e.children.get(index, None)
+			if sub is None:
+				if not create or index < 0 or index >= e.count:
+					return None
+				node = self.__provider.child(e.node, index)
+				sub = _Expansion(node, e, index, self.__provider.child_count(node))
+				e.children[index] = sub
+				bisect.insort(e.keys, index)
+				self.__add_visible(e, sub.count)
+				self.invalidate_render()
+			e = sub
+		return e
+
+	def __add_visible(self, e, delta):
+		while e is not None:
+			e.visible += delta
+			e = e.parent
+
+	def is_expanded(self, path):
+		return len(path) > 0 and self.__expansion(path) is not None
+
+	def expand(self, path):
+		"""
+		Expands a node (and its ancestors).
+		Args:
+			path: Tuple of child indices, from the root.
+		"""
+		path = tuple(path)
+		if len(path) == 0 or self.is_expanded(path):
+			return
+		if self.__expansion(path, True) is not None:
+			self.notify(self.expand_listeners, self, path, True)
+
+	def collapse(self, path):
+		"""Collapses a node, forgetting the expanded state of its descendants."""
+		path = tuple(path)
+		e = self.__expansion(path) if len(path) > 0 else None
+		if e is None:
+			return
+		parent = e.parent
+		del parent.children[e.index]
+		parent.keys.remove(e.index)
+		self.__add_visible(parent, -e.visible)
+		self.invalidate_render()
+		self.__rows = { k: v for k, v in self.__rows.items() if self.__is_alive(k[0]) }
+		self.notify(self.expand_listeners, self, path, False)
+
+	def toggle(self, path):
+		if self.is_expanded(path):
+			self.collapse(path)
+		else:
+			self.expand(path)
+
+	def __is_alive(self, e):
+		while e.parent is not None:
+			if e.parent.children.get(e.index, None) is not e:
+				return False
+			e = e.parent
+		return e is self.__root
+
+	def __path(self, e, index):
+		path = [index]
+		while e.parent is not None:
+			path.append(e.index)
+			e = e.parent
+		return tuple(reversed(path))
+
+	def __locate(self, row):
+		"""
+		Finds the node shown at a row.
+		Returns:
+			The expansion record of its parent, its index and its depth.
+		"""
+		e = self.__root
+		depth = 0
+		while True:
+			offset = 0
+			descended = False
+			for k in e.keys:
+				at = k + offset
+				if row < at:
+					break
+				if row == at:
+					return (e, k, depth)
+				sub = e.children[k]
+				if row <= at + sub.visible:
+					## Inside the expanded child
+					e = sub
+					row = row - at - 1
+					depth += 1
+					descended = True
+					break
+				offset += sub.visible
+			if not descended:
+				return (e, row - offset, depth)
+
+	def __row(self, row):
+		"""
+		Returns:
+			The cached (parent record, index, depth, node, label, child count) of a row.
+		"""
+		e, index, depth = self.__locate(row)
+		key = (e, index)
+		info = self.__rows.get(key, None)
+		if info is None:
+			sub = e.children.get(index, None)
+			node = sub.node if sub is not None else self.__provider.child(e.node, index)
+			count = sub.count if sub is not None else self.__provider.child_count(node)
+			info = self.__rows[key] = (node, self.__provider.label(node), count)
+		return (e, index, depth) + info
+
+	def path_at(self, row):
+		"""
+		Returns:
+			The path of the node shown at a row.
+		"""
+		e, index, _ = self.__locate(row)
+		return self.__path(e, index)
+
+	def __fid(self):
+		return self.style.font.id if self.font is None else self.font.id
+
+	def __visible_rows(self):
+		h = self.get_content_bounds().h
+		first = max(0, int(self.scroll // self.row_height))
+		last = min(self.row_count, int(math.ceil((self.scroll + h) / self.row_height)))
+		return first, last
+
+	def update(self):
+		bounds = self.get_content_bounds()
+		sb = self.scrollbar
+		sb.style = self.style
+		sb.tui = self.tui
+		max_scroll = max(0, self.row_count * self.row_height - bounds.h)
+		sb.visible = max_scroll > 0
+		sb.range.maximum = max(1, max_scroll)
+		sb.bounds.x = bounds.x + bounds.w - sb.bounds.w
+		sb.bounds.y = bounds.y
+		sb.set_size(sb.bounds.w, bounds.h)
+		self.scroll = self.scroll
+		super().update()
+
+	def render(self, renderer):
+		super().render(renderer)
+		if self.style is None:
+			return
+		sx = self.tui.x_scaling
+		sy = self.tui.y_scaling
+		b = self.get_corrected_bounds_no_intersect()
+		x = b.x + sx
+		rh = self.row_height * sy
+		top = b.y + sy - (self.scroll % self.row_height) * sy
+		width = (self.get_content_bounds().w - (self.scrollbar.bounds.w if self.scrollbar.visible else 0)) * sx
+
+		first, last = self.__visible_rows()
+		rows = [self.__row(r) for r in range(first, last)]
+
+		if self.selected is not None:
+			for i, (e, index, _, _, _, _) in enumerate(rows):
+				if self.__path(e, index) == self.selected:
+					renderer.draw_quads(None, [(x, top + i * rh, width, rh)], colors=self.selection_color)
+					break
+
+		fid = self.__fid()
+		color = self.style.text_color if self.enabled else self.style.disabled_text_color
+		_, th = renderer.text_size(fid, "+", self.font_size)
+		renderer.end()
+		for i, (e, index, depth, node, label, count) in enumerate(rows):
+			tx = x + (depth * self.indent + 4) * sx
+			ty = top + i * rh + (rh - th) / 2
+			if count > 0:
+				renderer.text(fid, "-" if index in e.children else "+", tx, ty, color, self.font_size)
+			renderer.text(fid, label, tx + self.indent * sx, ty, color, self.font_size)
+		renderer.begin()
+
+		## Forget the rows that scrolled away
+		if len(self.__rows) > (last - first) * 4 + 256:
+			keep = set((e, index) for e, index, _, _, _, _ in rows)
+			self.__rows = { k: v for k, v in self.__rows.items() if k in keep }
+
+	def handle_events(self, event):
+		etype = event.get_type()
+		if etype == EVENT_TYPE_MOUSE_MOTION:
+			self.hovered = self.get_corrected_bounds().has_point(event.x, event.y)
+		elif etype == EVENT_TYPE_SCROLL and self.hovered and self.enabled and self.visible:
+			self.scroll -= event.delta * self.row_height
+			return EVENT_STATUS_CONSUMED
+		elif etype == EVENT_TYPE_MOUSE_BUTTON and event.status and self.enabled and self.visible and \
+				self.get_corrected_bounds().has_point(event.x, event.y) and \
+				not (self.scrollbar.visible and self.scrollbar.get_corrected_bounds().has_point(event.x, event.y)):
+			b = self.get_corrected_bounds_no_intersect()
+			row = int(((event.y - b.y) / self.tui.y_scaling - 1 + self.scroll) // self.row_height)
+			if 0 <= row < self.row_count:
+				e, index, depth, node, _, count = self.__row(row)
+				path = self.__path(e, index)
+				arrow = b.x + (1 + depth * self.indent + self.indent) * self.tui.x_scaling
+				if count > 0 and event.x < arrow:
+					self.toggle(path)
+				else:
+					self.selected = path
+					self.invalidate_render()
+					self.notify(self.select_listeners, self, path, node)
+		return super().handle_events(event)